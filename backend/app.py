@@ -1,18 +1,36 @@
+import os
 from flask import Flask, jsonify, request, send_file
 from flask_cors import CORS
 from controllers.upload_controller import upload_bp
 from controllers.dashboard_controller import dashboard_bp
 from controllers.ai_chat_controller import chat_bp
 from controllers.predictions_controller import predictions_bp
+from controllers.metrics_controller import metrics_bp
+from controllers.jobs_controller import jobs_bp
+from services import jobs, metrics
+from services.upload_store import UploadRequest
+# Registers the parse, score and batch job kinds
+import services.workbook_jobs
 
 app = Flask(__name__)
-CORS(app)
+# Uploaded files are hashed and stored as they stream in
+app.request_class = UploadRequest
+CORS(app, expose_headers=["Server-Timing"])
+# Stage timings, Server-Timing headers and /metrics
+metrics.init_app(app)
 
 # Register Blueprints
 app.register_blueprint(upload_bp)
 app.register_blueprint(dashboard_bp)
 app.register_blueprint(chat_bp)
 app.register_blueprint(predictions_bp)
+app.register_blueprint(metrics_bp)
+app.register_blueprint(jobs_bp)
 
+# Single-process development server; see serve.py for production
 if __name__ == "__main__":
+    # Jobs a previous run left unfinished, picked up by the process that
+    # serves (not the reloader watching it)
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        jobs.resume()
     app.run(port=5001, debug=True)
\ No newline at end of file
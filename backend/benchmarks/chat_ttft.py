@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+# Time to first token and total time of /ask_ai_about_sheet vs its streaming
+# variant, against the fake Ollama server. Run from the backend folder:
+#   python -m benchmarks.chat_ttft --concurrency 4 --questions 16
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SAMPLE_FILE = os.path.join(BACKEND_DIR, "userfiles", "Data_before_Apr_9.xls")
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+def ask_blocking(client, url, question):
+    started = time.perf_counter()
+    client.post(url, json={"question": question}).get_json()
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed
+
+def ask_stream(client, url, question):
+    started = time.perf_counter()
+    response = client.post(url, json={"question": question}, buffered=False)
+    first_token = None
+    for chunk in response.response:
+        if first_token is None and b"event: token" in chunk:
+            first_token = time.perf_counter() - started
+    response.close()
+    total = time.perf_counter() - started
+    return first_token or total, total
+
+def run(client, ask, url, questions, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda i: ask(client, url, f"How many rows are there? ({i})"), range(questions)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark chat time-to-first-token offline")
+    parser.add_argument("--file", default=SAMPLE_FILE)
+    parser.add_argument("--questions", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--first-token-delay", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, BACKEND_DIR)
+    from benchmarks import fake_ollama
+    server = fake_ollama.start(first_token_delay=args.first_token_delay, token_delay=args.token_delay)
+    # The chat client reads its settings at import time
+    os.environ["OLLAMA_URL"] = server.url
+
+    workdir = tempfile.mkdtemp(prefix="chat_ttft_")
+    try:
+        os.chdir(workdir)
+        os.makedirs("uploads")
+        file = os.path.basename(args.file)
+        shutil.copy(args.file, os.path.join("uploads", file))
+
+        from app import app
+        from services.sheet_cache import sheet_names
+        sheet = sheet_names(os.path.join("uploads", file))[0]
+        client = app.test_client()
+
+        for name, ask, route in [("blocking", ask_blocking, "ask_ai_about_sheet"),
+                                 ("stream", ask_stream, "ask_ai_about_sheet_stream")]:
+            url = f"/{route}/{file}/{sheet}"
+            ask(client, url, "warm up")
+            client.post(f"/reset_chat/{file}/{sheet}")
+            results = run(client, ask, url, args.questions, args.concurrency)
+            ttft = [r[0] * 1000 for r in results]
+            total = [r[1] * 1000 for r in results]
+            print(f"{name:9s} first token p50 {statistics.median(ttft):7.1f}ms p95 {percentile(ttft, 95):7.1f}ms | "
+                  f"total p50 {statistics.median(total):7.1f}ms p95 {percentile(total, 95):7.1f}ms")
+            client.post(f"/reset_chat/{file}/{sheet}")
+        print(f"Ollama requests: {server.requests}, connections opened: {len(server.connections)}")
+    finally:
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
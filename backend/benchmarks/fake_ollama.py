@@ -0,0 +1,75 @@
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Stand-in for Ollama's /api/chat so the chat endpoints can be exercised and
+# timed offline. Answers are canned; only the timing is realistic: a delay
+# before the first token (prompt processing) and a delay per token after it.
+ANSWER = ("Based on the summary, the sheet has the columns listed above. "
+          "I can only describe what is present in the provided data.")
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, chunked streaming
+    first_token_delay = 0.5
+    token_delay = 0.02
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.server.requests += 1
+        self.server.connections.add(self.client_address)
+        tokens = [word + " " for word in ANSWER.split()]
+        time.sleep(self.first_token_delay)
+
+        if not body.get("stream"):
+            time.sleep(self.token_delay * len(tokens))
+            data = json.dumps({"message": {"role": "assistant", "content": "".join(tokens)}, "done": True}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_delay)
+            self._chunk({"message": {"role": "assistant", "content": token}, "done": False})
+        self._chunk({"message": {"role": "assistant", "content": ""}, "done": True})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, obj):
+        data = json.dumps(obj).encode() + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+def start(port=0, first_token_delay=0.5, token_delay=0.02):
+    # Serves in a background thread; returns the server (server.url is the chat URL)
+    handler = type("Handler", (FakeOllamaHandler,), {
+        "first_token_delay": first_token_delay, "token_delay": token_delay
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.requests = 0
+    server.connections = set()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/api/chat"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Ollama chat server")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--first-token-delay", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+    server = start(args.port, args.first_token_delay, args.token_delay)
+    print(f"Fake Ollama listening on {server.url}")
+    threading.Event().wait()
@@ -0,0 +1,201 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import statistics
+
+# Latency percentiles, peak RSS and throughput of every route of the four
+# blueprints, through the Flask test client, on synthetic workbooks of the
+# given sizes. Chat routes talk to the fake Ollama server. Run from the
+# backend folder:
+#   python -m benchmarks.routes --rows 10000 100000 --repeat 5 --output bench.json
+# Generated workbooks are kept in --data-dir and reused by later runs.
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DATA_DIR = os.path.join(BACKEND_DIR, "benchmarks", ".data")
+RSS_INTERVAL = 0.005
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+def current_rss():
+    # Resident set size in bytes (Linux); 0 where /proc isn't available
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+class RssSampler:
+    # Highest RSS seen while the block runs, sampled from a thread
+    def __enter__(self):
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(RSS_INTERVAL):
+            self.peak = max(self.peak, current_rss())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+def workbook(rows, data_dir, seed=0):
+    from benchmarks.synthetic_workbook import write_workbook
+    path = os.path.join(data_dir, f"synthetic_{rows}_{seed}.xlsx")
+    if not os.path.exists(path):
+        print(f"Generating {rows:,} rows into {path} ...")
+        write_workbook(path, rows, seed=seed)
+    return path
+
+def wait_for_background():
+    # Uploads queue parse and score jobs, which queue profile and chat index
+    # builds; let them all finish so they don't compete with the routes being timed
+    from services import jobs, profiler, row_retrieval
+    while jobs.list_jobs("queued", 1) or jobs.list_jobs("running", 1):
+        time.sleep(jobs.POLL_SECONDS)
+    for executor in [profiler._executor, row_retrieval._executor]:
+        executor.submit(lambda: None).result()
+
+def route_calls(file, sheet):
+    # (blueprint, name, call(client)) for every route, in an order where each
+    # route's inputs exist; delete_file runs last, on a copy
+    column = "network_type"
+    chat = {"question": "How many rows are there?"}
+    llm = {"question": "Which carriers look risky?"}
+    return [
+        ("dashboard", "get_files", lambda c: c.get("/get_files")),
+        ("dashboard", "get_sheets", lambda c: c.get(f"/get_sheets/{file}")),
+        ("dashboard", "get_sheets_data", lambda c: c.get(f"/get_sheets_data/{file}/{sheet}?page=2&page_size=50")),
+        ("dashboard", "get_sheets_data search", lambda c: c.get(f"/get_sheets_data/{file}/{sheet}?page=1&page_size=50&search=wifi")),
+        ("dashboard", "get_all_columns", lambda c: c.get(f"/get_all_columns/{file}/{sheet}")),
+        ("dashboard", "get_column_frequency", lambda c: c.get(f"/get_column_frequency/{file}/{sheet}/sim_info")),
+        ("dashboard", "get_correlation_heatmap", lambda c: c.get(f"/get_correlation_heatmap/{file}/{sheet}")),
+        ("dashboard", "get_distribution_vs_churn", lambda c: c.get(f"/get_distribution_vs_churn/{file}/{sheet}/{column}")),
+        ("predictions", "predict_churn", lambda c: c.get(f"/predict_churn/{file}/{sheet}?page=3&page_size=50")),
+        ("predictions", "predict_churn search", lambda c: c.get(f"/predict_churn/{file}/{sheet}?page=1&page_size=50&search=wifi")),
+        ("predictions", "predictions_stats", lambda c: c.get(f"/predictions_stats/{file}/{sheet}")),
+        ("predictions", "model_accuracy", lambda c: c.get(f"/model_accuracy/{file}/{sheet}")),
+        ("predictions", "download_predictions", lambda c: c.get(f"/download_predictions/{file}/{sheet}?format=csv")),
+        ("predictions", "feature_importance", lambda c: c.get("/feature_importance")),
+        ("predictions", "model_training_metrics", lambda c: c.get("/model_training_metrics")),
+        ("predictions", "model_versions", lambda c: c.get("/model_versions")),
+        ("predictions", "batch_predict", lambda c: c.post("/batch_predict", json={
+            "items": [{"file": file, "sheets": [sheet]}], "format": "csv", "workers": 1})),
+        ("chat", "ask_ai_about_sheet computed", lambda c: c.post(f"/ask_ai_about_sheet/{file}/{sheet}", json=chat)),
+        ("chat", "ask_ai_about_sheet llm", lambda c: c.post(f"/ask_ai_about_sheet/{file}/{sheet}", json=llm)),
+        ("chat", "ask_ai_about_sheet_stream", lambda c: c.post(f"/ask_ai_about_sheet_stream/{file}/{sheet}", json=llm)),
+        ("chat", "chat_history", lambda c: c.get(f"/chat_history/{file}/{sheet}")),
+        ("chat", "reset_chat", lambda c: c.post(f"/reset_chat/{file}/{sheet}"))
+    ]
+
+def measure(client, call, repeat):
+    # First call (cold caches) timed apart from the repeats
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        response = call(client)
+        response.get_data()
+        cold = time.perf_counter() - started
+        status = response.status_code
+        warm = []
+        loop_started = time.perf_counter()
+        for _ in range(repeat):
+            started = time.perf_counter()
+            call(client).get_data()
+            warm.append(time.perf_counter() - started)
+        loop = time.perf_counter() - loop_started
+    return {
+        "status": status,
+        "cold_ms": cold * 1000,
+        "p50_ms": statistics.median(warm) * 1000 if warm else None,
+        "p95_ms": percentile(warm, 95) * 1000 if warm else None,
+        "p99_ms": percentile(warm, 99) * 1000 if warm else None,
+        "requests_per_s": repeat / loop if warm and loop else None,
+        "peak_rss_mb": rss.peak / 2**20
+    }
+
+def upload(client, path, name):
+    with open(path, "rb") as f:
+        data = f.read()
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        response = client.post("/upload", data={"files": (io.BytesIO(data), name)}, content_type="multipart/form-data")
+        elapsed = time.perf_counter() - started
+    return {"status": response.status_code, "cold_ms": elapsed * 1000, "peak_rss_mb": rss.peak / 2**20,
+            "mb_per_s": len(data) / 2**20 / elapsed}
+
+def print_results(rows, sheet_rows, results):
+    print(f"\n{rows:,} rows ({sheet_rows:,} in the benchmarked sheet)")
+    print(f"{'route':<32} {'status':>6} {'cold ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'rows/s':>12} {'RSS MB':>8}")
+    for name, r in results.items():
+        fmt = lambda v, spec: format(v, spec) if v is not None else "-"
+        rows_per_s = sheet_rows / (r["p50_ms"] / 1000) if r.get("p50_ms") else None
+        print(f"{name:<32} {r['status']:>6} {r['cold_ms']:>9.1f} {fmt(r.get('p50_ms'), '8.1f'):>8} "
+              f"{fmt(r.get('p95_ms'), '8.1f'):>8} {fmt(r.get('p99_ms'), '8.1f'):>8} "
+              f"{fmt(r.get('requests_per_s'), '8.1f'):>8} {fmt(rows_per_s, '12,.0f'):>12} {r['peak_rss_mb']:>8.0f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every route on synthetic workbooks")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5, help="Warm calls per route after the first")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Where generated workbooks are kept")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, BACKEND_DIR)
+    from benchmarks import fake_ollama
+    from benchmarks.synthetic_workbook import sheet_rows
+    server = fake_ollama.start(first_token_delay=0.05, token_delay=0.001)
+    # The chat client reads its settings at import time
+    os.environ["OLLAMA_URL"] = server.url
+
+    paths = {rows: workbook(rows, os.path.abspath(args.data_dir)) for rows in args.rows}
+    workdir = tempfile.mkdtemp(prefix="bench_routes_")
+    report = {}
+    try:
+        # The blueprints resolve their folders from the working directory
+        os.chdir(workdir)
+        os.makedirs("uploads")
+        from app import app
+        from services.sheet_cache import sheet_names
+        client = app.test_client()
+
+        for rows, path in paths.items():
+            file = os.path.basename(path)
+            results = {"upload": upload(client, path, file)}
+            wait_for_background()
+            sheet = sheet_names(os.path.join("uploads", file))[0]
+            for blueprint, name, call in route_calls(file, sheet):
+                results[name] = {"blueprint": blueprint, **measure(client, call, args.repeat)}
+
+            # A second name for the same content: the upload is deduplicated, and
+            # deleting it only drops the name
+            results["upload copy"] = upload(client, path, f"copy_{file}")
+            wait_for_background()
+            results["delete_file"] = measure(client, lambda c: c.delete(f"/delete_file/copy_{file}"), 0)
+            results["delete_file"]["blueprint"] = "dashboard"
+
+            print_results(rows, sheet_rows(rows, 3)[0], results)
+            report[rows] = results
+            shutil.rmtree("batch_results", ignore_errors=True)
+    finally:
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+        server.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
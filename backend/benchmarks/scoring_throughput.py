@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# Rows per second of the reference scoring path (preprocess_sheet, the
+# sklearn scaler, XGBClassifier.predict_proba) against the compiled scorer
+# the app uses, with and without its threshold table, on a sheet of random
+# dates. Run from the backend folder:
+#   python -m benchmarks.scoring_throughput --rows 100000 500000
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+def random_sheet(rows, seed=42):
+    # The date columns the features come from, plus a few other columns
+    # preprocess_sheet has to carry along, with some missing dates
+    rng = np.random.default_rng(seed)
+    base = np.datetime64("2024-01-01")
+    active = base + rng.integers(0, 365, rows).astype("timedelta64[D]")
+    interval = active + rng.integers(0, 60, rows).astype("timedelta64[D]")
+    last_boot = active + rng.integers(0, 200, rows).astype("timedelta64[D]")
+    df = pd.DataFrame({
+        "Model": rng.choice(["B30 Pro", "A25", "Tab 8"], rows),
+        "imei": rng.integers(10**14, 10**15, rows).astype(str),
+        "active_date": active,
+        "interval_date": interval,
+        "last_boot_date": last_boot,
+        "Chrn Flag": rng.integers(0, 2, rows)
+    })
+    df.loc[rng.random(rows) < 0.05, "interval_date"] = pd.NaT
+    return df
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return min(times), result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scoring paths")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, BACKEND_DIR)
+    from services.scoring import compile_scorer, load_artifacts, predict, preprocess_sheet
+    model, preprocessor = load_artifacts()
+    paths = [
+        ("reference", lambda df: predict(model, preprocessor, preprocess_sheet(df))),
+        ("in-place", compile_scorer(model, preprocessor, max_table_cells=0)),
+        ("table", compile_scorer(model, preprocessor))
+    ]
+
+    print(f"{'rows':>9} {'path':<10} {'rows/s':>12} {'speedup':>8}  vs reference")
+    for rows in args.rows:
+        df = random_sheet(rows)
+        reference = None
+        for name, scorer in paths:
+            elapsed, (proba, label) = best_of(lambda: scorer(df), args.repeat)
+            if reference is None:
+                reference = elapsed, proba, label
+            print(f"{rows:>9} {name:<10} {rows / elapsed:>12,.0f} {reference[0] / elapsed:>7.2f}x"
+                  f"  max |proba diff| {np.abs(proba - reference[1]).max():.1e}, labels equal: {bool((label == reference[2]).all())}")
+
+if __name__ == "__main__":
+    main()
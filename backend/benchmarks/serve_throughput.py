@@ -0,0 +1,192 @@
+import os
+import sys
+import json
+import time
+import signal
+import shutil
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+import requests
+
+# Requests per second of the pre-fork server (serve.py) against the
+# single-process server (app.run, threaded, as app.py runs it without the
+# debugger), under the same request mix from concurrent clients: every route
+# of benchmarks.routes except batch_predict, on a synthetic workbook, with
+# chat answered by the fake Ollama server. Run from the backend folder:
+#   python -m benchmarks.serve_throughput --rows 10000 --workers 2 4 --clients 8 --seconds 20
+# Memory is the PSS of the server's processes, so pages the workers share
+# with the master count once.
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SINGLE_PROCESS = "import sys; sys.path.insert(0, {backend!r}); from app import app; app.run(port={port}, threaded=True)"
+# High enough that the per-process cap on Ollama calls isn't what's measured
+OLLAMA_CONCURRENCY = "64"
+EXCLUDED_ROUTES = {"batch_predict"}
+
+class HttpClient:
+    # What route_calls needs from the Flask test client, over HTTP
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+
+    def get(self, path):
+        return self.session.get(self.base_url + path)
+
+    def post(self, path, json=None):
+        return self.session.post(self.base_url + path, json=json)
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+def tree_pss(pid):
+    # PSS of a process and its children, in bytes (Linux)
+    total = 0
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Pss:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+def start_server(mode, workers, port, workdir, env):
+    if mode == "single":
+        cmd = [sys.executable, "-c", SINGLE_PROCESS.format(backend=os.path.abspath(BACKEND_DIR), port=port)]
+    else:
+        cmd = [sys.executable, os.path.join(os.path.abspath(BACKEND_DIR), "serve.py"), "--workers", str(workers), "--port", str(port)]
+    log = open(os.path.join(workdir, "server.log"), "w")
+    process = subprocess.Popen(cmd, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(base_url + "/model_versions", timeout=5).status_code == 200:
+                return process, base_url
+        except requests.ConnectionError:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"The {mode} server didn't start; see {log.name}")
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+def wait_for_jobs(base_url):
+    while any(requests.get(f"{base_url}/jobs", params={"status": status, "limit": 1}).json()["jobs"]
+              for status in ["queued", "running"]):
+        time.sleep(0.2)
+
+def load(base_url, calls, clients, seconds):
+    # Each client walks the mix from its own starting point until time is up
+    results = [[] for _ in range(clients)]
+    deadline = time.monotonic() + seconds
+
+    def client(i):
+        http = HttpClient(base_url)
+        n = i
+        while time.monotonic() < deadline:
+            name, call = calls[n % len(calls)]
+            started = time.perf_counter()
+            try:
+                status = call(http).status_code
+            except requests.RequestException:
+                status = None
+            results[i].append((name, time.perf_counter() - started, status))
+            n += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [r for rs in results for r in rs]
+
+def run_mode(mode, workers, args, path, env):
+    from benchmarks.routes import route_calls
+    workdir = tempfile.mkdtemp(prefix=f"bench_serve_{mode}_")
+    process, base_url = start_server(mode, workers, args.port, workdir, env)
+    try:
+        file = os.path.basename(path)
+        with open(path, "rb") as f:
+            requests.post(f"{base_url}/upload", files={"files": (file, f)}).raise_for_status()
+        wait_for_jobs(base_url)
+        sheet = requests.get(f"{base_url}/get_sheets/{file}").json()["sheets"][0]
+        calls = [(name, call) for _, name, call in route_calls(file, sheet) if name not in EXCLUDED_ROUTES]
+
+        # Warm every worker's caches, then measure
+        load(base_url, calls, args.clients, args.warmup)
+        results = load(base_url, calls, args.clients, args.seconds)
+        latencies = [seconds for _, seconds, _ in results]
+        return {
+            "mode": mode,
+            "workers": workers or 1,
+            "requests": len(results),
+            "requests_per_s": len(results) / args.seconds,
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "errors": sum(1 for _, _, status in results if status is None or status >= 500),
+            "pss_mb": tree_pss(process.pid) / 2**20
+        }
+    finally:
+        stop_server(process)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare serve.py with the single-process server")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--seconds", type=float, default=20, help="Measured seconds per mode")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds first")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--data-dir", default=None, help="Where generated workbooks are kept")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, BACKEND_DIR)
+    from benchmarks import fake_ollama
+    from benchmarks.routes import DATA_DIR, workbook
+    server = fake_ollama.start(first_token_delay=0.05, token_delay=0.001)
+    env = {**os.environ, "OLLAMA_URL": server.url, "OLLAMA_MAX_CONCURRENCY": OLLAMA_CONCURRENCY, "PYTHONWARNINGS": "ignore"}
+    path = workbook(args.rows, os.path.abspath(args.data_dir or DATA_DIR))
+
+    report = []
+    try:
+        for mode, workers in [("single", None)] + [("prefork", n) for n in args.workers]:
+            print(f"Running {mode}{f' x{workers}' if workers else ''} ...")
+            report.append(run_mode(mode, workers, args, path, env))
+    finally:
+        server.shutdown()
+
+    print(f"\n{args.rows:,} rows, {args.clients} clients, {args.seconds:g}s per mode, {os.cpu_count()} CPUs")
+    print(f"{'mode':<10} {'workers':>7} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'PSS MB':>8}")
+    for r in report:
+        print(f"{r['mode']:<10} {r['workers']:>7} {r['requests']:>9} {r['requests_per_s']:>8.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['errors']:>7} {r['pss_mb']:>8.0f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
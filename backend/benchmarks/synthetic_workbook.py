@@ -0,0 +1,149 @@
+import os
+import math
+import argparse
+import numpy as np
+import pandas as pd
+
+# Synthetic device workbooks shaped like the real exports (same columns and
+# JSON blobs), for benchmarks at sizes the sample file can't reach:
+#   python -m benchmarks.synthetic_workbook --rows 1000000 --output uploads/synthetic_1m.xlsx
+# The date columns mix formats the way uploads do: ISO strings, slashed and
+# day-first dates, Excel date cells, Persian digits and blanks. Every churn
+# column name the app knows is used, one per sheet in turn; the flag depends
+# on the same date gaps the model uses, so accuracy numbers mean something.
+CHURN_COLUMNS = ['Chrn Flag', 'Churn', 'Churn Flag']
+SHEET_NAMES = ["S6603L", "B30 Pro", "A25", "Tab 8", "N10", "X5"]
+# xlsx holds 1,048,576 rows per sheet, header included
+MAX_SHEET_ROWS = 1048575
+CHUNK_ROWS = 50000
+
+# (format, share); None writes the datetime itself as an Excel date cell
+DATE_FORMATS = [
+    ("%Y-%m-%d %H:%M:%S", 0.70),
+    ("%Y/%m/%d %H:%M", 0.08),
+    ("%d/%m/%Y", 0.06),
+    ("persian", 0.06),
+    (None, 0.07),
+    ("blank", 0.03)
+]
+PERSIAN_DIGITS = str.maketrans("0123456789", "۰۱۲۳۴۵۶۷۸۹")
+
+CARRIERS = [("USIM", "001", "01"), ("T-Mobile", "310", "260"), ("Verizon", "311", "480"),
+            ("AT&T", "310", "410"), ("中国移动", "460", "07"), ("Vodafone", "234", "15")]
+APPS = [("Chess", "com.chess"), ("TikTok", "com.zhiliaoapp.musically"), ("Camera", "com.android.camera2"),
+        ("Chime", "com.onedebit.chime"), ("Messenger", "com.facebook.orca")]
+
+def mixed_dates(rng, seconds):
+    # Epoch seconds as a column of mixed date representations
+    stamps = pd.Series(pd.to_datetime(seconds, unit="s"))
+    out = pd.Series([None] * len(seconds), dtype=object)
+    kinds = rng.choice(len(DATE_FORMATS), len(seconds), p=[share for _, share in DATE_FORMATS])
+    for i, (fmt, _) in enumerate(DATE_FORMATS):
+        mask = kinds == i
+        if not mask.any() or fmt == "blank":
+            continue
+        if fmt is None:
+            out[mask] = stamps[mask].dt.to_pydatetime()
+        elif fmt == "persian":
+            out[mask] = stamps[mask].dt.strftime("%Y-%m-%d %H:%M:%S").str.translate(PERSIAN_DIGITS)
+        else:
+            out[mask] = stamps[mask].dt.strftime(fmt)
+    return out
+
+def sim_info(rng, rows):
+    carrier = rng.integers(0, len(CARRIERS), rows)
+    blobs = np.array([
+        f'[{{"slot_index":0,"carrier_name":"{name}","mcc":"{mcc}","mnc":"{mnc}","gid":"FFFFFFFF"}}]'
+        for name, mcc, mnc in CARRIERS
+    ], dtype=object)[carrier]
+    blobs[rng.random(rows) < 0.1] = "uninserted"
+    return blobs
+
+def app_usage(rng, rows, start_ms):
+    # A day of usage for two apps per row; varied enough that blobs aren't all equal
+    apps = rng.integers(0, len(APPS), (rows, 2))
+    seconds = rng.integers(0, 4000, (rows, 2))
+    launches = rng.integers(0, 20, (rows, 2))
+    return [
+        f'[{{"start_timestamp":{start},"app_usage_info":['
+        f'{{"app_name":"{APPS[a][0]}","package_name":"{APPS[a][1]}","total_time_in_foreground":{s},"app_launch_count":{n}}},'
+        f'{{"app_name":"{APPS[b][0]}","package_name":"{APPS[b][1]}","total_time_in_foreground":{t},"app_launch_count":{m}}}]}}]'
+        for start, (a, b), (s, t), (n, m) in zip(start_ms, apps, seconds, launches)
+    ]
+
+def generate_frame(rows, churn_column=CHURN_COLUMNS[0], seed=0):
+    rng = np.random.default_rng(seed)
+    active = rng.integers(1704067200, 1735689600, rows)  # during 2024
+    usage_days = rng.exponential(60, rows)
+    last_boot = active + (usage_days * 86400).astype(np.int64)
+    interval = active + (rng.uniform(0, 1, rows) * (last_boot - active)).astype(np.int64)
+    # Short use is the strongest churn signal, as in the real data
+    churn = (rng.random(rows) < 1 / (1 + np.exp((usage_days - 20) / 8))).astype(int)
+
+    df = pd.DataFrame({
+        "activate": pd.to_datetime(active, unit="s").strftime("%Y%m%d"),
+        "imei1": rng.integers(10**8, 10**9, rows),
+        "sim_info": sim_info(rng, rows),
+        "promotion_email": [f"user{i}@example.com" for i in rng.integers(0, max(rows // 3, 1), rows)],
+        "register_email": rng.random(rows) < 0.9,
+        "interval_date": mixed_dates(rng, interval),
+        "last_boot_date": mixed_dates(rng, last_boot),
+        "active_date": mixed_dates(rng, active),
+        "update_date": pd.to_datetime(active, unit="s").strftime("%Y-%m-%d %H:%M:%S"),
+        "privacy_marketing": rng.random(rows) < 0.7,
+        "via_boot_wizard": rng.random(rows) < 0.5,
+        "app_usage_infos": app_usage(rng, rows, last_boot * 1000),
+        "wallpaper_ids": [f'{{"system":{s},"lock":{l}}}' for s, l in rng.integers(-1, 5, (rows, 2))],
+        "interval_count": rng.integers(0, 6, rows).astype(float),
+        "reboot_count": rng.integers(0, 4, rows).astype(float),
+        "network_type": rng.choice(["wifi", "mobile", "none"], rows, p=[0.8, 0.15, 0.05]),
+        "usage_update_date": pd.to_datetime(last_boot, unit="s").strftime("%Y-%m-%d %H:%M:%S"),
+        churn_column: churn
+    })
+    df.loc[rng.random(rows) < 0.02, "interval_count"] = np.nan
+    return df
+
+def sheet_rows(rows, sheets):
+    # Rows per sheet: split evenly, with more sheets where xlsx needs them
+    sheets = max(sheets, math.ceil(rows / MAX_SHEET_ROWS))
+    return [rows // sheets + (1 if i < rows % sheets else 0) for i in range(sheets)]
+
+def write_workbook(path, rows, sheets=3, seed=0):
+    # Streams chunks through openpyxl's write-only mode, so memory stays flat
+    # at any size. Returns {sheet name: (rows, churn column)}.
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    layout = {}
+    for i, count in enumerate(sheet_rows(rows, sheets)):
+        name = SHEET_NAMES[i] if i < len(SHEET_NAMES) else f"Sheet{i + 1}"
+        churn_column = CHURN_COLUMNS[i % len(CHURN_COLUMNS)]
+        sheet = workbook.create_sheet(name)
+        for start in range(0, count, CHUNK_ROWS):
+            df = generate_frame(min(CHUNK_ROWS, count - start), churn_column, seed=seed * 100003 + i * 1009 + start)
+            if start == 0:
+                sheet.append(list(df.columns))
+            for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+                sheet.append(row)
+        layout[name] = (count, churn_column)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    workbook.save(tmp_path)
+    os.replace(tmp_path, path)
+    return layout
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic device workbook")
+    parser.add_argument("--rows", type=int, default=10000, help="Rows over all sheets")
+    parser.add_argument("--sheets", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args(argv)
+
+    layout = write_workbook(args.output, args.rows, args.sheets, args.seed)
+    for name, (count, churn_column) in layout.items():
+        print(f"{name}: {count:,} rows, churn column '{churn_column}'")
+    print(f"Wrote {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -1,101 +1,61 @@
 import os
 import json
 import traceback
+from contextlib import closing
 import pandas as pd
-from flask import Blueprint, request, jsonify
-import requests
-from collections import defaultdict
+from flask import Blueprint, request, jsonify, Response
 import re
+from services.chat_summary import sheet_summary
+from services import chat_store
+from services.row_retrieval import related_rows
+from services.chat_query import answer_question
+from services.ollama_client import OllamaBusy, chat, stream_chat
 
 UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads")
 chat_bp = Blueprint("chat", __name__)
 
-OLLAMA_URL = "http://localhost:11434/api/chat"
-OLLAMA_MODEL = "llama3.2:3b"
-
-CHAT_STORE = os.path.join(os.getcwd(), "chat_store")
-os.makedirs(CHAT_STORE, exist_ok=True)
-
-def chat_path(chat_key):
-    safe_key = chat_key.replace("::", "__")
-    return os.path.join(CHAT_STORE, f"{safe_key}.json")
-
-def load_chat(chat_key):
-    path = chat_path(chat_key)
-    if os.path.exists(path):
-        with open(path, "r") as f:
-            CHAT_MEMORY[chat_key] = json.load(f)
-
-def save_chat(chat_key):
-    path = chat_path(chat_key)
-    with open(path, "w") as f:
-        json.dump(CHAT_MEMORY[chat_key], f)
-
 # ---------------------------
-# In-memory chat memory
+# Chat memory: append-only logs plus recent messages in memory
 # ---------------------------
-CHAT_MEMORY = defaultdict(list)  # key = file::sheet
-
 def get_chat_key(file, sheet):
     return f"{file}::{sheet}"
 
-def build_summary(df, max_rows=5, max_numeric=5):
-    schema = {c: str(df[c].dtype) for c in df.columns}
-    numeric_df = df.select_dtypes(include=["number"]).iloc[:, :max_numeric]
-    numeric_stats = numeric_df.describe().round(2).to_dict()
-    sample_rows = df.head(max_rows).to_dict(orient="records")
-    
-    return {
-        "total_rows": len(df),
-        "columns": list(df.columns),
-        "schema": schema,
-        "numeric_stats": numeric_stats,
-        "sample_rows": sample_rows
-    }
-
-def stringify_all(obj):
-    if isinstance(obj, dict):
-        return {k: stringify_all(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [stringify_all(x) for x in obj]
-    elif obj is None:
-        return "None"
-    else:
-        return str(obj)
-
 # ---------------------------
 # LLM Explainer
 # ---------------------------
-def explain_with_llm(question, result, chat_key):
-    if chat_key not in CHAT_MEMORY:
-        load_chat(chat_key)
+def rows_text(rows):
+    if not rows:
+        return ""
+    return f"Rows of the sheet most related to the question:\n{json.dumps(rows)}\n"
 
-    CHAT_MEMORY[chat_key].append({"role": "user", "content": question})
+def build_messages(question, summary_text, chat_key, rows=None):
+    chat_store.append_message(chat_key, "user", question)
     
-    messages = [
+    # Older turns are left out once the conversation outgrows the token budget
+    return [
         {"role": "system", "content": "You are a data analyst. Only use the data provided. Do NOT guess, assume, or invent any values. If the dataset does not contain the information requested, respond clearly that it is not present. Explain results clearly, accurately, and in plain language. Do not invent numbers."},
-        *CHAT_MEMORY[chat_key],
-        {"role": "user", "content": f"Computed results:\n{result}\nAnswer this question: '{question}'. Check the columns carefully and do not guess."}
+        *chat_store.fit_to_budget(chat_store.recent_messages(chat_key)),
+        {"role": "user", "content": f"Computed results:\n{summary_text}\n{rows_text(rows)}Answer this question: '{question}'. Check the columns carefully and do not guess."}
     ]
-    
-    payload = {"model": OLLAMA_MODEL, "messages": messages, "options": {"temperature": 0.2}, "stream": False}
+
+def remember_answer(chat_key, content):
+    chat_store.append_message(chat_key, "assistant", content)
+
+def remember_computed(chat_key, question, answer):
+    chat_store.append_message(chat_key, "user", question)
+    remember_answer(chat_key, answer)
+
+def explain_with_llm(question, summary_text, chat_key, rows=None):
+    messages = build_messages(question, summary_text, chat_key, rows)
     
     try:
-        response = requests.post(OLLAMA_URL, json=payload, timeout=120)
-        resp_json = response.json()
-        if "message" in resp_json and "content" in resp_json["message"]:
-            content = resp_json["message"]["content"]
-        elif "response" in resp_json:
-            content = resp_json["response"]
-        elif "error" in resp_json:
-            content = f"Ollama error: {resp_json['error']}"
-        else:
-            content = "No explanation returned from LLM."
+        content = chat(messages)
+    except OllamaBusy as e:
+        content = str(e)
     except Exception as e:
         content = f"Failed to connect to Ollama: {e}"
     
-    CHAT_MEMORY[chat_key].append({"role": "assistant", "content": content})
-    save_chat(chat_key)
+    remember_answer(chat_key, content)
     print("Content: ", content)
     return content
 
@@ -115,21 +75,100 @@ def ask_ai_about_sheet(file, sheet):
     chat_key = get_chat_key(file, sheet)
 
     try:
-        df = pd.read_excel(filepath, sheet_name=sheet)
-
-        result = build_summary(df)
-        explanation = explain_with_llm(question, result, chat_key)
+        # Built once per sheet version, not per question
+        summary = sheet_summary(filepath, sheet)
+
+        # Counts, aggregates, top values and group-bys are computed from the
+        # sheet directly; only other questions go to the LLM
+        computed = answer_question(filepath, sheet, question)
+        if computed is not None:
+            remember_computed(chat_key, question, computed["answer"])
+            return jsonify({
+                "result": summary["result"],
+                "answer": computed["answer"],
+                "query": computed,
+                "history": chat_store.recent_messages(chat_key)
+            })
+
+        # Top matching rows from the sheet's retrieval index, if built yet
+        rows = related_rows(filepath, sheet, question)
+        explanation = explain_with_llm(question, summary["text"], chat_key, rows)
         
         return jsonify({
-            "result": stringify_all(result),
+            "result": summary["result"],
             "answer": explanation,
-            "history": stringify_all(CHAT_MEMORY[chat_key])
+            "history": chat_store.recent_messages(chat_key)
         })
 
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# ---------------------------
+# Streaming chat endpoint
+# ---------------------------
+# Same question/answer as /ask_ai_about_sheet, sent as server-sent events:
+# "result" (the summary), one "token" per generated piece, then "done" with
+# the full answer and history
+@chat_bp.route("/ask_ai_about_sheet_stream/<file>/<sheet>", methods=["POST"])
+def ask_ai_about_sheet_stream(file, sheet):
+    filepath = os.path.join(UPLOAD_FOLDER, file)
+    if not os.path.exists(filepath):
+        return jsonify({"error": "File not found"}), 404
+
+    question = request.json.get("question", "").strip()
+    if not question:
+        return jsonify({"answer": "Please ask a question."})
+
+    chat_key = get_chat_key(file, sheet)
+
+    try:
+        summary = sheet_summary(filepath, sheet)
+        computed = answer_question(filepath, sheet, question)
+        if computed is not None:
+            remember_computed(chat_key, question, computed["answer"])
+        else:
+            rows = related_rows(filepath, sheet, question)
+            messages = build_messages(question, summary["text"], chat_key, rows)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+    def computed_events():
+        yield sse("result", summary["result"])
+        yield sse("token", {"content": computed["answer"]})
+        yield sse("done", {"answer": computed["answer"], "query": computed,
+                           "history": chat_store.recent_messages(chat_key)})
+
+    def generate():
+        yield sse("result", summary["result"])
+
+        parts = []
+        try:
+            try:
+                # Closed with the response, so a client that hangs up frees
+                # its Ollama slot right away
+                with closing(stream_chat(messages)) as tokens:
+                    for token in tokens:
+                        parts.append(token)
+                        yield sse("token", {"content": token})
+            except OllamaBusy as e:
+                parts.append(str(e))
+            except Exception as e:
+                parts.append(f"Failed to connect to Ollama: {e}")
+        finally:
+            # Also keeps the partial answer if the browser goes away mid-stream
+            remember_answer(chat_key, "".join(parts))
+
+        yield sse("done", {"answer": "".join(parts), "history": chat_store.recent_messages(chat_key)})
+
+    events = computed_events() if computed is not None else generate()
+    return Response(events, mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # ---------------------------
 # Reset chat memory
 # ---------------------------
@@ -137,21 +176,15 @@ def ask_ai_about_sheet(file, sheet):
 def reset_chat(file, sheet):
     chat_key = get_chat_key(file, sheet)
 
-    # Clear memory
-    CHAT_MEMORY.pop(chat_key, None)
-
-    # Remove persisted file
-    path = chat_path(chat_key)
-    if os.path.exists(path):
-        try:
-            os.remove(path)
-        except Exception as e:
-            return jsonify({"error": f"Failed to delete chat file: {e}"}), 500
+    # Clear memory and remove the persisted log
+    try:
+        chat_store.reset_chat(chat_key)
+    except Exception as e:
+        return jsonify({"error": f"Failed to delete chat file: {e}"}), 500
 
     return jsonify({"status": "chat reset"})
 
 @chat_bp.route("/chat_history/<file>/<sheet>", methods=["GET"])
 def chat_history(file, sheet):
     chat_key = get_chat_key(file, sheet)
-    load_chat(chat_key)
-    return jsonify({"history": CHAT_MEMORY.get(chat_key, [])})
+    return jsonify({"history": chat_store.full_history(chat_key)})
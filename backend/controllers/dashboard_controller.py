@@ -1,10 +1,15 @@
 import os
 import pandas as pd
-import json 
-from datetime import datetime
 from flask import Blueprint, request, jsonify
 import traceback
-import plotly.graph_objects as go
+from services import charts
+from services.sheet_cache import read_sheet, read_rows, sheet_length, sheet_columns, sheet_dtypes, sheet_names
+from services.search_index import cell_text, paginate, search_rows
+from services.metrics import stage
+from services.normalize import column_frequency
+from services.profiler import load_profile, correlation_matrix, churn_breakdown, find_churn_column
+from services.upload_store import remove_upload
+from services.workbook_jobs import parse_pending
 
 UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads")
 
@@ -12,7 +17,8 @@ dashboard_bp = Blueprint("dashboard", __name__)
 
 @dashboard_bp.route("/get_files", methods=["GET"])
 def get_files():
-    files = os.listdir(UPLOAD_FOLDER)
+    # Hidden entries hold derived data such as the Parquet copies
+    files = [f for f in os.listdir(UPLOAD_FOLDER) if not f.startswith(".")]
     return jsonify({"files": files}), 200
 
 @dashboard_bp.route("/delete_file/<file>", methods=["DELETE"])
@@ -20,7 +26,8 @@ def delete_file(file):
     try:
         filepath = os.path.join(UPLOAD_FOLDER, file)
         if os.path.exists(filepath):
-            os.remove(filepath)
+            # The stored content goes once no other name links to it
+            remove_upload(UPLOAD_FOLDER, file)
             return jsonify({"message": f"{file} deleted successfully"}), 200
         else:
             return jsonify({"error": "File not found"}), 404
@@ -34,19 +41,14 @@ def get_sheets(file):
         return jsonify({"error": "File not found"}), 404
 
     try:
-        xl = pd.ExcelFile(filepath)
-        sheet_names = xl.sheet_names
-        xl.close()
-        return jsonify({"sheets": sheet_names})
+        job = parse_pending(file)
+        if job:
+            return jsonify(job), 202
+
+        return jsonify({"sheets": sheet_names(filepath)})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-def paginate(df, page, page_size):
-    total = len(df)
-    start = (page - 1) * page_size
-    end = start + page_size
-    return df.iloc[start:end], total
-
 @dashboard_bp.route("/get_sheets_data/<file>/<sheet>", methods=["GET"])
 def get_sheets_data(file, sheet):
     filepath = os.path.join(UPLOAD_FOLDER, file)
@@ -54,27 +56,30 @@ def get_sheets_data(file, sheet):
         return jsonify({"error": "File not found"}), 404
 
     try:
+        job = parse_pending(file)
+        if job:
+            return jsonify(job), 202
+
         # Get pagination and optional search
         page = int(request.args.get("page", 1))
         page_size = int(request.args.get("page_size", 50))
         search_term = request.args.get("search", "").lower()
 
-        xl = pd.ExcelFile(filepath)
-        df = xl.parse(sheet)
-        xl.close()
-
-        # Replace NaN / NaT with empty string and convert everything to string
-        df = df.fillna("").applymap(lambda x: str(x))
-
-        # Apply search if provided
+        # Apply search if provided, using the sheet's prebuilt row index
         if search_term:
-            mask = df.apply(lambda row: row.str.lower().str.contains(search_term).any(), axis=1)
-            df = df[mask]
+            rows = search_rows(filepath, sheet, search_term, lambda path: read_sheet(path, sheet))
+        else:
+            rows = sheet_length(filepath, sheet)
 
-        # Pagination
-        paged_df, total_rows = paginate(df, page, page_size)
-        preview = paged_df.to_dict(orient="records")
-        columns = df.columns.tolist()
+        # Pagination; only the rows on the page are copied out of the cache
+        page_rows, total_rows = paginate(rows, page, page_size)
+        paged_df = read_rows(filepath, sheet, page_rows)
+
+        # Replace NaN / NaT with empty string and convert the page to string
+        with stage("format"):
+            paged_df = cell_text(paged_df)
+            preview = paged_df.to_dict(orient="records")
+            columns = paged_df.columns.tolist()
 
         return jsonify({
             "columns": columns,
@@ -89,9 +94,6 @@ def get_sheets_data(file, sheet):
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
-MISSING_LABEL = "Missing"
-MISSING_LIST = ["unknown", "nknown", "invalid json", "null", "none", "empty", "missing"]
-
 @dashboard_bp.route("/get_all_columns/<file>/<sheet>", methods=["GET"])
 def get_all_columns(file, sheet):
     filepath = os.path.join(UPLOAD_FOLDER, file)
@@ -99,60 +101,15 @@ def get_all_columns(file, sheet):
         return jsonify({"error": "File not found"}), 404
 
     try:
-        df = pd.read_excel(filepath, sheet_name=sheet)
-        return jsonify({"columns": df.columns.tolist()})
+        job = parse_pending(file)
+        if job:
+            return jsonify(job), 202
+
+        return jsonify({"columns": sheet_columns(filepath, sheet)})
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
-def extract_json(value):
-    # True NaN
-    if pd.isna(value):
-        return MISSING_LABEL
-
-    # Empty containers / strings
-    if value in ["", [], {}, "[]"]:
-        return MISSING_LABEL
-
-    # String-specific checks
-    if isinstance(value, str):
-        v = value.strip().lower()
-
-        # Catch common missing/invalid indicators
-        if v in MISSING_LIST:
-            return MISSING_LABEL
-
-        # Try parsing JSON
-        if v.startswith("[{"):
-            try:
-                data = json.loads(value)
-                if isinstance(data, list) and len(data) > 0 and isinstance(data[0], dict):
-                    # Check for multiple possible keys
-                    for key in ["carrier_name", "name"]:
-                        if key in data[0]:
-                            return data[0][key] if data[0][key] else MISSING_LABEL
-                return MISSING_LABEL
-            except Exception:
-                return MISSING_LABEL
-
-    # Otherwise return the value as-is
-    return value
-
-def parse_datetime(value):
-    if pd.isna(value):
-        return None
-    try:
-        # Replace Persian/Arabic numerals with Latin digits
-        value = value.translate(str.maketrans("۰۱۲۳۴۵۶۷۸۹", "0123456789"))
-        # Try ISO parsing first
-        return datetime.fromisoformat(value)
-    except:
-        try:
-            # Fallback to generic parsing
-            return pd.to_datetime(value, errors='coerce')
-        except:
-            return None
-
 @dashboard_bp.route("/get_column_frequency/<file>/<sheet>/<column>", methods=["GET"])
 def get_column_frequency(file, sheet, column):
     file_path = os.path.join(UPLOAD_FOLDER, file)
@@ -161,37 +118,25 @@ def get_column_frequency(file, sheet, column):
         return {"error": "File not found"}
 
     try:
-        df = pd.read_excel(file_path, sheet_name=sheet)
+        job = parse_pending(file)
+        if job:
+            return jsonify(job), 202
 
-        if column not in df.columns:
+        if column not in sheet_columns(file_path, sheet):
             return {"error": f"Column '{column}' not found in the sheet."}
 
-        # Normalize values
-        df[column] = df[column].apply(extract_json)
-        df[column] = df[column].astype(str).str.strip().str.title()  # trims and standardizes
-
-        # Check for datetime column
-        df['parsed_dates'] = df[column].apply(parse_datetime)
-        if df['parsed_dates'].notna().any():
-            # Group by month
-            df['month'] = df['parsed_dates'].dt.to_period('M')
-            frequency_series = df['month'].value_counts().sort_index()
-            frequency = {str(k): int(v) for k, v in frequency_series.items()}
+        # Served from the sheet's profile once it has been built
+        profile = load_profile(file_path, sheet)
+        if profile and column in profile["frequency"]:
+            frequency = profile["frequency"][column]
         else:
-            # Normal categorical / string column
-            frequency_series = df[column].value_counts(dropna=False)
-            frequency = frequency_series.to_dict()
+            df = read_sheet(file_path, sheet, columns=[column])
 
-        # Ensure numeric values for frontend highest/lowest
-        numeric_freq = {}
-        for k, v in frequency.items():
-            if isinstance(v, (int, float)):
-                numeric_freq[k] = v
-            else:
-                numeric_freq[k] = int(v) if str(v).isdigit() else 0
+            # Normalize values once per distinct value; date columns are grouped by month
+            frequency = column_frequency(df[column])
 
-        print(numeric_freq)
-        return {"frequency": numeric_freq}
+        print(frequency)
+        return {"frequency": frequency}
 
     except Exception as e:
         traceback.print_exc()
@@ -204,50 +149,44 @@ def get_correlation_heatmap(file, sheet):
         return jsonify({"error": "File not found"}), 404
 
     try:
-        df = pd.read_excel(filepath, sheet_name=sheet)
-
-        for date_col in ['active_date', 'last_boot_date', 'interval_date']:
-            if date_col in df.columns:
-                df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+        job = parse_pending(file)
+        if job:
+            return jsonify(job), 202
 
-        if 'last_boot_date' in df.columns and 'active_date' in df.columns:
-            df['last boot - active'] = (df['last_boot_date'] - df['active_date']).dt.total_seconds() / (3600*24)
-        if 'last_boot_date' in df.columns and 'interval_date' in df.columns:
-            df['last boot - interval'] = (df['last_boot_date'] - df['interval_date']).dt.total_seconds() / (3600*24)
-
-        # Keep only numeric columns for correlation
-        numeric_df = df.select_dtypes(include=["number"])
-
-        if numeric_df.empty:
+        profile = load_profile(filepath, sheet)
+        if profile:
+            corr = profile["correlation"]
+        else:
+            # Only the numeric and date columns take part in the correlation
+            date_cols = ['active_date', 'last_boot_date', 'interval_date']
+            dtypes = sheet_dtypes(filepath, sheet)
+            columns = [
+                c for c, t in dtypes.items()
+                if c in date_cols or (pd.api.types.is_numeric_dtype(t) and not pd.api.types.is_bool_dtype(t))
+            ]
+            corr = correlation_matrix(read_sheet(filepath, sheet, columns=columns))
+
+        if corr is None:
             return jsonify({"message": "No numeric columns to calculate correlation"}), 200
 
-        # Compute correlation matrix
-        corr_df = numeric_df.corr().round(3)
-
-        # Create Plotly heatmap
-        fig = go.Figure(
-            data=go.Heatmap(
-                z=corr_df.values,
-                x=corr_df.columns,
-                y=corr_df.columns,
-                colorscale='RdBu',
+        # Heatmap payload built directly, serialized once by jsonify
+        fig = charts.figure(
+            [charts.heatmap(
+                corr["values"],
+                corr["columns"],
+                corr["columns"],
+                colorscale=charts.RDBU,
                 zmin=-1,
                 zmax=1,
-                colorbar=dict(title="Correlation")
-            )
-        )
-
-        fig.update_layout(
-            xaxis_title="Columns",
-            yaxis_title="Columns",
+                colorbar=charts.titled("Correlation")
+            )],
+            xaxis=charts.titled("Columns"),
+            yaxis=charts.titled("Columns"),
             autosize=True,
             margin=dict(l=100, r=100, t=100, b=100)
         )
 
-        # Convert figure to JSON
-        fig_json = fig.to_json()
-
-        return jsonify({"plotly_json": json.loads(fig_json)}), 200
+        return jsonify({"plotly_json": fig}), 200
 
     except Exception as e:
         traceback.print_exc()
@@ -260,53 +199,46 @@ def get_distribution_vs_churn(file, sheet, column):
         return jsonify({"error": "File not found"}), 404
 
     try:
-        df = pd.read_excel(filepath, sheet_name=sheet)
+        job = parse_pending(file)
+        if job:
+            return jsonify(job), 202
+
+        columns = sheet_columns(filepath, sheet)
 
         # Detect churn column
-        churn_cols = ['Chrn Flag', 'Churn', 'Churn Flag']
-        target = next((c for c in churn_cols if c in df.columns), None)
+        target = find_churn_column(columns)
         if target is None:
             return jsonify({"message": "No churn column found"}), 200
 
-        # Convert churn to numeric
-        df[target] = pd.to_numeric(df[target], errors="coerce").fillna(0).astype(int)
-
-        if column not in df.columns:
+        if column not in columns:
             return jsonify({"error": f"Column '{column}' not found"}), 404
 
-        # Numeric column -> boxplot
-        if pd.api.types.is_numeric_dtype(df[column]):
-            fig = go.Figure()
-            for val in sorted(df[target].unique()):
-                fig.add_trace(
-                    go.Box(
-                        y=df[df[target] == val][column],
-                        name=f"{column} (Churn={val})",
-                        boxmean='sd'
-                    )
-                )
-            fig.update_layout(title=f"{column} vs Churn", yaxis_title=column, xaxis_title="Churn")
+        profile = load_profile(filepath, sheet)
+        breakdown = profile["churn"].get(column) if profile else None
+        if breakdown is None:
+            df = read_sheet(filepath, sheet, columns=list(dict.fromkeys([column, target])))
+            breakdown = churn_breakdown(df, column, target)
+
+        # Numeric column -> boxplot from precomputed quartiles
+        if breakdown["kind"] == "box":
+            fig = charts.figure(
+                [charts.box(f"{column} (Churn={group['churn']})", group, boxmean='sd') for group in breakdown["groups"]],
+                title={"text": f"{column} vs Churn"},
+                yaxis=charts.titled(column),
+                xaxis=charts.titled("Churn")
+            )
 
         # Categorical column -> stacked bar
         else:
-            counts = df.groupby([column, target]).size().unstack(fill_value=0)
-            fig = go.Figure()
-            for churn_val in counts.columns:
-                fig.add_trace(
-                    go.Bar(
-                        x=counts.index.astype(str),
-                        y=counts[churn_val],
-                        name=f"Churn={churn_val}"
-                    )
-                )
-            fig.update_layout(
+            fig = charts.figure(
+                [charts.bar(breakdown["categories"], series["counts"], f"Churn={series['churn']}") for series in breakdown["series"]],
                 barmode='stack',
-                title=f"{column} vs Churn",
-                xaxis_title=column,
-                yaxis_title="Count"
+                title={"text": f"{column} vs Churn"},
+                xaxis=charts.titled(column),
+                yaxis=charts.titled("Count")
             )
 
-        return jsonify({"column": column, "plotly_json": json.loads(fig.to_json())}), 200
+        return jsonify({"column": column, "plotly_json": fig}), 200
 
     except Exception as e:
         traceback.print_exc()
@@ -0,0 +1,60 @@
+import json
+import time
+import traceback
+from flask import Blueprint, Response, request, jsonify
+from services import jobs
+
+jobs_bp = Blueprint("jobs", __name__)
+
+# How often the progress stream checks its job
+PROGRESS_INTERVAL = 0.25
+
+@jobs_bp.route("/jobs", methods=["GET"])
+def list_jobs():
+    try:
+        limit = int(request.args.get("limit", 100))
+        return jsonify({"jobs": jobs.list_jobs(request.args.get("status"), limit)}), 200
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@jobs_bp.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job), 200
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Server-sent events: "progress" whenever the progress or message changes,
+# then "done" with the finished job
+@jobs_bp.route("/jobs/<job_id>/progress", methods=["GET"])
+def job_progress(job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def events():
+        job = jobs.get_job(job_id)
+        last = None
+        while job["status"] not in jobs.FINISHED:
+            current = (job["status"], job["progress"], job["message"])
+            if current != last:
+                yield sse("progress", {"status": job["status"], "progress": job["progress"], "message": job["message"]})
+                last = current
+            time.sleep(PROGRESS_INTERVAL)
+            job = jobs.get_job(job_id)
+        yield sse("done", job)
+
+    return Response(events(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@jobs_bp.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if not jobs.is_cancellable(job["kind"]):
+        return jsonify({"error": f"{job['kind']} jobs can't be cancelled"}), 409
+    return jsonify(jobs.cancel(job_id)), 200
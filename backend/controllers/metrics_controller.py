@@ -0,0 +1,11 @@
+from flask import Blueprint, Response, jsonify
+from services.metrics import METRICS_ENABLED, prometheus_text
+
+metrics_bp = Blueprint("metrics", __name__)
+
+# Stage timings per route, for Prometheus to scrape
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics():
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled (METRICS_ENABLED=0)"}), 404
+    return Response(prometheus_text(), mimetype="text/plain; version=0.0.4")
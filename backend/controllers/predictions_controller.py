@@ -1,88 +1,48 @@
 import os
 import json
-from flask import Blueprint, request, jsonify, send_file, Response
-import tempfile
-import joblib
+from flask import Blueprint, request, jsonify, Response
 import pandas as pd
 import traceback
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
+from datetime import datetime
+from services.sheet_cache import read_sheet, read_rows, sheet_columns
+from services.prediction_cache import get_scores, scored_frame
+from services.search_index import cell_text, paginate, search_rows
+from services.metrics import stage
+from services.export import EXPORT_FORMATS, export_stream, format_error
+from services.model_registry import get_model, has_version, list_versions
+from services.scoring import METRICS_FILE, live_version, version_dir
+from services import jobs
+from services.workbook_jobs import parse_pending, scores_pending
 
 UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads")
+BATCH_FOLDER = os.path.join(os.getcwd(), "batch_results")
 predictions_bp = Blueprint("predictions", __name__)
 
-# Load model and preprocessor
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # folder where this file is
-MODEL_PATH = os.path.join(BASE_DIR, "..", "models", "churn_model_xgb.joblib")
-PREPROCESSOR_PATH = os.path.join(BASE_DIR, "..", "models", "preprocessor.joblib")
+# Models are loaded on first use by the registry; ?model_version= pins a
+# version by name or hash, otherwise the live model is used
+def unknown_model_version():
+    model_version = request.args.get("model_version")
+    if model_version and not has_version(model_version):
+        return jsonify({"error": f"Unknown model version '{model_version}'"}), 404
+    return None
 
-xgb_model = joblib.load(MODEL_PATH)
-preprocessor = joblib.load(PREPROCESSOR_PATH)
+def request_model():
+    return get_model(request.args.get("model_version"))
 
-target = 'Churn'
+def score_sheet(filepath, sheet, model):
+    # Probabilities and labels for every row, scored once per sheet and model version
+    return get_scores(filepath, sheet, model["version"], model["scorer"])
 
-def preprocess_sheet(df):
-    df = df.copy()
+def predictions_frame(filepath, sheet, model):
+    # Original sheet as-is plus the prediction columns
+    return scored_frame(read_sheet(filepath, sheet), score_sheet(filepath, sheet, model))
 
-    churn_cols = ['Chrn Flag', 'Churn', 'Churn Flag']
-    for col in churn_cols:
-        if col in df.columns:
-            df[target] = df[col]
-            break
-    for col in churn_cols:
-        if col in df.columns and col != target:
-            df.drop(columns=col, inplace=True)
-
-    for date_col in ['active_date', 'last_boot_date', 'interval_date']:
-        if date_col in df.columns:
-            df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-
-    df['last boot - active'] = ((df['last_boot_date'] - df['active_date']).dt.total_seconds() / (3600*24)
-                                if 'last_boot_date' in df.columns and 'active_date' in df.columns else 0)
-    df['last boot - interval'] = ((df['last_boot_date'] - df['interval_date']).dt.total_seconds() / (3600*24)
-                                  if 'interval_date' in df.columns and 'last_boot_date' in df.columns else 0)
-
-    df['last boot - active'] = df['last boot - active'].fillna(0)
-    df['last boot - interval'] = df['last boot - interval'].fillna(0)
-
-    # Ensure the relevant columns are in the dataframe
-    relevant_columns = ['last boot - active', 'last boot - interval']
-    missing_columns = [col for col in relevant_columns if col not in df.columns]
-    if missing_columns:
-        print(f"Warning: Missing columns: {', '.join(missing_columns)}")
-        raise KeyError(f"Required columns missing: {', '.join(missing_columns)}")
-
-    # Keep only the relevant columns (exclude 'Churn' from features for prediction)
-    df = df[relevant_columns]
-
-    if target in df.columns:
-        df[target] = df[target].fillna(0)
-
-    return df
-
-def predict_df(df, df_orig):
-    # Transform and predict using core_features
-    X_transformed = preprocessor.transform(df)
-
-    y_proba = xgb_model.predict_proba(X_transformed)[:, 1]
-    y_label = (y_proba >= 0.5).astype(int)
-
-    # Copy original sheet as-is
-    response = df_orig.copy()
-
-    # Add prediction columns
-    response["Churn Prediction Probability"] = y_proba
-    response["Churn Prediction"] = y_label
-
-    # Replace all NaN/NaT with empty string
-    response = response.fillna("").astype(str)
-
-    return response
-
-def paginate(df, page, page_size):
-    total = len(df)
-    start = (page - 1) * page_size
-    end = start + page_size
-    return df.iloc[start:end], total
+def predictions_rows(filepath, sheet, model, rows):
+    # Same as predictions_frame, for only the given row positions
+    scores = score_sheet(filepath, sheet, model)
+    return scored_frame(read_rows(filepath, sheet, rows),
+                        {"proba": scores["proba"][rows], "label": scores["label"][rows]})
 
 @predictions_bp.route("/predict_churn/<file>/<sheet>", methods=["GET"])
 def get_predictions(file, sheet):
@@ -94,24 +54,37 @@ def get_predictions(file, sheet):
     page = int(request.args.get("page", 1))
     page_size = int(request.args.get("page_size", 20))
     search_term = request.args.get("search", "").lower()
+    error = unknown_model_version()
+    if error:
+        return error
 
     try:
-        df = pd.read_excel(filepath, sheet_name=sheet)
-        df_orig = df.copy()
-        df = preprocess_sheet(df)
-        response_df = predict_df(df, df_orig)
+        model = request_model()
+        job = scores_pending(file, sheet, model)
+        if job:
+            return jsonify(job), 202
 
+        # Search the scored rows through an index built once per model version
         if search_term:
-            mask = response_df.apply(lambda row: row.astype(str).str.contains(search_term, case=False).any(), axis=1)
-            response_df = response_df[mask]
+            rows = search_rows(filepath, sheet, search_term, lambda path: predictions_frame(path, sheet, model),
+                               variant=("predictions", model["version"]))
+        else:
+            rows = len(score_sheet(filepath, sheet, model)["label"])
 
-        paged_df, total = paginate(response_df, page, page_size)
+        page_rows, total = paginate(rows, page, page_size)
         total_pages = (total + page_size - 1) // page_size
 
+        # Replace all NaN/NaT with empty string, on the page only
+        paged_df = predictions_rows(filepath, sheet, model, page_rows)
+        with stage("format"):
+            paged_df = cell_text(paged_df)
+            preview = paged_df.to_dict(orient="records")
+
         return jsonify({
-            "preview": paged_df.to_dict(orient="records"),
-            "columns": list(response_df.columns),
-            "total_pages": total_pages
+            "preview": preview,
+            "columns": list(paged_df.columns),
+            "total_pages": total_pages,
+            "model_version": model["version"]
         }), 200
     except Exception as e:
         traceback.print_exc()
@@ -124,25 +97,30 @@ def download_predictions(file, sheet):
     if not os.path.exists(filepath):
         return jsonify({"error": "File not found"}), 404
 
+    export_format = request.args.get("format", "xlsx").lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format '{export_format}'"}), 400
+    error = unknown_model_version()
+    if error:
+        return error
+
     try:
-        # Load the Excel file
-        df = pd.read_excel(filepath, sheet_name=sheet)
-        df_orig = df.copy()
-        df = preprocess_sheet(df)  # Preprocess the data
-        response_df = predict_df(df, df_orig)  # Generate predictions
-        
-        # Create a temporary file to store the Excel output
-        with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as tmp_file:
-            output_path = tmp_file.name
-            response_df.to_excel(output_path, index=False)
-            tmp_file.close()  # Close the file explicitly
-
-        # Send the generated file to the client
-        return send_file(output_path, 
-                         as_attachment=True, 
-                         download_name="predictions.xlsx", 
-                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    
+        model = request_model()
+        job = scores_pending(file, sheet, model)
+        if job:
+            return jsonify(job), 202
+        response_df = predictions_frame(filepath, sheet, model)
+        error = format_error(response_df, export_format)
+        if error:
+            return jsonify({"error": error}), 400
+
+        # Written and sent in row chunks; temp files are removed once sent
+        return Response(
+            export_stream(response_df, export_format),
+            mimetype=EXPORT_FORMATS[export_format],
+            headers={"Content-Disposition": f"attachment; filename=predictions.{export_format}"}
+        )
+
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
@@ -152,24 +130,29 @@ def predictions_stats(file, sheet):
     filepath = os.path.join(UPLOAD_FOLDER, file)
     if not os.path.exists(filepath):
         return jsonify({"error": "File not found"}), 404
+    error = unknown_model_version()
+    if error:
+        return error
 
     try:
-        df = pd.read_excel(filepath, sheet_name=sheet)
-        df_orig = df.copy()
-        df = preprocess_sheet(df)
-        response_df = predict_df(df, df_orig)
+        model = request_model()
+        job = scores_pending(file, sheet, model)
+        if job:
+            return jsonify(job), 202
+        scores = score_sheet(filepath, sheet, model)
 
         # Compute statistics
-        total = len(response_df)
-        churn_count = (response_df["Churn Prediction"] == "1").sum()
+        total = len(scores["label"])
+        churn_count = scores["label"].sum()
         non_churn_count = total - churn_count
-        avg_prob = response_df["Churn Prediction Probability"].astype(float).mean()
+        avg_prob = scores["proba"].astype(float).mean()
 
         stats = {
             "total_rows": total,
             "churn_count": int(churn_count),
             "non_churn_count": int(non_churn_count),
-            "average_probability": float(avg_prob)
+            "average_probability": float(avg_prob),
+            "model_version": model["version"]
         }
 
         return jsonify(stats), 200
@@ -183,16 +166,26 @@ def model_accuracy(file, sheet):
     filepath = os.path.join(UPLOAD_FOLDER, file)
     if not os.path.exists(filepath):
         return jsonify({"error": "File not found"}), 404
+    error = unknown_model_version()
+    if error:
+        return error
 
     try:
-        df = pd.read_excel(filepath, sheet_name=sheet)
+        job = parse_pending(file)
+        if job:
+            return jsonify(job), 202
+        columns = sheet_columns(filepath, sheet)
 
         # Find churn column
         churn_cols = ['Chrn Flag', 'Churn', 'Churn Flag']
-        churn_col_found = next((col for col in churn_cols if col in df.columns), None)
+        churn_col_found = next((col for col in churn_cols if col in columns), None)
         if churn_col_found is None:
             return jsonify({"message": "No churn column found in this sheet"}), 200
 
+        # Only the label and the date columns the features are built from
+        date_cols = ['active_date', 'last_boot_date', 'interval_date']
+        df = read_sheet(filepath, sheet, columns=[c for c in columns if c in churn_cols or c in date_cols])
+
         # Convert churn column to numeric safely
         y_true_raw = pd.to_numeric(df[churn_col_found], errors="coerce")
 
@@ -205,13 +198,8 @@ def model_accuracy(file, sheet):
         y_true = y_true_raw[valid_mask].astype(int)
         df_valid = df.loc[valid_mask].copy()
 
-        # Preprocess features
-        df_features = preprocess_sheet(df_valid)
-        X_transformed = preprocessor.transform(df_features)
-
-        # Predict
-        y_pred = xgb_model.predict(X_transformed)
-        y_proba = xgb_model.predict_proba(X_transformed)[:, 1]
+        # Predict once; the labels come from the same probabilities
+        y_proba, y_pred = request_model()["scorer"](df_valid)
 
         # Compute metrics
         report_raw = classification_report(
@@ -248,12 +236,16 @@ def model_accuracy(file, sheet):
 
 @predictions_bp.route("/feature_importance", methods=["GET"])
 def feature_importance():
+    error = unknown_model_version()
+    if error:
+        return error
+
     try:
         # Must match the feature order used during training
         feature_names = ['last boot - active', 'last boot - interval']
 
         # Get raw importance scores from XGBoost model
-        importances = xgb_model.feature_importances_
+        importances = request_model()["model"].feature_importances_
 
         # Normalize to percentage
         total = importances.sum()
@@ -274,7 +266,8 @@ def feature_importance():
 @predictions_bp.route("/model_training_metrics", methods=["GET"])
 def model_training_metrics():
     try:
-        metrics_path = './backend/models/model_metrics.json'
+        # Saved with the live version
+        metrics_path = os.path.join(version_dir(live_version()), METRICS_FILE)
         if not os.path.exists(metrics_path):
             return jsonify({"error": "Metrics file not found"}), 404
 
@@ -286,3 +279,48 @@ def model_training_metrics():
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
+
+@predictions_bp.route("/batch_predict", methods=["POST"])
+def batch_predict():
+    # Body: {"items": [{"file": "a.xls", "sheets": ["B30 Pro", "N10"]}, ...],
+    #        "format": "csv", "workers": 4}; omitted sheets means all sheets
+    body = request.json or {}
+    items = body.get("items", [])
+    if not items:
+        return jsonify({"error": "No files to score"}), 400
+
+    export_format = body.get("format", "csv").lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format '{export_format}'"}), 400
+    model_version = body.get("model_version")
+    if model_version and not has_version(model_version):
+        return jsonify({"error": f"Unknown model version '{model_version}'"}), 404
+
+    try:
+        for item in items:
+            filepath = os.path.join(UPLOAD_FOLDER, item.get("file", ""))
+            if not item.get("file") or not os.path.exists(filepath):
+                return jsonify({"error": f"File not found: {item.get('file')}"}), 404
+
+        # Runs as a job; answers 202 with it if the batch takes longer than the wait
+        output_dir = os.path.join(BATCH_FOLDER, datetime.now().strftime("%Y%m%d-%H%M%S-%f"))
+        job = jobs.submit("batch", items=[{"file": item["file"], "sheets": item.get("sheets")} for item in items],
+                          output_dir=output_dir, workers=body.get("workers"), format=export_format,
+                          model_version=model_version)
+        job = jobs.wait(job["job_id"])
+        if job["status"] == "failed":
+            raise RuntimeError(job["error"])
+        if job["status"] != "done":
+            return jsonify(job), 202
+        return jsonify(job["result"]), 200
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@predictions_bp.route("/model_versions", methods=["GET"])
+def model_versions():
+    try:
+        return jsonify({"versions": list_versions()}), 200
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
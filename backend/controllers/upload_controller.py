@@ -1,5 +1,9 @@
 import os
 from flask import Blueprint, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
+from services.metrics import stage
+from services.upload_store import store_upload
+from services import jobs
 
 upload_bp = Blueprint("upload", __name__)
 
@@ -7,6 +11,10 @@ upload_bp = Blueprint("upload", __name__)
 UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+@upload_bp.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    return jsonify({"error": e.description}), 413
+
 @upload_bp.route("/upload", methods=["POST"])
 def upload_files():
     if "files" not in request.files:
@@ -14,12 +22,24 @@ def upload_files():
 
     files = request.files.getlist("files")
     saved_files = []
+    uploads = []
+    parse_jobs = []
 
     for f in files:
-        # Save each file
-        filepath = os.path.join(UPLOAD_FOLDER, f.filename)
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        f.save(filepath)
-        saved_files.append(f.filename)
+        # Stored once per content; the file name becomes a link to it
+        try:
+            with stage("save"):
+                stored = store_upload(UPLOAD_FOLDER, f.filename, f.stream)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Parsing (Parquet copies, profiles, chat indexes) and scoring run as
+        # jobs; none is queued when the same content was uploaded before
+        job = jobs.submit("parse", file=stored["name"])
+        saved_files.append(stored["name"])
+        uploads.append(stored)
+        if job:
+            parse_jobs.append(job)
 
-    return jsonify({"message": "Files uploaded successfully", "files": saved_files}), 200
+    return jsonify({"message": "Files uploaded successfully", "files": saved_files, "uploads": uploads,
+                    "jobs": parse_jobs}), 200
@@ -1,6 +1,15 @@
-import pandas as pd
-from pathlib import Path
+import os
+import sys
 import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from imblearn.over_sampling import SMOTE
@@ -8,118 +17,244 @@ from sklearn.metrics import classification_report, confusion_matrix, roc_auc_sco
 import xgboost as xgb
 import joblib
 
-# Load the Excel file
-filepath = "backend/userfiles/UW_Churn_Pred_Data.xls"
-xls = pd.ExcelFile(filepath)
+# Trains the churn model. Run from the repository root, e.g.
+#   python backend/models/model.py --files backend/userfiles/UW_Churn_Pred_Data.xls --sheets "B30 Pro"
+# Every run writes a versioned folder under models/versions/ and, unless
+# --no-promote is given, points models/current.json, which names the version
+# the app serves, at it.
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+VERSIONS_DIR = os.path.join(MODELS_DIR, "versions")
+CACHE_DIR = os.path.join(MODELS_DIR, ".cache")
+MODEL_FILE = "churn_model_xgb.joblib"
+PREPROCESSOR_FILE = "preprocessor.joblib"
+METRICS_FILE = "model_metrics.json"
+LIVE_POINTER = os.path.join(MODELS_DIR, "current.json")
+
+DEFAULT_FILES = ["backend/userfiles/UW_Churn_Pred_Data.xls"]
+DEFAULT_SHEETS = ["B30 Pro"]
+DEFAULT_FEATURES = ['last boot - active', 'last boot - interval']
 
 # List of churn-related columns we want to unify
 churn_cols = ['Chrn Flag', 'Churn', 'Churn Flag']
 
-# Load all sheets into a dictionary of dataframes
-dfs = {s: pd.read_excel(xls, sheet_name=s) for s in xls.sheet_names}
-
-# Loop through each sheet and clean the churn column
-for name, df in dfs.items():
-    # Find the churn column and standardize the name
-    for col in churn_cols:
-        if col in df.columns:
-            df['Churn'] = df[col]  # unify churn column
-            break
-    # Drop the original churn-like columns after renaming
-    for col in churn_cols:
-        if col in df.columns and col != 'Churn':
-            df.drop(columns=col, inplace=True)
-
-# Focus on the "B30 Pro" sheet for training the model
-df_b30 = dfs["B30 Pro"]
-
-# Filter out rows where Churn is missing
-df_b30_filtered = df_b30.dropna(subset=['Churn'])
-
-# Focus only on 'last boot - active' and 'last boot - interval' columns for features
-X = df_b30_filtered[['last boot - active', 'last boot - interval']]
-y = df_b30_filtered['Churn']
-
-# Split the dataset into training and testing sets (80% train, 20% test)
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# Handle class imbalance using SMOTE (Synthetic Minority Over-sampling Technique)
-smote = SMOTE(random_state=42)
-X_train_resampled, y_train_resampled = smote.fit_resample(X_train, y_train)
-
-# Scale the numerical features (StandardScaler)
-scaler = StandardScaler()
-X_train_resampled_scaled = scaler.fit_transform(X_train_resampled)
-X_test_scaled = scaler.transform(X_test)
-
-# Initialize the XGBoost Classifier
-xgb_model = xgb.XGBClassifier(
-    scale_pos_weight=5,  # Adjust this for class imbalance
-    random_state=42,
-    eval_metric='logloss'  # Avoid warning related to XGBoost 1.3+
-)
-
-# Train the XGBoost model
-xgb_model.fit(X_train_resampled_scaled, y_train_resampled)
-
-# Predict
-y_pred = xgb_model.predict(X_test_scaled)
-y_pred_proba = xgb_model.predict_proba(X_test_scaled)[:, 1]
-
-# Print the classification report and confusion matrix
-print("Classification Report:")
-print(classification_report(y_test, y_pred))
-
-print("Confusion Matrix:")
-print(confusion_matrix(y_test, y_pred))
-
-# Calculate and print the AUC-ROC score
-print("AUC-ROC Score:", roc_auc_score(y_test, y_pred_proba))
-
-# Save the model
-joblib.dump(xgb_model, './backend/models/churn_model_xgb.joblib')
-
-# Save the preprocessor (scaler)
-joblib.dump(scaler, './backend/models/preprocessor.joblib')
-
-metrics = {
-    "classification_report": classification_report(y_test, y_pred, output_dict=True),
-    "confusion_matrix": confusion_matrix(y_test, y_pred).tolist(),
-    "roc_auc": roc_auc_score(y_test, y_pred_proba)
+# Features that can be computed when a sheet only has the dates
+DERIVED_FEATURES = {
+    'last boot - active': ('last_boot_date', 'active_date'),
+    'last boot - interval': ('last_boot_date', 'interval_date')
 }
 
-metrics_path = Path('./backend/models/model_metrics.json')
-with open(metrics_path, 'w') as f:
-    json.dump(metrics, f, indent=2)
+timings = {}
+
+@contextmanager
+def stage(name):
+    # Wall time per pipeline stage, reported at the end and saved with the metrics
+    started = time.perf_counter()
+    yield
+    timings[name] = round(time.perf_counter() - started, 3)
+    print(f"[{name}] {timings[name]:.3f}s")
+
+def file_digest(filepath, sheets, features):
+    st = os.stat(filepath)
+    key = json.dumps([os.path.abspath(filepath), st.st_mtime_ns, st.st_size, sheets, features])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+def read_features(filepath, sheets, features):
+    # Only the wanted sheets, and only the columns the features and label need
+    needed = set(features) | set(churn_cols)
+    for feature in features:
+        needed.update(DERIVED_FEATURES.get(feature, ()))
+
+    xls = pd.ExcelFile(filepath)
+    frames = []
+    for sheet in [s for s in sheets if s in xls.sheet_names]:
+        df = pd.read_excel(xls, sheet_name=sheet, usecols=lambda c: c in needed)
+
+        # Find the churn column and standardize the name
+        target = next((c for c in churn_cols if c in df.columns), None)
+        if target is None:
+            print(f"Skipping {os.path.basename(filepath)} / {sheet}: no churn column")
+            continue
+        df['Churn'] = df[target]
+
+        for feature in features:
+            if feature not in df.columns and feature in DERIVED_FEATURES:
+                end, start = DERIVED_FEATURES[feature]
+                delta = pd.to_datetime(df[end], errors='coerce') - pd.to_datetime(df[start], errors='coerce')
+                df[feature] = delta.dt.total_seconds() / (3600*24)
+
+        # Filter out rows where Churn is missing
+        df = df.dropna(subset=['Churn'])
+        frames.append(df[features + ['Churn']])
+
+    if not frames:
+        raise ValueError(f"None of the sheets {sheets} in {filepath} can be used for training")
+    return pd.concat(frames, ignore_index=True)
+
+def load_dataset(files, sheets, features, use_cache=True):
+    # Feature matrix and labels, cached per source file version so repeated
+    # training runs skip the Excel parse
+    X_parts, y_parts = [], []
+    for filepath in files:
+        cache_path = os.path.join(CACHE_DIR, f"{file_digest(filepath, sheets, features)}.npz")
+        if use_cache and os.path.exists(cache_path):
+            cached = np.load(cache_path)
+            X_parts.append(cached["X"])
+            y_parts.append(cached["y"])
+            continue
+
+        df = read_features(filepath, sheets, features)
+        X = df[features].to_numpy(dtype=np.float32)
+        y = pd.to_numeric(df['Churn'], errors='coerce').fillna(0).astype(np.int32).to_numpy()
+        if use_cache:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            np.savez(cache_path, X=X, y=y)
+        X_parts.append(X)
+        y_parts.append(y)
+    return np.concatenate(X_parts), np.concatenate(y_parts)
+
+def xgb_params(args):
+    return {
+        "objective": "binary:logistic",
+        "eval_metric": "logloss",
+        "tree_method": "hist",
+        "nthread": args.threads or os.cpu_count(),
+        "max_depth": args.max_depth,
+        "learning_rate": args.learning_rate,
+        "scale_pos_weight": args.scale_pos_weight,  # Adjust this for class imbalance
+        "seed": 42
+    }
+
+def train(args):
+    timings.clear()
+
+    with stage("read"):
+        X, y = load_dataset(args.files, args.sheets, args.features, use_cache=not args.no_cache)
+        # Missing feature values count as 0 days, as at scoring time
+        X = np.nan_to_num(X, nan=0.0)
+
+    with stage("split"):
+        # Split the dataset into training and testing sets (80% train, 20% test),
+        # and hold part of the training set out for early stopping
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=args.test_size, random_state=42)
+        X_train, X_valid, y_train, y_valid = train_test_split(X_train, y_train, test_size=args.valid_size, random_state=42)
+
+    with stage("resample"):
+        # Handle class imbalance using SMOTE (Synthetic Minority Over-sampling Technique)
+        if not args.no_smote:
+            X_train, y_train = SMOTE(random_state=42).fit_resample(X_train, y_train)
+
+    with stage("scale"):
+        scaler = StandardScaler()
+        X_train = scaler.fit_transform(X_train).astype(np.float32)
+        X_valid = scaler.transform(X_valid).astype(np.float32)
+        X_test = scaler.transform(X_test).astype(np.float32)
+
+    with stage("dmatrix"):
+        # Quantized once and shared by every boosting round
+        dtrain = xgb.QuantileDMatrix(X_train, label=y_train, feature_names=args.features)
+        dvalid = xgb.QuantileDMatrix(X_valid, label=y_valid, feature_names=args.features, ref=dtrain)
+
+    with stage("train"):
+        booster = xgb.train(
+            xgb_params(args), dtrain,
+            num_boost_round=args.max_rounds,
+            evals=[(dvalid, "valid")],
+            early_stopping_rounds=args.early_stopping,
+            verbose_eval=False
+        )
+
+    with stage("evaluate"):
+        # Only the trees up to the best round
+        y_pred_proba = booster.inplace_predict(X_test, iteration_range=(0, booster.best_iteration + 1))
+        y_pred = (y_pred_proba >= 0.5).astype(int)
+
+        # Print the classification report and confusion matrix
+        print("Classification Report:")
+        print(classification_report(y_test, y_pred))
+        print("Confusion Matrix:")
+        print(confusion_matrix(y_test, y_pred))
+        print("AUC-ROC Score:", roc_auc_score(y_test, y_pred_proba))
+
+    metrics = {
+        "classification_report": classification_report(y_test, y_pred, output_dict=True),
+        "confusion_matrix": confusion_matrix(y_test, y_pred).tolist(),
+        "roc_auc": roc_auc_score(y_test, y_pred_proba),
+        "best_iteration": int(booster.best_iteration),
+        "params": xgb_params(args),
+        "features": args.features,
+        "rows": {"train": int(len(y_train)), "valid": int(len(y_valid)), "test": int(len(y_test))}
+    }
+    return booster, scaler, metrics
 
-# # Focus on the "N10" sheet for prediction
-# df_n10 = dfs["N10"]
+def to_classifier(booster):
+    # The app loads an sklearn-style XGBClassifier; keep only the best rounds
+    booster = booster[: booster.best_iteration + 1]
+    model = xgb.XGBClassifier()
+    model.load_model(bytearray(booster.save_raw("json")))
+    return model
 
-# # Filter out rows where Churn is missing in the N10 sheet (for evaluation purposes)
-# df_n10_filtered = df_n10.dropna(subset=['Churn'])
+def save_version(booster, scaler, metrics, args):
+    # Written to a hidden folder renamed into place once complete; a version
+    # folder is never changed after that
+    version = args.version or datetime.now().strftime("%Y%m%d-%H%M%S")
+    out_dir = os.path.join(VERSIONS_DIR, version)
+    if os.path.exists(out_dir):
+        raise FileExistsError(f"Version '{version}' already exists")
+    os.makedirs(VERSIONS_DIR, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=VERSIONS_DIR, prefix=f".{version}.")
 
-# # Focus on 'last boot - active' and 'last boot - interval' columns for features in N10
-# X_n10 = df_n10_filtered[['last boot - active', 'last boot - interval']]
-# y_n10 = df_n10_filtered['Churn']
+    try:
+        metrics = {**metrics, "version": version, "timings": dict(timings)}
+        joblib.dump(to_classifier(booster), os.path.join(tmp_dir, MODEL_FILE))
+        joblib.dump(scaler, os.path.join(tmp_dir, PREPROCESSOR_FILE))
+        booster.save_model(os.path.join(tmp_dir, "churn_model_xgb.json"))
+        with open(os.path.join(tmp_dir, METRICS_FILE), "w") as f:
+            json.dump(metrics, f, indent=2)
+        os.rename(tmp_dir, out_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return out_dir
 
-# # Scale the features for prediction
-# X_n10_scaled = scaler.transform(X_n10)
+def promote(version_dir):
+    # Makes the version live by replacing the pointer naming it, so the app
+    # switches from one complete version to the next in a single step
+    tmp_path = f"{LIVE_POINTER}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": os.path.basename(os.path.normpath(version_dir))}, f)
+    os.replace(tmp_path, LIVE_POINTER)
 
-# # Predict churn using the trained XGBoost model
-# y_pred_n10 = xgb_model.predict(X_n10_scaled)
-# y_pred_proba_n10 = xgb_model.predict_proba(X_n10_scaled)[:, 1]
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the churn model")
+    parser.add_argument("--files", nargs="+", default=DEFAULT_FILES, help="Excel workbooks to train on")
+    parser.add_argument("--sheets", nargs="+", default=DEFAULT_SHEETS, help="Sheets to read from every file")
+    parser.add_argument("--features", nargs="+", default=DEFAULT_FEATURES)
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--valid-size", type=float, default=0.1, help="Share of the training rows used for early stopping")
+    parser.add_argument("--max-rounds", type=int, default=1000)
+    parser.add_argument("--early-stopping", type=int, default=50)
+    parser.add_argument("--learning-rate", type=float, default=0.3)
+    parser.add_argument("--max-depth", type=int, default=6)
+    parser.add_argument("--scale-pos-weight", type=float, default=5)
+    parser.add_argument("--threads", type=int, default=0, help="0 uses every core")
+    parser.add_argument("--no-smote", action="store_true")
+    parser.add_argument("--no-cache", action="store_true", help="Re-read the Excel files")
+    parser.add_argument("--version", help="Name of the version folder (default: timestamp)")
+    parser.add_argument("--no-promote", action="store_true", help="Don't replace the live model")
+    return parser.parse_args(argv)
 
-# # Print the classification report and confusion matrix for N10 sheet
-# print("Classification Report (N10 Sheet):")
-# print(classification_report(y_n10, y_pred_n10))
+def main(argv=None):
+    args = parse_args(argv)
+    started = time.perf_counter()
+    booster, scaler, metrics = train(args)
 
-# print("Confusion Matrix (N10 Sheet):")
-# print(confusion_matrix(y_n10, y_pred_n10))
+    with stage("save"):
+        out_dir = save_version(booster, scaler, metrics, args)
+        if not args.no_promote:
+            promote(out_dir)
 
-# # Calculate and print the AUC-ROC score for the N10 predictions
-# print("AUC-ROC Score (N10 Sheet):", roc_auc_score(y_n10, y_pred_proba_n10))
+    print(f"Saved {out_dir}{'' if args.no_promote else ' (live)'}")
+    print("Stage times: " + ", ".join(f"{k} {v:.3f}s" for k, v in timings.items()))
+    print(f"Total: {time.perf_counter() - started:.3f}s")
 
-# # Compare the predicted churn vs. actual churn for rows with known churn
-# comparison = pd.DataFrame({'Actual Churn': y_n10, 'Predicted Churn': y_pred_n10})
-# print("\nComparison of Actual vs Predicted Churn (N10 Sheet):")
-# print(comparison)
\ No newline at end of file
+if __name__ == "__main__":
+    main(sys.argv[1:])
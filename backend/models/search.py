@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+from sklearn.model_selection import StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import roc_auc_score
+from imblearn.over_sampling import SMOTE, ADASYN, BorderlineSMOTE, RandomOverSampler
+from imblearn.under_sampling import RandomUnderSampler
+import xgboost as xgb
+
+from model import DEFAULT_FILES, DEFAULT_SHEETS, DEFAULT_FEATURES, MODELS_DIR, load_dataset, stage, timings
+
+# Hyperparameter and resampling search for the churn model. Run from the
+# repository root, e.g.
+#   python backend/models/search.py --files backend/userfiles/UW_Churn_Pred_Data.xls --samples 40
+# Folds are split, resampled and scaled once per strategy up front; every
+# candidate then trains on the same fold arrays in a process pool. The
+# leaderboard ranks AUC against training and per-row scoring time.
+SEARCH_DIR = os.path.join(MODELS_DIR, "search")
+
+RESAMPLERS = {
+    "none": lambda: None,
+    "smote": lambda: SMOTE(random_state=42),
+    "borderline_smote": lambda: BorderlineSMOTE(random_state=42),
+    "adasyn": lambda: ADASYN(random_state=42),
+    "random_over": lambda: RandomOverSampler(random_state=42),
+    "random_under": lambda: RandomUnderSampler(random_state=42)
+}
+
+PARAM_GRID = {
+    "max_depth": [3, 4, 6, 8],
+    "learning_rate": [0.03, 0.1, 0.3],
+    "n_estimators": [100, 300, 600],
+    "scale_pos_weight": [1, 5],
+    "min_child_weight": [1, 5],
+    "subsample": [0.8, 1.0]
+}
+
+def candidates(grid, samples, seed=42):
+    # Every combination, or a random sample of them
+    keys = list(grid)
+    combos = [dict(zip(keys, values)) for values in itertools.product(*grid.values())]
+    if samples and samples < len(combos):
+        combos = random.Random(seed).sample(combos, samples)
+    return combos
+
+def prepare_folds(X, y, strategies, n_folds, out_dir):
+    # One .npz per (strategy, fold): resampled + scaled train rows and the
+    # scaled held-out rows. Written once, read by every worker.
+    paths = {}
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42)
+    for fold, (train_idx, test_idx) in enumerate(splitter.split(X, y)):
+        for strategy in strategies:
+            X_train, y_train = X[train_idx], y[train_idx]
+            resampler = RESAMPLERS[strategy]()
+            if resampler is not None:
+                X_train, y_train = resampler.fit_resample(X_train, y_train)
+            scaler = StandardScaler().fit(X_train)
+            path = os.path.join(out_dir, f"{strategy}_{fold}.npz")
+            np.savez(
+                path,
+                X_train=np.ascontiguousarray(scaler.transform(X_train), dtype=np.float32), y_train=y_train,
+                X_test=np.ascontiguousarray(scaler.transform(X[test_idx]), dtype=np.float32), y_test=y[test_idx]
+            )
+            paths[(strategy, fold)] = path
+    return paths
+
+_folds = {}
+
+def _init_worker(paths):
+    # Each worker loads the fold arrays once and keeps them for every task
+    for key, path in paths.items():
+        with np.load(path) as data:
+            _folds[key] = {name: data[name] for name in data.files}
+
+def evaluate(params, strategy, fold):
+    data = _folds[(strategy, fold)]
+    train_params = {k: v for k, v in params.items() if k != "n_estimators"}
+    train_params.update({"objective": "binary:logistic", "tree_method": "hist", "nthread": 1, "seed": 42})
+
+    started = time.perf_counter()
+    dtrain = xgb.QuantileDMatrix(data["X_train"], label=data["y_train"])
+    booster = xgb.train(train_params, dtrain, num_boost_round=params["n_estimators"])
+    train_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    proba = booster.inplace_predict(data["X_test"])
+    predict_seconds = time.perf_counter() - started
+
+    y_test = data["y_test"]
+    auc = roc_auc_score(y_test, proba) if len(np.unique(y_test)) > 1 else float("nan")
+    return {"auc": auc, "train_seconds": train_seconds, "predict_us_per_row": predict_seconds / len(y_test) * 1e6}
+
+def leaderboard(results, latency_budget_us=None):
+    rows = []
+    for (index, strategy), folds in results.items():
+        params, fold_results = folds["params"], folds["folds"]
+        aucs = [r["auc"] for r in fold_results]
+        row = {
+            "params": params,
+            "resampler": strategy,
+            "auc_mean": float(np.nanmean(aucs)),
+            "auc_std": float(np.nanstd(aucs)),
+            "train_seconds": float(np.mean([r["train_seconds"] for r in fold_results])),
+            "predict_us_per_row": float(np.mean([r["predict_us_per_row"] for r in fold_results]))
+        }
+        if latency_budget_us is not None:
+            row["within_budget"] = row["predict_us_per_row"] <= latency_budget_us
+        rows.append(row)
+    return sorted(rows, key=lambda r: r["auc_mean"], reverse=True)
+
+def print_leaderboard(rows, top):
+    print(f"{'#':>3} {'AUC':>7} {'±':>6} {'train s':>8} {'µs/row':>8}  resampler        params")
+    for i, row in enumerate(rows[:top], 1):
+        flag = "" if row.get("within_budget", True) else "  (over budget)"
+        params = " ".join(f"{k}={v}" for k, v in row["params"].items())
+        print(f"{i:>3} {row['auc_mean']:7.4f} {row['auc_std']:6.4f} {row['train_seconds']:8.3f} "
+              f"{row['predict_us_per_row']:8.3f}  {row['resampler']:<16} {params}{flag}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Search XGBoost parameters and resampling for the churn model")
+    parser.add_argument("--files", nargs="+", default=DEFAULT_FILES)
+    parser.add_argument("--sheets", nargs="+", default=DEFAULT_SHEETS)
+    parser.add_argument("--features", nargs="+", default=DEFAULT_FEATURES)
+    parser.add_argument("--resamplers", nargs="+", default=list(RESAMPLERS), choices=list(RESAMPLERS))
+    parser.add_argument("--samples", type=int, default=30, help="Random parameter sets to try (0: the whole grid)")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--latency-budget-us", type=float, help="Max scoring time per row for the pick")
+    parser.add_argument("--top", type=int, default=15, help="Leaderboard rows to print")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    timings.clear()
+    started = time.perf_counter()
+
+    with stage("read"):
+        X, y = load_dataset(args.files, args.sheets, args.features)
+        X = np.nan_to_num(X, nan=0.0)
+
+    param_sets = candidates(PARAM_GRID, args.samples)
+    with tempfile.TemporaryDirectory(prefix="churn_folds_") as fold_dir:
+        with stage("folds"):
+            paths = prepare_folds(X, y, args.resamplers, args.folds, fold_dir)
+
+        with stage("search"):
+            results = {}
+            with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(paths,)) as pool:
+                futures = {}
+                for index, params in enumerate(param_sets):
+                    for strategy in args.resamplers:
+                        results[(index, strategy)] = {"params": params, "folds": []}
+                        for fold in range(args.folds):
+                            futures[pool.submit(evaluate, params, strategy, fold)] = (index, strategy)
+                for future, key in futures.items():
+                    results[key]["folds"].append(future.result())
+
+    rows = leaderboard(results, args.latency_budget_us)
+    print_leaderboard(rows, args.top)
+
+    pick = next((r for r in rows if r.get("within_budget", True)), None)
+    if pick:
+        print(f"Best{' within budget' if args.latency_budget_us else ''}: AUC {pick['auc_mean']:.4f}, "
+              f"{pick['predict_us_per_row']:.3f} µs/row, {pick['resampler']}, {pick['params']}")
+
+    out_dir = os.path.join(SEARCH_DIR, datetime.now().strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "leaderboard.json"), "w") as f:
+        json.dump({"pick": pick, "leaderboard": rows, "timings": dict(timings),
+                   "candidates": len(param_sets) * len(args.resamplers), "folds": args.folds}, f, indent=2)
+    print(f"Leaderboard saved to {out_dir}")
+    print("Stage times: " + ", ".join(f"{k} {v:.3f}s" for k, v in timings.items()))
+    print(f"Total: {time.perf_counter() - started:.3f}s")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
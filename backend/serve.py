@@ -0,0 +1,192 @@
+import os
+import gc
+import sys
+import time
+import signal
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import traceback
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+# Production server. The master process imports the app and loads the live
+# XGBoost model and its scaler once, opens the listening socket, then forks
+# worker processes that each serve it with a threaded werkzeug server. The
+# workers share the master's model memory copy-on-write: the collector is
+# off in the master and its objects are frozen before every fork, so
+# collections in the workers don't write to those pages. Run from the
+# repository root, like app.py:
+#   python backend/serve.py --workers 4 --port 5001
+# SIGHUP reloads gracefully: the master reloads the live model if its files
+# changed and forks new workers; the old ones finish their requests and jobs,
+# then exit. Code changes need a restart. SIGTERM or Ctrl+C stops the same way.
+# Background jobs of a worker that died are taken over by the others.
+# Caches (sheets, scores, ...) are per worker, and so is the Ollama
+# concurrency cap: up to workers x OLLAMA_MAX_CONCURRENCY chats at once.
+# /metrics adds up every worker's numbers through a shared folder
+# (METRICS_DIR, a temporary one unless set).
+SERVE_HOST = os.environ.get("SERVE_HOST", "127.0.0.1")
+SERVE_PORT = int(os.environ.get("SERVE_PORT", 5001))
+SERVE_WORKERS = int(os.environ.get("SERVE_WORKERS", os.cpu_count() or 1))
+# Seconds a stopping worker gets to finish before it is killed
+SERVE_GRACEFUL_TIMEOUT = int(os.environ.get("SERVE_GRACEFUL_TIMEOUT", 30))
+# Idle keep-alive connections are closed after this many seconds, so they
+# don't hold up a stopping worker
+SERVE_KEEPALIVE_SECONDS = int(os.environ.get("SERVE_KEEPALIVE_SECONDS", 5))
+BACKLOG = 2048
+TICK_SECONDS = 0.5
+
+class RequestHandler(WSGIRequestHandler):
+    timeout = SERVE_KEEPALIVE_SECONDS
+
+def load_app():
+    # Everything loaded here is shared by the workers
+    from app import app
+    from services.model_registry import get_model
+    get_model()
+    return app
+
+def run_worker(app, sock):
+    gc.enable()
+    from services import jobs, metrics
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, app, threaded=True, request_handler=RequestHandler, fd=sock.fileno())
+    # Shutting down waits for the requests in flight
+    server.daemon_threads = False
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    # Ctrl+C reaches every process; the master stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    # Every worker sweeps for jobs that processes gone meanwhile left behind
+    jobs.resume()
+    metrics.start_sync()
+    server.serve_forever()
+    jobs.shutdown()
+    if metrics.METRICS_ENABLED and metrics.METRICS_DIR:
+        metrics.write_snapshot()
+
+class Master:
+    def __init__(self, app, sock, workers):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.children = {}  # pid -> generation
+        self.deadlines = {}  # pid -> when a stopping worker gets killed
+        self.generation = 0
+        self.reloading = False
+        self.stopping = False
+
+    def spawn(self):
+        gc.freeze()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.app, self.sock)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = self.generation
+
+    def stop_workers(self, pids):
+        for pid in pids:
+            self.deadlines[pid] = time.monotonic() + SERVE_GRACEFUL_TIMEOUT
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def reap(self):
+        from services import jobs
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generation = self.children.pop(pid, None)
+            self.deadlines.pop(pid, None)
+            # Whatever it didn't finish (it crashed, or was killed after the
+            # graceful timeout) goes to the other workers
+            try:
+                jobs.release(pid)
+            except Exception:
+                traceback.print_exc()
+            # A current worker that died is replaced
+            if generation == self.generation and not self.stopping:
+                print(f"Worker {pid} exited with status {status}, starting another")
+                self.spawn()
+
+    def reload(self):
+        from services.model_registry import get_model
+        old = list(self.children)
+        self.generation += 1
+        get_model()
+        for _ in range(self.workers):
+            self.spawn()
+        self.stop_workers(old)
+        print(f"Reloaded: {self.workers} new workers, {len(old)} stopping")
+
+    def run(self):
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "reloading", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "stopping", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "stopping", True))
+
+        for _ in range(self.workers):
+            self.spawn()
+        stop_sent = False
+        while self.children:
+            time.sleep(TICK_SECONDS)
+            self.reap()
+            if self.reloading and not self.stopping:
+                self.reloading = False
+                self.reload()
+            if self.stopping and not stop_sent:
+                stop_sent = True
+                self.stop_workers(list(self.children))
+            now = time.monotonic()
+            for pid, deadline in list(self.deadlines.items()):
+                if now > deadline and pid in self.children:
+                    print(f"Worker {pid} didn't stop in {SERVE_GRACEFUL_TIMEOUT}s, killing it")
+                    os.kill(pid, signal.SIGKILL)
+                    self.deadlines.pop(pid)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the API with pre-forked worker processes")
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    args = parser.parse_args(argv)
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs os.fork; use app.py on this platform")
+
+    # Read by services.metrics when the app is imported
+    metrics_dir = None
+    if "METRICS_DIR" not in os.environ:
+        metrics_dir = os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="serve-metrics-")
+    os.makedirs(os.environ["METRICS_DIR"], exist_ok=True)
+
+    # Off in the master, so loading doesn't leave freed holes in pages the
+    # workers will share; each worker turns it back on
+    gc.disable()
+    app = load_app()
+    sock = socket.create_server((args.host, args.port), backlog=BACKLOG)
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers (master pid {os.getpid()})")
+    try:
+        Master(app, sock, max(1, args.workers)).run()
+    finally:
+        sock.close()
+        if metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
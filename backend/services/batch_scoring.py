@@ -0,0 +1,129 @@
+import os
+import re
+import json
+import time
+import argparse
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from services.export import EXPORT_FORMATS, export_stream
+from services.prediction_cache import scored_frame
+from services.scoring import compile_scorer, live_paths, load_artifacts
+from services.sheet_cache import read_sheet, sheet_names
+
+# Scores many (file, sheet) pairs in a process pool. Each worker loads the
+# model once and then reads, scores and writes whole sheets; the parent only
+# collects one summary per sheet. Run from the backend folder:
+#   python -m services.batch_scoring uploads/a.xls uploads/b.xls --output-dir results
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", os.cpu_count() or 1))
+SUMMARY_NAME = "summary.json"
+
+_scorer = None
+
+def _init_worker(model_path, preprocessor_path):
+    global _scorer
+    _scorer = compile_scorer(*load_artifacts(model_path, preprocessor_path))
+
+def output_name(filepath, sheet, export_format):
+    stem = os.path.splitext(os.path.basename(filepath))[0]
+    safe_sheet = re.sub(r"[^\w.-]+", "_", sheet)
+    return f"{stem}__{safe_sheet}.{export_format}"
+
+def score_one(filepath, sheet, output_dir, export_format):
+    started = time.perf_counter()
+    summary = {"file": os.path.basename(filepath), "sheet": sheet}
+    try:
+        df = read_sheet(filepath, sheet)
+        proba, label = _scorer(df)
+        scored = scored_frame(df, {"proba": proba, "label": label})
+
+        output = output_name(filepath, sheet, export_format)
+        with open(os.path.join(output_dir, output), "wb") as f:
+            for chunk in export_stream(scored, export_format):
+                f.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+
+        summary.update({
+            "rows": int(len(label)),
+            "churn_count": int(label.sum()),
+            "average_probability": float(proba.mean()) if len(proba) else None,
+            "output": output
+        })
+    except Exception as e:
+        traceback.print_exc()
+        summary["error"] = str(e)
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    return summary
+
+def expand_jobs(items):
+    # items: [(filepath, [sheets] or None)]; None means every sheet
+    jobs = []
+    for filepath, sheets in items:
+        for sheet in sheets or sheet_names(filepath):
+            jobs.append((filepath, sheet))
+    return jobs
+
+def run_batch(jobs, output_dir, workers=None, export_format="csv",
+              model_path=None, preprocessor_path=None, progress=None):
+    # progress(fraction, message), when given, is called as sheets finish;
+    # an exception it raises stops the batch. Without model paths the live
+    # version is used, resolved once so every worker loads the same one.
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format '{export_format}'")
+    if model_path is None:
+        model_path, preprocessor_path = live_paths()
+    os.makedirs(output_dir, exist_ok=True)
+
+    workers = max(1, min(workers or BATCH_WORKERS, len(jobs) or 1))
+    started = time.perf_counter()
+    # spawn: never fork a process that may be running server threads
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_path, preprocessor_path)
+    ) as pool:
+        futures = [pool.submit(score_one, filepath, sheet, output_dir, export_format) for filepath, sheet in jobs]
+        sheets = []
+        try:
+            for future in futures:
+                sheets.append(future.result())
+                if progress is not None:
+                    progress(len(sheets) / len(futures), f"Scored {len(sheets)} of {len(futures)} sheets")
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+
+    summary = {
+        "output_dir": output_dir,
+        "format": export_format,
+        "workers": workers,
+        "seconds": round(time.perf_counter() - started, 3),
+        "sheets": sheets
+    }
+    with open(os.path.join(output_dir, SUMMARY_NAME), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score many workbooks and sheets in parallel")
+    parser.add_argument("files", nargs="+", help="Excel workbooks to score")
+    parser.add_argument("--sheets", nargs="+", help="Sheets to score in every file (default: all)")
+    parser.add_argument("--output-dir", required=True, help="Folder for scored sheets and summary.json")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--format", default="csv", choices=list(EXPORT_FORMATS))
+    parser.add_argument("--model", help="Model artifact (default: the live version)")
+    parser.add_argument("--preprocessor", help="Preprocessor artifact (default: the live version)")
+    args = parser.parse_args(argv)
+    if (args.model is None) != (args.preprocessor is None):
+        parser.error("--model and --preprocessor go together")
+
+    jobs = expand_jobs([(f, args.sheets) for f in args.files])
+    summary = run_batch(jobs, args.output_dir, args.workers, args.format, args.model, args.preprocessor)
+    for sheet in summary["sheets"]:
+        status = sheet.get("error") or f"{sheet['rows']} rows, {sheet['churn_count']} churn"
+        print(f"{sheet['file']} / {sheet['sheet']}: {status} ({sheet['seconds']}s)")
+    print(f"Done in {summary['seconds']}s, summary in {os.path.join(args.output_dir, SUMMARY_NAME)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Plotly chart payloads built as plain dicts in the shape of
+# Figure.to_plotly_json(), so a chart is serialized once by jsonify instead of
+# being built, validated and round-tripped through plotly's own JSON encoder.
+
+# Python plotly's "RdBu" (plotly.js names the reversed scale RdBu)
+RDBU = [
+    [0.0, "rgb(103,0,31)"], [0.1, "rgb(178,24,43)"], [0.2, "rgb(214,96,77)"],
+    [0.3, "rgb(244,165,130)"], [0.4, "rgb(253,219,199)"], [0.5, "rgb(247,247,247)"],
+    [0.6, "rgb(209,229,240)"], [0.7, "rgb(146,197,222)"], [0.8, "rgb(67,147,195)"],
+    [0.9, "rgb(33,102,172)"], [1.0, "rgb(5,48,97)"]
+]
+
+_AXIS = {
+    "gridcolor": "white", "linecolor": "white", "ticks": "", "title": {"standoff": 15},
+    "zerolinecolor": "white", "automargin": True, "zerolinewidth": 2
+}
+
+# The parts of plotly's default "plotly" template used by 2D bar, box and
+# heatmap charts, so they look the same as before
+TEMPLATE = {
+    "data": {
+        "bar": [{
+            "type": "bar",
+            "error_x": {"color": "#2a3f5f"},
+            "error_y": {"color": "#2a3f5f"},
+            "marker": {"line": {"color": "#E5ECF6", "width": 0.5}}
+        }],
+        "heatmap": [{"type": "heatmap", "colorbar": {"outlinewidth": 0, "ticks": ""}}]
+    },
+    "layout": {
+        "autotypenumbers": "strict",
+        "colorway": ["#636efa", "#EF553B", "#00cc96", "#ab63fa", "#FFA15A",
+                     "#19d3f3", "#FF6692", "#B6E880", "#FF97FF", "#FECB52"],
+        "font": {"color": "#2a3f5f"},
+        "hovermode": "closest",
+        "hoverlabel": {"align": "left"},
+        "paper_bgcolor": "white",
+        "plot_bgcolor": "#E5ECF6",
+        "xaxis": _AXIS,
+        "yaxis": _AXIS,
+        "title": {"x": 0.05}
+    }
+}
+
+def figure(traces, **layout):
+    return {"data": traces, "layout": {"template": TEMPLATE, **layout}}
+
+def titled(text):
+    # {"title": ...} part of an axis or colorbar
+    return {"title": {"text": text}}
+
+def heatmap(z, x, y, **trace):
+    return {"type": "heatmap", "z": z, "x": x, "y": y, **trace}
+
+def box(name, stats, **trace):
+    # stats holds one box's precomputed q1/median/q3/fences/mean/sd and the
+    # points beyond its fences, drawn as the box's sample points
+    summary = {k: [stats[k]] for k in ["q1", "median", "q3", "lowerfence", "upperfence", "mean", "sd"]}
+    return {"type": "box", "name": name, **summary, "y": [stats["outliers"]], "boxpoints": "outliers", **trace}
+
+def bar(x, y, name, **trace):
+    return {"type": "bar", "x": x, "y": y, "name": name, **trace}
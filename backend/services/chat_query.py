@@ -0,0 +1,256 @@
+import re
+import pandas as pd
+from services.lru import LRUCache
+from services.metrics import stage
+from services.normalize import row_labels
+from services.profiler import find_churn_column
+from services.sheet_cache import file_version, read_sheet, sheet_columns, register_invalidator
+
+# Answers the chat questions that are really queries (counts, aggregates,
+# top values, filters, group-bys) straight from the sheet with pandas, so
+# they skip the LLM round trip and can't be answered with invented numbers.
+# Anything not recognized here returns None and goes to the LLM as before.
+AGGREGATES = {
+    "average": "mean", "avg": "mean", "mean": "mean", "median": "median",
+    "sum": "sum", "total": "sum",
+    "maximum": "max", "max": "max", "highest": "max", "largest": "max",
+    "minimum": "min", "min": "min", "lowest": "min", "smallest": "min"
+}
+# Features the model uses, computed from the date columns like everywhere else
+DERIVED_COLUMNS = {
+    "last boot - active": ("last_boot_date", "active_date"),
+    "last boot - interval": ("last_boot_date", "interval_date")
+}
+# Words people use for columns whose names don't say so
+COLUMN_ALIASES = {"carrier": "sim_info", "carriers": "sim_info"}
+ROW_NOUNS = {"rows", "records", "entries", "devices", "phones", "customers", "users"}
+HOW_MANY = r"\b(how many|number of|count of|count)\b"
+CHURN_RATE = r"\bchurn(ed)? rate\b|\brate of churn(ed|ing)?\b|\bpercent(age)? (of )?churn(ed|ing)?\b"
+NEGATION = r"\b(not|never|non|didn t|don t|doesn t|haven t|hasn t|aren t|weren t)\b"
+# Words that don't change what is asked. Every other word of the question
+# has to be read by the query, or the question goes to the LLM: a leftover
+# "not", "which", "per" or "in the US" asks something the query doesn't answer.
+FILLER = {"what", "whats", "s", "is", "are", "was", "were", "the", "a", "an", "of", "there", "please", "tell",
+          "me", "show", "give", "list", "can", "could", "you", "i", "know", "do", "we", "have", "has",
+          "total", "overall", "all", "value", "values", "column", "field"}
+# Phrases meaning the whole sheet, dropped before parsing
+WHOLE_SHEET = (r"\b((in|of|from|across|for) (the|this) (whole |entire )?(sheet|data|dataset|file|table|workbook)"
+               r"|in total|altogether)\b")
+# Words that make a filter value a condition of its own
+QUALIFIERS = {"and", "or", "but", "not", "no", "in", "for", "by", "per", "with", "without", "than", "over",
+              "under", "above", "below", "between", "after", "before", "except", "only", "which", "who", "whose"}
+DEFAULT_TOP = 5
+MAX_GROUPS = 10
+
+def _norm(text):
+    text = re.sub(r"[^\w\s.\-]", " ", text.lower())
+    return " ".join(re.sub(r"[_\-]+", " ", text).split())
+
+def find_columns(question, columns):
+    # (start, end, column) for the columns named in the question, in order
+    # of appearance; longer names win where names overlap
+    # ("last boot - active" over "active")
+    names = {_norm(c): c for c in columns}
+    for alias, column in COLUMN_ALIASES.items():
+        if column in columns:
+            names.setdefault(alias, column)
+
+    found = []
+    taken = set()
+    for name in sorted(names, key=len, reverse=True):
+        for match in re.finditer(rf"\b{re.escape(name)}\b", question):
+            span = set(range(match.start(), match.end()))
+            if not span & taken:
+                taken |= span
+                found.append((match.start(), match.end(), names[name]))
+    return sorted(found)
+
+def _unread(q, spans, words=()):
+    # Words of q outside the spans the query was read from, other than
+    # filler and the query's own words
+    text = list(q)
+    for start, end in spans:
+        text[start:end] = " " * (end - start)
+    left = (w.strip(".-") for w in "".join(text).split())
+    return [w for w in left if w and w not in FILLER and w not in words]
+
+def _aggregate_of(q, mentions):
+    # (span, word, column) for "<aggregate> [of the] <column>"
+    for start, end, column in mentions:
+        agg = re.search(rf"\b({'|'.join(AGGREGATES)})\s+(of\s+)?(the\s+)?$", q[:start])
+        if agg:
+            return (agg.start(), end), agg.group(1), column
+    return None
+
+def parse_question(question, columns):
+    # Returns the query as a flat dict, or None when it isn't one we compute
+    q = " ".join(re.sub(WHOLE_SHEET, " ", _norm(question)).split())
+    columns = list(columns) + [c for c, (a, b) in DERIVED_COLUMNS.items() if a in columns and b in columns]
+    churn = find_churn_column(columns)
+    mentions = [m for m in find_columns(q, columns) if m[2] != churn]
+    how_many = re.search(HOW_MANY, q)
+    rate = re.search(CHURN_RATE, q) if churn else None
+
+    # "<aggregate> <column> by <column>", "churn rate by <column>", "how many ... by <column>"
+    group = None
+    for start, end, column in mentions:
+        by = re.search(r"\b(by|per|for each|for every)\s+$", q[:start])
+        if by:
+            group = (by.start(), end), column
+    if group:
+        span, column = group
+        others = [m for m in mentions if m[2] != column]
+        agg = _aggregate_of(q, others)
+        if rate and not _unread(q, [span, rate.span()]):
+            return {"op": "group", "agg": "churn_rate", "column": churn, "group": column}
+        if agg and not _unread(q, [span, agg[0]]):
+            return {"op": "group", "agg": AGGREGATES[agg[1]], "word": agg[1], "column": agg[2], "group": column}
+        if how_many and not _unread(q, [span, how_many.span()], ROW_NOUNS):
+            return {"op": "group", "agg": "count", "column": column, "group": column}
+        return None
+
+    if rate and not _unread(q, [rate.span()]):
+        return {"op": "churn_rate", "column": churn}
+    churned = re.search(r"\bchurn(ed|ing|s)?\b", q) if churn and how_many else None
+    if churned:
+        # "how many devices did not churn" counts the others
+        negation = re.search(NEGATION, q)
+        spans = [how_many.span(), churned.span()] + ([negation.span()] if negation else [])
+        if not _unread(q, spans, ROW_NOUNS | {"did", "does", "been", "who", "that", "marked", "as"}):
+            return {"op": "churn_count", "column": churn, "negated": bool(negation)}
+
+    agg = _aggregate_of(q, mentions)
+    if agg and not _unread(q, [agg[0]]):
+        return {"op": "aggregate", "agg": AGGREGATES[agg[1]], "word": agg[1], "column": agg[2]}
+    if not mentions:
+        if how_many and ROW_NOUNS & set(q.split()) and not _unread(q, [how_many.span()], ROW_NOUNS):
+            return {"op": "rows"}
+        return None
+
+    start, end, column = mentions[0]
+    top = re.search(r"\b(top|most common|most frequent|most popular)\s*(\d+)?\b", q)
+    if top and not _unread(q, [top.span(), (start, end)]):
+        return {"op": "top", "column": column, "n": int(top.group(2) or DEFAULT_TOP)}
+
+    distinct = re.search(r"\b(unique|distinct|different)\b", q)
+    if how_many and distinct and not _unread(q, [how_many.span(), distinct.span(), (start, end)]):
+        return {"op": "distinct", "column": column}
+
+    # "how many devices have <column> equal to <value>"; the value runs to
+    # the end of the question, so it can't hold a further condition
+    value = re.match(r"\s+(?:is equal to|is|=|equal to|equals?|of|as)\s+(.+)$", q[end:])
+    if how_many and value and not QUALIFIERS & set(value.group(1).split()):
+        if not _unread(q, [how_many.span(), (start, len(q))], ROW_NOUNS | {"with", "where", "whose"}):
+            return {"op": "filter", "column": column, "value": value.group(1).strip(" .?")}
+    return None
+
+def _load(filepath, sheet, names):
+    # Only the columns the query touches, plus derived features
+    sheet_cols = sheet_columns(filepath, sheet)
+    needed = set()
+    for name in names:
+        needed.update(DERIVED_COLUMNS.get(name, (name,)))
+    df = read_sheet(filepath, sheet, columns=[c for c in sheet_cols if c in needed] or sheet_cols[:1])
+    for name, (end, start) in DERIVED_COLUMNS.items():
+        if name in names:
+            delta = pd.to_datetime(df[end], errors="coerce") - pd.to_datetime(df[start], errors="coerce")
+            df[name] = delta.dt.total_seconds() / (3600*24)
+    return df
+
+def _churn_flags(values):
+    return pd.to_numeric(values, errors="coerce").fillna(0).astype(int) == 1
+
+def _fmt(value):
+    return f"{value:,.2f}" if isinstance(value, float) else f"{value:,}"
+
+def run_query(filepath, sheet, query):
+    # Returns {"answer": sentence, "data": numbers behind it}, or None when
+    # the query doesn't apply after all (e.g. a non-numeric column to average)
+    op = query["op"]
+    column = query.get("column")
+    df = _load(filepath, sheet, [c for c in [column, query.get("group")] if c])
+    total = len(df)
+
+    if op == "rows":
+        return {"answer": f"The sheet has {total:,} rows.", "data": {"rows": total}}
+
+    if op in ("churn_count", "churn_rate"):
+        churned = int(_churn_flags(df[column]).sum())
+        rate = churned / total if total else 0.0
+        if op == "churn_rate":
+            answer = f"The churn rate is {rate:.1%} ({churned:,} of {total:,} rows)."
+        elif query.get("negated"):
+            answer = f"{total - churned:,} of {total:,} rows are not marked as churned ({1 - rate if total else 0.0:.1%})."
+        else:
+            answer = f"{churned:,} of {total:,} rows are marked as churned ({rate:.1%})."
+        return {"answer": answer, "data": {"churned": churned, "rows": total, "churn_rate": rate}}
+
+    if op == "aggregate":
+        values = pd.to_numeric(df[column], errors="coerce").dropna()
+        if values.empty:
+            return None
+        value = float(getattr(values, query["agg"])())
+        return {"answer": f"The {query['word']} of {column} is {_fmt(value)} (over {len(values):,} rows with a value).",
+                "data": {"column": column, query["agg"]: value, "rows": int(len(values))}}
+
+    if op == "top":
+        counts = row_labels(df[column]).value_counts().head(query["n"])
+        items = [{"value": k, "count": int(v)} for k, v in counts.items()]
+        listed = ", ".join(f"{item['value']} ({item['count']:,})" for item in items)
+        return {"answer": f"The top {len(items)} values of {column} are: {listed}.", "data": {"column": column, "top": items}}
+
+    if op == "distinct":
+        distinct = int(row_labels(df[column]).nunique())
+        return {"answer": f"{column} has {distinct:,} distinct values.", "data": {"column": column, "distinct": distinct}}
+
+    if op == "filter":
+        # Compared the way the question was normalized, once per distinct label
+        value = query["value"]
+        labels = row_labels(df[column])
+        matches = labels.map({label: _norm(label) for label in labels.unique()}) == value
+        count = int(matches.sum())
+        return {"answer": f"{count:,} of {total:,} rows have {column} equal to '{value}'.",
+                "data": {"column": column, "value": value, "rows": count}}
+
+    if op == "group":
+        groups = row_labels(df[query["group"]])
+        if query["agg"] == "count":
+            result = groups.value_counts()
+            label = f"Rows per {query['group']}"
+        elif query["agg"] == "churn_rate":
+            result = _churn_flags(df[column]).groupby(groups).mean()
+            label = f"Churn rate per {query['group']}"
+        else:
+            values = pd.to_numeric(df[column], errors="coerce")
+            if values.notna().sum() == 0:
+                return None
+            result = values.groupby(groups).agg(query["agg"]).dropna()
+            label = f"{query['word'].capitalize()} of {column} per {query['group']}"
+        result = result.sort_values(ascending=False).head(MAX_GROUPS)
+        items = [{"group": k, "value": float(v) if query["agg"] != "count" else int(v)} for k, v in result.items()]
+        shown = "; ".join(
+            f"{item['group']}: {item['value']:.1%}" if query["agg"] == "churn_rate" else f"{item['group']}: {_fmt(item['value'])}"
+            for item in items
+        )
+        more = f" (top {MAX_GROUPS} shown)" if len(items) == MAX_GROUPS else ""
+        return {"answer": f"{label}{more}: {shown}.", "data": {"groups": items}}
+    return None
+
+_results = LRUCache(4096, lambda result: 1)
+
+def answer_question(filepath, sheet, question):
+    # Returns the computed answer, or None when the LLM should handle it
+    with stage("query"):
+        query = parse_question(question, sheet_columns(filepath, sheet))
+        if query is None:
+            return None
+        key = (*file_version(filepath), sheet, tuple(sorted(query.items())))
+        # Inapplicable queries are cached too, as an empty dict
+        result = _results.get_or_load(key, lambda: run_query(filepath, sheet, query) or {})
+    if not result:
+        return None
+    return {"query": query, **result}
+
+@register_invalidator
+def invalidate_file(path):
+    _results.discard_where(lambda key: key[0] == path)
@@ -0,0 +1,90 @@
+import os
+import json
+import threading
+from services.lru import LRUCache
+
+# Chat conversations, one per file::sheet. Every message is appended as one
+# JSON line to the conversation's log, so a turn writes only itself. Memory
+# holds the most recent messages of the most recently used conversations;
+# the full history is read back from the log only when asked for.
+CHAT_STORE = os.path.join(os.getcwd(), "chat_store")
+CHAT_MEMORY_MAX_CHATS = int(os.environ.get("CHAT_MEMORY_MAX_CHATS", 256))
+CHAT_MEMORY_MAX_MESSAGES = int(os.environ.get("CHAT_MEMORY_MAX_MESSAGES", 40))
+# Rough prompt budget for past turns, in tokens (about 4 characters each)
+CHAT_CONTEXT_TOKENS = int(os.environ.get("CHAT_CONTEXT_TOKENS", 2048))
+
+_recent = LRUCache(CHAT_MEMORY_MAX_CHATS, lambda messages: 1)
+_lock = threading.Lock()
+
+def chat_path(chat_key):
+    safe_key = chat_key.replace("::", "__")
+    return os.path.join(CHAT_STORE, f"{safe_key}.jsonl")
+
+def _legacy_path(chat_key):
+    # Conversations saved before the log format, as one JSON list
+    return chat_path(chat_key)[:-1]
+
+def _read_log(chat_key):
+    path = chat_path(chat_key)
+    legacy = _legacy_path(chat_key)
+    if not os.path.exists(path) and os.path.exists(legacy):
+        with open(legacy, "r") as f:
+            messages = json.load(f)
+        with open(path, "w") as f:
+            f.writelines(json.dumps(m) + "\n" for m in messages)
+        os.remove(legacy)
+
+    messages = []
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    messages.append(json.loads(line))
+                except ValueError:
+                    pass  # a line cut short by a crash
+    return messages
+
+def recent_messages(chat_key):
+    return _recent.get_or_load(chat_key, lambda: _read_log(chat_key)[-CHAT_MEMORY_MAX_MESSAGES:])
+
+def full_history(chat_key):
+    with _lock:
+        return _read_log(chat_key)
+
+def append_message(chat_key, role, content):
+    message = {"role": role, "content": content}
+    messages = recent_messages(chat_key)
+    with _lock:
+        os.makedirs(CHAT_STORE, exist_ok=True)
+        with open(chat_path(chat_key), "a") as f:
+            f.write(json.dumps(message) + "\n")
+        messages.append(message)
+        del messages[:-CHAT_MEMORY_MAX_MESSAGES]
+
+def reset_chat(chat_key):
+    with _lock:
+        _recent.pop(chat_key)
+        for path in [chat_path(chat_key), _legacy_path(chat_key)]:
+            if os.path.exists(path):
+                os.remove(path)
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+def fit_to_budget(messages, max_tokens=CHAT_CONTEXT_TOKENS):
+    # Newest messages that fit the budget, plus a note standing in for the
+    # ones left out
+    kept = []
+    used = 0
+    for message in reversed(messages):
+        used += estimate_tokens(message["content"])
+        if used > max_tokens and kept:
+            break
+        kept.append(message)
+    kept.reverse()
+
+    dropped = len(messages) - len(kept)
+    if dropped:
+        note = f"({dropped} earlier messages of this conversation were left out to save space.)"
+        kept.insert(0, {"role": "system", "content": note})
+    return kept
@@ -0,0 +1,50 @@
+from services.lru import LRUCache
+from services.metrics import stage
+from services.sheet_cache import file_version, read_sheet, register_invalidator
+
+# The sheet summary the AI chat sends with every question, built once per
+# sheet version and kept in the two forms the chat needs: the text that goes
+# into the prompt and the all-strings dict returned to the browser.
+def build_summary(df, max_rows=5, max_numeric=5):
+    schema = {c: str(df[c].dtype) for c in df.columns}
+    numeric_df = df.select_dtypes(include=["number"]).iloc[:, :max_numeric]
+    numeric_stats = numeric_df.describe().round(2).to_dict()
+    sample_rows = df.head(max_rows).to_dict(orient="records")
+    
+    return {
+        "total_rows": len(df),
+        "columns": list(df.columns),
+        "schema": schema,
+        "numeric_stats": numeric_stats,
+        "sample_rows": sample_rows
+    }
+
+def stringify_all(obj):
+    if isinstance(obj, dict):
+        return {k: stringify_all(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [stringify_all(x) for x in obj]
+    elif obj is None:
+        return "None"
+    else:
+        return str(obj)
+
+def summary_size(summary):
+    return len(summary["text"])
+
+_summaries = LRUCache(64 * 1024 * 1024, summary_size)
+
+def sheet_summary(filepath, sheet):
+    # {"text": prompt text, "result": stringified summary}
+    key = (*file_version(filepath), sheet)
+
+    def load():
+        result = build_summary(read_sheet(filepath, sheet))
+        return {"text": f"{result}", "result": stringify_all(result)}
+
+    with stage("summary"):
+        return _summaries.get_or_load(key, load)
+
+@register_invalidator
+def invalidate_file(path):
+    _summaries.discard_where(lambda key: key[0] == path)
@@ -0,0 +1,148 @@
+import os
+import json
+import shutil
+import tempfile
+import pandas as pd
+from services.derived import derived_dir, source_version
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional, reads fall back to the Excel file
+    pa = None
+    pq = None
+
+# Every uploaded workbook gets a sibling folder holding one Parquet file per
+# sheet, written once at upload time. Reads are memory-mapped and only touch
+# the columns they ask for.
+MANIFEST_NAME = "manifest.json"
+# Bumped when the stored layout changes, so older copies are rebuilt
+FORMAT_VERSION = 3
+# Parquet schema metadata naming the columns kept in objects sidecars, with
+# the position each sidecar file is numbered by
+OBJECT_COLUMNS_KEY = b"object_columns"
+
+def available():
+    return pq is not None
+
+def columnar_dir(filepath):
+    return derived_dir(filepath, "columnar")
+
+def objects_path(path, position):
+    # One sidecar per column, so reads unpickle only the columns they ask for
+    return path[:-len(".parquet")] + f".objects.{position}.pkl"
+
+def _to_arrow(df):
+    # Returns the Arrow table and the columns Arrow can't hold as they are
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False), {}
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+
+    # Excel columns often mix numbers, dates and text. Those are stored as
+    # text, which keeps the schema and column-pruned reads working, and their
+    # original values go to a sidecar per column that replaces the text on
+    # read, so frames read back are the ones read_excel returns.
+    df = df.copy()
+    mixed = {}
+    for position, col in enumerate(df.columns):
+        if df[col].dtype != object:
+            continue
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+            mixed[col] = position
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = {**(table.schema.metadata or {}), OBJECT_COLUMNS_KEY: json.dumps(mixed).encode()}
+    return table.replace_schema_metadata(metadata), mixed
+
+def write_sheet(df, path):
+    table, mixed = _to_arrow(df)
+    for col, position in mixed.items():
+        df[col].to_pickle(objects_path(path, position))
+    pq.write_table(table, path)
+
+def convert_workbook(filepath, progress=None):
+    # progress(fraction, message), when given, is called before each sheet
+    if not available():
+        return None
+    manifest = load_manifest(filepath)
+    if manifest is not None:
+        # Same content was uploaded before
+        return manifest
+
+    # Written to a private folder that is renamed into place once complete,
+    # so readers in other processes never see a partial copy
+    out_dir = columnar_dir(filepath)
+    parent = os.path.dirname(out_dir)
+    os.makedirs(parent, exist_ok=True)
+    build_dir = tempfile.mkdtemp(dir=parent, prefix=f".{os.path.basename(out_dir)}.build-")
+    try:
+        version = source_version(filepath)
+        sheets = {}
+        with pd.ExcelFile(filepath) as xl:
+            for i, sheet in enumerate(xl.sheet_names):
+                if progress is not None:
+                    progress(i / len(xl.sheet_names), f"Converting {sheet}")
+                df = xl.parse(sheet)
+                df.columns = [str(c) for c in df.columns]
+                name = f"sheet_{i}.parquet"
+                write_sheet(df, os.path.join(build_dir, name))
+                sheets[sheet] = name
+
+        manifest = {"format": FORMAT_VERSION, "source_version": version, "sheets": sheets}
+        with open(os.path.join(build_dir, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f)
+        _publish(build_dir, out_dir)
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+    return manifest
+
+def _publish(build_dir, out_dir):
+    # A stale copy (older format or source version) is moved aside first and
+    # removed after; readers that already opened its files keep reading them
+    old_dir = f"{build_dir}.old"
+    try:
+        os.rename(out_dir, old_dir)
+    except FileNotFoundError:
+        old_dir = None
+    try:
+        os.rename(build_dir, out_dir)
+    except OSError:
+        pass  # another process published its copy first; keep that one
+    if old_dir is not None:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+def load_manifest(filepath):
+    # Returns None unless the manifest was written for the current file version
+    if not available():
+        return None
+    path = os.path.join(columnar_dir(filepath), MANIFEST_NAME)
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != FORMAT_VERSION or manifest.get("source_version") != source_version(filepath):
+        return None
+    return manifest
+
+def sheet_path(filepath, manifest, sheet):
+    name = manifest["sheets"].get(sheet)
+    if name is None:
+        return None
+    return os.path.join(columnar_dir(filepath), name)
+
+def read_columns(path, columns=None):
+    table = pq.read_table(path, columns=columns, memory_map=True)
+    df = table.to_pandas()
+    mixed = json.loads((table.schema.metadata or {}).get(OBJECT_COLUMNS_KEY, b"{}"))
+    for col, position in mixed.items():
+        if col in df.columns:
+            df[col] = pd.read_pickle(objects_path(path, position)).values
+    return df
+
+def schema_dtypes(path):
+    # Empty frame with the sheet's schema, read from the Parquet footer only
+    return pq.read_schema(path).empty_table().to_pandas().dtypes
@@ -0,0 +1,49 @@
+import os
+import shutil
+import hashlib
+
+# Data derived from an uploaded file (Parquet copies, profiles, ...) lives in
+# hidden folders next to the uploads: <upload folder>/.<kind>/<file name>/
+DERIVED_KINDS = ["columnar", "profiles", "retrieval", "predictions"]
+# Uploaded content, stored once per hash (see upload_store)
+BLOB_FOLDER = ".blobs"
+# <upload folder>/.aliases/<file name> holds the blob file name an upload
+# name stands for
+ALIAS_FOLDER = ".aliases"
+
+def content_path(filepath):
+    # The blob an upload name stands for, read from its alias record rather
+    # than from the link (hard links don't say what they point at). Files
+    # stored before uploads were content-addressed resolve to themselves.
+    # Work that outlives a request resolves this once and uses the blob
+    # path throughout, so replacing the upload meanwhile doesn't mix versions.
+    filepath = os.path.abspath(filepath)
+    folder, name = os.path.split(filepath)
+    if os.path.basename(folder) == BLOB_FOLDER:
+        return filepath
+    try:
+        with open(os.path.join(folder, ALIAS_FOLDER, name)) as f:
+            return os.path.join(folder, BLOB_FOLDER, f.read().strip())
+    except OSError:
+        return os.path.realpath(filepath)
+
+def derived_dir(filepath, kind):
+    # Keyed by the content an upload name stands for, so every name for the
+    # same content shares one set of derived data
+    folder, name = os.path.split(content_path(filepath))
+    if os.path.basename(folder) == BLOB_FOLDER:
+        folder = os.path.dirname(folder)
+    return os.path.join(folder, f".{kind}", name)
+
+def source_version(filepath):
+    # Stored with derived data so it is ignored once the source file changes
+    st = os.stat(filepath)
+    return [st.st_mtime_ns, st.st_size]
+
+def sheet_key(sheet):
+    # Sheet names can hold any character; use a stable digest in file names
+    return hashlib.sha1(sheet.encode("utf-8")).hexdigest()[:16]
+
+def remove_derived(filepath):
+    for kind in DERIVED_KINDS:
+        shutil.rmtree(derived_dir(filepath, kind), ignore_errors=True)
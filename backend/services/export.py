@@ -0,0 +1,114 @@
+import os
+import tempfile
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # parquet export is unavailable without pyarrow
+    pa = None
+    pq = None
+
+# Chunked exports of large frames. Rows are formatted and written
+# EXPORT_CHUNK_ROWS at a time and the output is sent through a generator, so
+# neither a stringified copy of the frame nor the output file is held in
+# memory. Numeric columns stay numeric in every format.
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", 50000))
+STREAM_BLOCK_BYTES = 1 << 20
+# Rows an xlsx sheet holds below its header row
+XLSX_MAX_ROWS = 1048575
+
+EXPORT_FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+def iter_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+def _text_cells(chunk, columns):
+    # Object columns may mix numbers and text; export them as text
+    chunk = chunk.copy()
+    for col in columns:
+        chunk[col] = chunk[col].where(chunk[col].isna(), chunk[col].astype(str))
+    return chunk
+
+def stream_csv(df):
+    yield df.head(0).to_csv(index=False)
+    for chunk in iter_chunks(df):
+        yield chunk.to_csv(index=False, header=False)
+
+def _stream_file(path):
+    # Sends a finished temp file and removes it, also when the client hangs up
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(STREAM_BLOCK_BYTES), b""):
+                yield block
+    finally:
+        os.remove(path)
+
+def _temp_path(suffix):
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    return path
+
+def write_parquet(df, path):
+    object_cols = [c for c in df.columns if df[c].dtype == object]
+    fields = []
+    for col in df.columns:
+        if col in object_cols:
+            fields.append(pa.field(str(col), pa.large_string()))
+        else:
+            fields.append(pa.Schema.from_pandas(df[[col]].head(0), preserve_index=False).field(0))
+    schema = pa.schema(fields)
+
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in iter_chunks(df):
+            chunk = _text_cells(chunk, object_cols)
+            chunk.columns = [str(c) for c in chunk.columns]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+def write_xlsx(df, path):
+    # openpyxl's write-only mode keeps memory flat regardless of row count
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append([str(c) for c in df.columns])
+    for chunk in iter_chunks(df):
+        cells = chunk.astype(object).where(chunk.notna(), None)
+        for row in cells.itertuples(index=False, name=None):
+            ws.append(row)
+    wb.save(path)
+
+def format_error(df, export_format):
+    # Why df can't be exported in this format, or None
+    if export_format == "xlsx" and len(df) > XLSX_MAX_ROWS:
+        return (f"{len(df)} rows don't fit in an xlsx sheet ({XLSX_MAX_ROWS} at most); "
+                "download as csv or parquet instead")
+    return None
+
+def export_stream(df, export_format):
+    # Returns a chunk generator for the requested format. Binary formats are
+    # written to a temp file first so write errors surface before streaming.
+    error = format_error(df, export_format)
+    if error:
+        raise ValueError(error)
+    if export_format == "csv":
+        return stream_csv(df)
+
+    if export_format == "parquet":
+        if pq is None:
+            raise RuntimeError("Parquet export requires pyarrow")
+        writer = write_parquet
+    else:
+        writer = write_xlsx
+
+    path = _temp_path(f".{export_format}")
+    try:
+        writer(df, path)
+    except Exception:
+        os.remove(path)
+        raise
+    return _stream_file(path)
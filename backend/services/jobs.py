@@ -0,0 +1,328 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import traceback
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+# Background jobs for work too slow for a request (parsing, scoring and
+# batch runs of large workbooks). A job is a registered kind plus JSON
+# params; jobs live in a SQLite table so their status outlives the process
+# that ran them, and jobs left unfinished by a restart run again on start.
+# They run on a thread pool in the server process, so what they compute
+# lands in the same caches the routes read from. Each job is owned by the
+# process that queued or took it, which keeps a heartbeat on its jobs; jobs
+# whose owner died or stopped beating are taken over by the next process
+# that asks for them, or by any server's periodic sweep.
+JOBS_DB = os.path.join(os.getcwd(), "jobs.db")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+# How long a route waits for its job before answering 202 with the job id
+JOB_WAIT_SECONDS = float(os.environ.get("JOB_WAIT_SECONDS", 10))
+# Finished jobs are dropped from the table after this many days
+JOB_KEEP_DAYS = int(os.environ.get("JOB_KEEP_DAYS", 7))
+# How often owners beat and sweep for abandoned jobs, and how old a
+# heartbeat gets before its jobs count as abandoned
+JOB_HEARTBEAT_SECONDS = float(os.environ.get("JOB_HEARTBEAT_SECONDS", 5))
+JOB_STALE_SECONDS = float(os.environ.get("JOB_STALE_SECONDS", 60))
+POLL_SECONDS = 0.1
+
+ACTIVE = ("queued", "running")
+OWNED = ("queued", "running", "cancelling")
+FINISHED = ("done", "failed", "cancelled")
+COLUMNS = ["job_id", "kind", "params", "status", "progress", "message", "result", "error",
+           "created_at", "started_at", "finished_at", "owner_pid", "heartbeat_at"]
+
+class JobCancelled(Exception):
+    pass
+
+class JobLost(Exception):
+    # Another process took the job over; this one stops working on it
+    pass
+
+_kinds = {}
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="jobs")
+_done = {}  # job_id -> Event, for jobs run by this process
+_lock = threading.Lock()
+_owner = {}  # pid -> owner id; a new one after fork, or when a pid is reused
+_heartbeat_pid = None
+
+def job_kind(name, ready=None, cancellable=True):
+    # Registers fn(params, progress) as the job kind `name`. ready(params),
+    # when given, says the work is already done, and no job is needed.
+    # Kinds whose work can't stop partway set cancellable=False.
+    def register(fn):
+        _kinds[name] = (fn, ready, cancellable)
+        return fn
+    return register
+
+def is_cancellable(kind):
+    return kind in _kinds and _kinds[kind][2]
+
+def _owner_id():
+    pid = os.getpid()
+    if pid not in _owner:
+        _owner[pid] = f"{pid}:{uuid.uuid4().hex}"
+    return _owner[pid]
+
+@contextmanager
+def _connect():
+    db = sqlite3.connect(JOBS_DB, timeout=30, isolation_level=None)
+    db.row_factory = sqlite3.Row
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _init_db():
+    with _connect() as db:
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(f"""CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY, kind TEXT, params TEXT, job_key TEXT, status TEXT,
+            progress REAL, message TEXT, result TEXT, error TEXT,
+            created_at REAL, started_at REAL, finished_at REAL,
+            owner_pid INTEGER, owner_id TEXT, heartbeat_at REAL)""")
+        # Tables from before jobs had owners
+        columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+        for column, kind in [("owner_pid", "INTEGER"), ("owner_id", "TEXT"), ("heartbeat_at", "REAL")]:
+            if column not in columns:
+                db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (job_key, status)")
+        # At most one queued or running job per kind and params, across
+        # processes. Tables from before this could hold duplicates; all but
+        # the oldest of them are cancelled first.
+        db.execute(f"""UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE status IN {ACTIVE} AND rowid NOT IN
+                       (SELECT MIN(rowid) FROM jobs WHERE status IN {ACTIVE} GROUP BY job_key)""", [time.time()])
+        db.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_key ON jobs (job_key) WHERE status IN {ACTIVE}")
+
+def _as_dict(row):
+    if row is None:
+        return None
+    job = {c: row[c] for c in COLUMNS}
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+def _update(job_id, **fields):
+    # Only while this process still owns the job
+    with _connect() as db:
+        cursor = db.execute(f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE job_id = ? AND owner_id = ?",
+                            [*fields.values(), job_id, _owner_id()])
+    if cursor.rowcount != 1:
+        raise JobLost(job_id)
+
+def get_job(job_id):
+    with _connect() as db:
+        return _as_dict(db.execute("SELECT * FROM jobs WHERE job_id = ?", [job_id]).fetchone())
+
+def list_jobs(status=None, limit=100):
+    query = "SELECT * FROM jobs"
+    args = []
+    if status:
+        query += " WHERE status = ?"
+        args.append(status)
+    with _connect() as db:
+        rows = db.execute(query + " ORDER BY created_at DESC LIMIT ?", [*args, limit]).fetchall()
+    return [_as_dict(row) for row in rows]
+
+def _job_key(kind, params):
+    return kind + ":" + json.dumps(params, sort_keys=True)
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _abandoned(row, now):
+    if row["owner_id"] == _owner_id():
+        return False
+    if row["owner_pid"] is None or row["owner_pid"] == os.getpid():
+        return True
+    if row["heartbeat_at"] is None or row["heartbeat_at"] < now - JOB_STALE_SECONDS:
+        return True
+    return not _is_alive(row["owner_pid"])
+
+def _start(job_id):
+    _done[job_id] = threading.Event()
+    _executor.submit(_run, job_id)
+    _start_heartbeat()
+
+def _take_over(row):
+    # Requeues an abandoned job in this process; False if another process
+    # got to it first or its kind isn't known here
+    if row["kind"] not in _kinds:
+        return False
+    now = time.time()
+    status = "cancelled" if row["status"] == "cancelling" else "queued"
+    with _connect() as db:
+        cursor = db.execute("""UPDATE jobs SET status = ?, progress = 0, started_at = NULL, owner_pid = ?, owner_id = ?,
+                               heartbeat_at = ?, finished_at = ? WHERE job_id = ? AND status = ? AND owner_id IS ?""",
+                            [status, os.getpid(), _owner_id(), now, now if status == "cancelled" else None,
+                             row["job_id"], row["status"], row["owner_id"]])
+    if cursor.rowcount != 1:
+        return False
+    if status == "queued":
+        _start(row["job_id"])
+    return True
+
+def submit(kind, **params):
+    # Queues a job, or returns the queued or running job with the same kind
+    # and params (taking it over if its owner is gone). Returns None when the
+    # kind's ready() says there is nothing to do.
+    fn, ready, _ = _kinds[kind]
+    if ready is not None and ready(params):
+        return None
+    key = _job_key(kind, params)
+    while True:
+        with _connect() as db:
+            row = db.execute(f"SELECT * FROM jobs WHERE job_key = ? AND status IN {ACTIVE}", [key]).fetchone()
+            if row is None:
+                job_id = uuid.uuid4().hex
+                try:
+                    db.execute("""INSERT INTO jobs (job_id, kind, params, job_key, status, progress, created_at, owner_pid, owner_id, heartbeat_at)
+                                  VALUES (?, ?, ?, ?, 'queued', 0, ?, ?, ?, ?)""",
+                               [job_id, kind, json.dumps(params), key, time.time(), os.getpid(), _owner_id(), time.time()])
+                except sqlite3.IntegrityError:
+                    continue  # another process queued it first; return that one
+        break
+    if row is not None:
+        if _abandoned(row, time.time()):
+            _take_over(row)
+        return get_job(row["job_id"])
+    _start(job_id)
+    return get_job(job_id)
+
+def _claim(job_id):
+    # queued -> running, unless it was cancelled (or taken over) meanwhile
+    with _connect() as db:
+        cursor = db.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE job_id = ? AND status = 'queued' AND owner_id = ?",
+                            [time.time(), job_id, _owner_id()])
+        return cursor.rowcount == 1
+
+def _run(job_id):
+    try:
+        if not _claim(job_id):
+            return
+        job = get_job(job_id)
+        fn = _kinds[job["kind"]][0]
+
+        def progress(fraction, message=None):
+            # Also where a running job finds out it was cancelled or taken over
+            with _connect() as db:
+                row = db.execute("SELECT status, owner_id FROM jobs WHERE job_id = ?", [job_id]).fetchone()
+            if row["owner_id"] != _owner_id():
+                raise JobLost(job_id)
+            if row["status"] == "cancelling":
+                raise JobCancelled()
+            _update(job_id, progress=round(fraction, 3), message=message, heartbeat_at=time.time())
+
+        result = fn(job["params"], progress)
+        _update(job_id, status="done", progress=1, result=json.dumps(result), finished_at=time.time())
+    except JobLost:
+        pass
+    except JobCancelled:
+        _finish(job_id, status="cancelled", finished_at=time.time())
+    except Exception as e:
+        traceback.print_exc()
+        _finish(job_id, status="failed", error=str(e), finished_at=time.time())
+    finally:
+        event = _done.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+def _finish(job_id, **fields):
+    try:
+        _update(job_id, **fields)
+    except JobLost:
+        pass
+
+def _heartbeat():
+    # Keeps this process's jobs, queued ones included, from looking
+    # abandoned, and takes over jobs other processes left behind
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            with _connect() as db:
+                db.execute(f"UPDATE jobs SET heartbeat_at = ? WHERE owner_id = ? AND status IN {OWNED}",
+                           [time.time(), _owner_id()])
+            _take_over_abandoned()
+        except Exception:
+            traceback.print_exc()
+
+def _start_heartbeat():
+    # Once per process; threads don't survive a fork
+    global _heartbeat_pid
+    with _lock:
+        if _heartbeat_pid == os.getpid():
+            return
+        _heartbeat_pid = os.getpid()
+    threading.Thread(target=_heartbeat, name="jobs-heartbeat", daemon=True).start()
+
+def _take_over_abandoned():
+    now = time.time()
+    with _connect() as db:
+        rows = db.execute(f"SELECT * FROM jobs WHERE status IN {OWNED} ORDER BY created_at").fetchall()
+    return sum(1 for row in rows if _abandoned(row, now) and _take_over(row))
+
+def release(pid):
+    # Marks the jobs of a process known to be gone as abandoned right away
+    # (serve.py's master, after reaping a worker)
+    with _connect() as db:
+        db.execute(f"UPDATE jobs SET owner_pid = NULL, owner_id = NULL WHERE owner_pid = ? AND status IN {OWNED}", [pid])
+
+def cancel(job_id):
+    # Queued jobs are cancelled right away; running ones stop at their
+    # next progress report
+    with _connect() as db:
+        db.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE job_id = ? AND status = 'queued'",
+                   [time.time(), job_id])
+        db.execute("UPDATE jobs SET status = 'cancelling' WHERE job_id = ? AND status = 'running'", [job_id])
+    return get_job(job_id)
+
+def wait(job_id, timeout=JOB_WAIT_SECONDS):
+    # The job once it finished, or as it is after timeout seconds
+    deadline = time.monotonic() + timeout
+    event = _done.get(job_id)
+    if event is not None:
+        event.wait(timeout)
+    job = get_job(job_id)
+    # Jobs run by another process are polled
+    while job is not None and job["status"] not in FINISHED and time.monotonic() < deadline:
+        time.sleep(POLL_SECONDS)
+        job = get_job(job_id)
+    return job
+
+def run(kind, timeout=JOB_WAIT_SECONDS, **params):
+    # For routes: None once the work is done, else the unfinished job.
+    # A failed job raises its error.
+    job = submit(kind, **params)
+    if job is None:
+        return None
+    job = wait(job["job_id"], timeout)
+    if job["status"] == "failed":
+        raise RuntimeError(job["error"])
+    if job["status"] == "done":
+        return None
+    return job
+
+def shutdown():
+    # Returns once every job this process queued has finished
+    _executor.shutdown(wait=True)
+
+def resume():
+    # For server processes on start: takes over what processes that are
+    # gone left queued or running, drops old finished jobs, and starts the
+    # heartbeat and its sweep
+    with _connect() as db:
+        db.execute(f"DELETE FROM jobs WHERE status IN {FINISHED} AND finished_at < ?",
+                   [time.time() - JOB_KEEP_DAYS * 86400])
+    _start_heartbeat()
+    return _take_over_abandoned()
+
+_init_db()
@@ -0,0 +1,76 @@
+import threading
+from collections import OrderedDict
+
+# Thread-safe LRU cache bounded by the total size of its values
+# (as reported by `sizeof`) rather than by the number of entries.
+class LRUCache:
+    def __init__(self, max_bytes, sizeof):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self._items = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+        # One lock per key being loaded so concurrent misses on the same key
+        # wait for a single load instead of each starting their own
+        self._load_locks = {}
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return default
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            self._remove(key)
+            # Values larger than the whole budget are never cached
+            if size > self.max_bytes:
+                return
+            self._items[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                oldest = next(iter(self._items))
+                self._remove(oldest)
+
+    def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            value = self.get(key)
+            if value is None:
+                value = loader()
+                self.put(key, value)
+        with self._lock:
+            self._load_locks.pop(key, None)
+        return value
+
+    def pop(self, key):
+        with self._lock:
+            return self._remove(key)
+
+    def discard_where(self, predicate):
+        with self._lock:
+            for key in [k for k in self._items if predicate(k)]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def _remove(self, key):
+        item = self._items.pop(key, None)
+        if item is None:
+            return None
+        self.nbytes -= item[1]
+        return item[0]
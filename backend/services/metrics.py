@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import bisect
+import threading
+import traceback
+from collections import deque
+from contextlib import nullcontext
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+# Per-request stage timing. Code wraps its expensive steps in
+# `with stage("search"):`; each response then carries a Server-Timing header
+# with the stages of that request, and every (route, stage) pair feeds a
+# histogram that /metrics exports in Prometheus text format. Stages can
+# nest (a "search" may include the "read_parquet" it needed), and repeated
+# stages in one request add up. With METRICS_ENABLED=0, or outside a request (background
+# builds, batch workers), stage() hands back a shared no-op context.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+# The window the quantiles on /metrics cover, in seconds
+METRICS_WINDOW_SECONDS = int(os.environ.get("METRICS_WINDOW_SECONDS", 600))
+WINDOW_SLICES = 10
+SLICE_SECONDS = METRICS_WINDOW_SECONDS / WINDOW_SLICES
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.9, 0.99)
+PREFIX = "churn"
+# Under serve.py every worker process keeps its own histograms; they also
+# write them to this folder every METRICS_SYNC_SECONDS, and /metrics on any
+# worker reports the sum over all of them (the others' as of their last write)
+METRICS_DIR = os.environ.get("METRICS_DIR")
+METRICS_SYNC_SECONDS = float(os.environ.get("METRICS_SYNC_SECONDS", 2))
+
+_noop = nullcontext()
+
+class _Stage:
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.timings[self.name] = self.timings.get(self.name, 0.0) + time.perf_counter() - self.started
+
+def stage(name):
+    if not METRICS_ENABLED or not has_request_context():
+        return _noop
+    timings = g.get("stage_timings")
+    if timings is None:
+        return _noop
+    return _Stage(timings, name)
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+
+    def state(self):
+        return [self.counts, self.sum, self.count]
+
+    @classmethod
+    def from_state(cls, state):
+        histogram = cls()
+        histogram.counts, histogram.sum, histogram.count = list(state[0]), state[1], state[2]
+        return histogram
+
+    def quantile(self, q):
+        # Linear interpolation inside the bucket, like PromQL's histogram_quantile
+        if not self.count:
+            return float("nan")
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return BUCKETS[-1]
+
+class RollingHistogram:
+    # All-time counts for the Prometheus histogram, plus the last
+    # METRICS_WINDOW_SECONDS kept in slices for the quantiles
+    def __init__(self):
+        self.total = Histogram()
+        self.slices = deque()
+
+    def observe(self, seconds, now):
+        self.total.observe(seconds)
+        slice_start = now - now % SLICE_SECONDS
+        if not self.slices or self.slices[-1][0] != slice_start:
+            self.slices.append((slice_start, Histogram()))
+            self._expire(now)
+        self.slices[-1][1].observe(seconds)
+
+    def _expire(self, now):
+        while self.slices and self.slices[0][0] <= now - METRICS_WINDOW_SECONDS:
+            self.slices.popleft()
+
+    def window(self, now):
+        self._expire(now)
+        merged = Histogram()
+        for _, histogram in self.slices:
+            merged.merge(histogram)
+        return merged
+
+    def state(self):
+        return {"total": self.total.state(), "slices": [[start, *h.state()] for start, h in self.slices]}
+
+    def merge_state(self, state):
+        self.total.merge(Histogram.from_state(state["total"]))
+        slices = dict(self.slices)
+        for start, *histogram in state["slices"]:
+            slices.setdefault(start, Histogram()).merge(Histogram.from_state(histogram))
+        self.slices = deque(sorted(slices.items()))
+
+_histograms = {}
+_responses = {}
+_lock = threading.Lock()
+
+def observe(route, timings, status):
+    now = time.time()
+    with _lock:
+        for name, seconds in timings.items():
+            histogram = _histograms.get((route, name))
+            if histogram is None:
+                histogram = _histograms[(route, name)] = RollingHistogram()
+            histogram.observe(seconds, now)
+        _responses[(route, status)] = _responses.get((route, status), 0) + 1
+
+def _before_request():
+    g.stage_timings = {}
+    g.request_started = time.perf_counter()
+
+def _after_request(response):
+    timings = g.get("stage_timings")
+    if timings is None:
+        return response
+    timings["total"] = time.perf_counter() - g.request_started
+    response.headers["Server-Timing"] = ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+    observe(request.endpoint or "unmatched", timings, response.status_code)
+    return response
+
+class TimedJSONProvider(DefaultJSONProvider):
+    # JSON encoding of responses is a stage of its own
+    def dumps(self, obj, **kwargs):
+        with stage("json"):
+            return super().dumps(obj, **kwargs)
+
+def init_app(app):
+    if not METRICS_ENABLED:
+        return
+    app.json = TimedJSONProvider(app)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+def _snapshot():
+    with _lock:
+        return {
+            "histograms": [[route, name, histogram.state()] for (route, name), histogram in _histograms.items()],
+            "responses": [[route, status, count] for (route, status), count in _responses.items()]
+        }
+
+def write_snapshot():
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(_snapshot(), f)
+    os.replace(tmp_path, path)
+
+def _sync():
+    while True:
+        time.sleep(METRICS_SYNC_SECONDS)
+        try:
+            write_snapshot()
+        except Exception:
+            traceback.print_exc()
+
+def start_sync():
+    # For serve.py workers
+    if METRICS_ENABLED and METRICS_DIR:
+        threading.Thread(target=_sync, name="metrics-sync", daemon=True).start()
+
+def _collect():
+    # This process's histograms and response counts, plus the last ones the
+    # other workers wrote. Files of workers that exited stay, so the totals
+    # never go down.
+    snapshots = [_snapshot()]
+    if METRICS_DIR:
+        own = f"{os.getpid()}.json"
+        for name in os.listdir(METRICS_DIR):
+            if name.endswith(".json") and name != own:
+                try:
+                    with open(os.path.join(METRICS_DIR, name)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    pass
+
+    histograms = {}
+    responses = {}
+    for snapshot in snapshots:
+        for route, name, state in snapshot["histograms"]:
+            histograms.setdefault((route, name), RollingHistogram()).merge_state(state)
+        for route, status, count in snapshot["responses"]:
+            responses[(route, status)] = responses.get((route, status), 0) + count
+    return histograms, responses
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+def prometheus_text():
+    now = time.time()
+    name = f"{PREFIX}_request_stage_seconds"
+    window_name = f"{PREFIX}_request_stage_window_seconds"
+    lines = [f"# HELP {name} Time spent in each stage of a request, by route.",
+             f"# TYPE {name} histogram"]
+    windows = []
+    histograms, responses = _collect()
+    for (route, stage_name), histogram in sorted(histograms.items()):
+        total = histogram.total
+        cumulative = 0
+        for bound, count in zip(BUCKETS, total.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(route=route, stage=stage_name, le=bound)} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(route=route, stage=stage_name, le='+Inf')} {total.count}")
+        lines.append(f"{name}_sum{_labels(route=route, stage=stage_name)} {total.sum:.6f}")
+        lines.append(f"{name}_count{_labels(route=route, stage=stage_name)} {total.count}")
+        windows.append((route, stage_name, histogram.window(now)))
+    responses = sorted(responses.items())
+
+    lines += [f"# HELP {window_name} Stage time quantiles over the last {METRICS_WINDOW_SECONDS} seconds.",
+              f"# TYPE {window_name} summary"]
+    for route, stage_name, window in windows:
+        for q in QUANTILES:
+            lines.append(f"{window_name}{_labels(route=route, stage=stage_name, quantile=q)} {window.quantile(q):.6f}")
+        lines.append(f"{window_name}_sum{_labels(route=route, stage=stage_name)} {window.sum:.6f}")
+        lines.append(f"{window_name}_count{_labels(route=route, stage=stage_name)} {window.count}")
+
+    lines += [f"# HELP {PREFIX}_responses_total Responses sent, by route and status.",
+              f"# TYPE {PREFIX}_responses_total counter"]
+    for (route, status), count in responses:
+        lines.append(f"{PREFIX}_responses_total{_labels(route=route, status=status)} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,85 @@
+import os
+import threading
+from services.lru import LRUCache
+from services.prediction_cache import artifact_version, drop_model
+from services.scoring import VERSIONS_DIR, artifact_paths, compile_scorer, live_version, load_artifacts, version_dir
+
+# Model + preprocessor pairs, loaded on first use. Versions are folders under
+# models/versions/ that never change once written, and models/current.json
+# names the live one (the artifacts at the top of models/ until a version is
+# promoted). Requests can also pin a version by name or by content hash. A
+# name is resolved to its folder once and both artifacts are loaded from
+# that folder, so promoting a version never pairs one version's model with
+# another's scaler. Loaded pairs are keyed by content hash, so the same
+# artifacts found under two names share one copy in memory.
+LIVE_NAME = "live"
+MAX_LOADED_MODELS = int(os.environ.get("MAX_LOADED_MODELS", 4))
+
+_loaded = LRUCache(MAX_LOADED_MODELS, lambda entry: 1)
+_live_version = None
+_live_lock = threading.Lock()
+
+def is_live(name):
+    return name in (None, "", LIVE_NAME)
+
+def _named_paths(name):
+    if is_live(name):
+        folder = version_dir(live_version())
+    elif os.path.basename(name) != name or name.startswith("."):
+        return None
+    else:
+        folder = version_dir(name)
+    paths = artifact_paths(folder)
+    return paths if all(os.path.exists(p) for p in paths) else None
+
+def _versions():
+    # (name, paths, content hash) of every complete version, live first
+    names = [LIVE_NAME] + sorted(os.listdir(VERSIONS_DIR) if os.path.isdir(VERSIONS_DIR) else [])
+    for name in names:
+        paths = _named_paths(name)
+        if paths is not None:
+            yield name, paths, artifact_version(*paths)
+
+def list_versions():
+    return [{"name": name, "version": version, "loaded": _loaded.get(version) is not None}
+            for name, _, version in _versions()]
+
+def version_paths(name=None):
+    # (model path, preprocessor path) for a version name or content hash
+    paths = _named_paths(name)
+    if paths is None:
+        for _, paths, version in _versions():
+            if version == name:
+                return paths
+        raise KeyError(f"Unknown model version '{name}'")
+    return paths
+
+def has_version(name):
+    try:
+        version_paths(name)
+        return True
+    except KeyError:
+        return False
+
+def get_model(name=None):
+    # Returns {"version", "model", "preprocessor", "scorer"}; callers keep the dict for
+    # the whole request so a swap never mixes two versions mid-request
+    global _live_version
+    paths = version_paths(name)
+    version = artifact_version(*paths)
+
+    def load():
+        model, preprocessor = load_artifacts(*paths)
+        return {"version": version, "model": model, "preprocessor": preprocessor,
+                "scorer": compile_scorer(model, preprocessor)}
+
+    entry = _loaded.get_or_load(version, load)
+
+    # A newly promoted version replaces the previous live version
+    if is_live(name) and version != _live_version:
+        with _live_lock:
+            previous, _live_version = _live_version, version
+        if previous is not None and previous != version:
+            _loaded.pop(previous)
+            drop_model(previous)
+    return entry
@@ -0,0 +1,96 @@
+import json
+import numpy as np
+import pandas as pd
+
+# Normalization of raw sheet values for the dashboard's frequency charts.
+# Work is done once per distinct value and broadcast back to the rows, so
+# the cost follows the column's cardinality rather than its length.
+MISSING_LABEL = "Missing"
+MISSING_LIST = ["unknown", "nknown", "invalid json", "null", "none", "empty", "missing"]
+
+# Persian and Arabic-Indic digits -> Latin digits, built once
+DIGIT_TABLE = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+
+def extract_json(value):
+    # True NaN
+    if pd.isna(value):
+        return MISSING_LABEL
+
+    # Empty containers / strings
+    if value in ["", [], {}, "[]"]:
+        return MISSING_LABEL
+
+    # String-specific checks
+    if isinstance(value, str):
+        v = value.strip().lower()
+
+        # Catch common missing/invalid indicators
+        if v in MISSING_LIST:
+            return MISSING_LABEL
+
+        # Try parsing JSON
+        if v.startswith("[{"):
+            try:
+                data = json.loads(value)
+                if isinstance(data, list) and len(data) > 0 and isinstance(data[0], dict):
+                    # Check for multiple possible keys
+                    for key in ["carrier_name", "name"]:
+                        if key in data[0]:
+                            return data[0][key] if data[0][key] else MISSING_LABEL
+                return MISSING_LABEL
+            except Exception:
+                return MISSING_LABEL
+
+    # Otherwise return the value as-is
+    return value
+
+def label_codes(series):
+    # Normalized label of every distinct value, and for each row the position
+    # of its label. Labels may repeat when distinct raw values normalize alike.
+    # Object columns are told apart by their text: pandas hashes 3, 3.0 and
+    # True alike, but their labels differ
+    keys = series.astype(str).where(series.notna()) if series.dtype == object else series
+    codes, uniques = pd.factorize(keys, use_na_sentinel=True)
+    if series.dtype == object:
+        _, first = np.unique(codes[codes >= 0], return_index=True)
+        uniques = series.to_numpy()[np.flatnonzero(codes >= 0)[first]]
+    values = [extract_json(v) for v in uniques] + [MISSING_LABEL]  # last slot: NaN rows
+    labels = pd.Series(values, dtype=object).astype(str).str.strip().str.title()
+    return labels, np.where(codes < 0, len(uniques), codes)
+
+def row_labels(series):
+    labels, codes = label_codes(series)
+    return pd.Series(labels.to_numpy()[codes], index=series.index)
+
+def normalize_labels(series):
+    # Returns the normalized label of every distinct value and how many rows
+    # carry it
+    labels, codes = label_codes(series)
+    counts = np.bincount(codes, minlength=len(labels))
+    keep = counts > 0
+    return labels[keep].reset_index(drop=True), counts[keep]
+
+def parse_dates(values):
+    # Vectorized ISO parse with a per-value fallback for whatever ISO rejects
+    text = pd.Series(values, dtype=object).astype(str).str.translate(DIGIT_TABLE)
+    parsed = pd.to_datetime(text, format="ISO8601", errors="coerce")
+
+    rest = parsed.isna()
+    if rest.any():
+        parsed[rest] = pd.to_datetime(text[rest], format="mixed", errors="coerce")
+    return parsed
+
+def column_frequency(series):
+    labels, counts = normalize_labels(series)
+
+    # Date columns are counted per month
+    dates = parse_dates(labels)
+    found = dates.notna().to_numpy()
+    if found.any():
+        months = dates[found].dt.to_period("M")
+        frequency_series = pd.Series(counts[found]).groupby(months.to_numpy()).sum().sort_index()
+        return {str(k): int(v) for k, v in frequency_series.items()}
+
+    # Normal categorical / string column
+    frequency_series = pd.Series(counts).groupby(labels.to_numpy(), sort=False).sum()
+    return {k: int(v) for k, v in frequency_series.sort_values(ascending=False).items()}
@@ -0,0 +1,68 @@
+import os
+import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from services.metrics import stage
+
+# One keep-alive HTTP session shared by every chat request, and a cap on how
+# many generations run against the model at once; extra questions wait for a
+# free slot instead of piling onto Ollama.
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api/chat")
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.2:3b")
+OLLAMA_TIMEOUT = int(os.environ.get("OLLAMA_TIMEOUT", 120))
+OLLAMA_MAX_CONCURRENCY = int(os.environ.get("OLLAMA_MAX_CONCURRENCY", 2))
+# How long a question waits for a free slot before giving up
+OLLAMA_QUEUE_TIMEOUT = int(os.environ.get("OLLAMA_QUEUE_TIMEOUT", 60))
+
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_MAX_CONCURRENCY))
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_MAX_CONCURRENCY))
+_slots = threading.BoundedSemaphore(OLLAMA_MAX_CONCURRENCY)
+
+class OllamaBusy(Exception):
+    pass
+
+def _payload(messages, stream):
+    return {"model": OLLAMA_MODEL, "messages": messages, "options": {"temperature": 0.2}, "stream": stream}
+
+def _acquire():
+    if not _slots.acquire(timeout=OLLAMA_QUEUE_TIMEOUT):
+        raise OllamaBusy("The model is busy, please try again in a moment.")
+
+def _content(resp_json):
+    if "message" in resp_json and "content" in resp_json["message"]:
+        return resp_json["message"]["content"]
+    if "response" in resp_json:
+        return resp_json["response"]
+    if "error" in resp_json:
+        return f"Ollama error: {resp_json['error']}"
+    return None
+
+def chat(messages):
+    # Whole answer in one response
+    with stage("llm"):
+        _acquire()
+        try:
+            response = _session.post(OLLAMA_URL, json=_payload(messages, False), timeout=OLLAMA_TIMEOUT)
+            return _content(response.json()) or "No explanation returned from LLM."
+        finally:
+            _slots.release()
+
+def stream_chat(messages):
+    # Yields the answer piece by piece as Ollama generates it. The slot is
+    # held until the stream ends or the consumer stops iterating.
+    _acquire()
+    try:
+        with _session.post(OLLAMA_URL, json=_payload(messages, True), timeout=OLLAMA_TIMEOUT, stream=True) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                content = _content(chunk)
+                # Read to the end even after "done" so the connection goes
+                # back to the pool instead of being closed
+                if content:
+                    yield content
+    finally:
+        _slots.release()
@@ -0,0 +1,122 @@
+import os
+import json
+import hashlib
+import numpy as np
+from services.derived import derived_dir, sheet_key
+from services.lru import LRUCache
+from services.metrics import stage
+from services.scoring import DATE_COLUMNS, format_prefix, row_fingerprints
+from services.sheet_cache import file_version, read_sheet, register_invalidator
+
+# Scored outputs for a sheet, computed once per (file version, sheet, model
+# version). Only the probability and label arrays are kept; the rest of the
+# response comes from the sheet cache. Each sheet's scores are also saved
+# next to the upload with a fingerprint of every row's feature inputs, so
+# when the workbook is uploaded again only the new or changed rows are scored.
+PREDICTION_CACHE_MAX_BYTES = int(os.environ.get("PREDICTION_CACHE_MAX_MB", 256)) * 1024 * 1024
+
+PROBA_COLUMN = "Churn Prediction Probability"
+LABEL_COLUMN = "Churn Prediction"
+
+def scores_nbytes(scores):
+    return scores["proba"].nbytes + scores["label"].nbytes
+
+_scores = LRUCache(PREDICTION_CACHE_MAX_BYTES, scores_nbytes)
+_artifact_hashes = LRUCache(64, lambda digest: 1)
+
+def artifact_version(*paths):
+    # Content hash of the model artifacts, rehashed only when their stat changes
+    stats = []
+    for path in paths:
+        st = os.stat(path)
+        stats.append((os.path.abspath(path), st.st_mtime_ns, st.st_size))
+
+    def digest():
+        h = hashlib.sha256()
+        for path in paths:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+        return h.hexdigest()[:16]
+
+    return _artifact_hashes.get_or_load(tuple(stats), digest)
+
+def saved_scores_path(filepath, sheet, model_version):
+    return os.path.join(derived_dir(filepath, "predictions"), sheet_key(sheet), f"{model_version}.npz")
+
+def _load_saved(path, context):
+    try:
+        with np.load(path) as saved:
+            if str(saved["context"]) != context:
+                return None
+            return {name: saved[name] for name in ["fingerprints", "proba", "label"]}
+    except (OSError, KeyError, ValueError):
+        return None
+
+def _save(path, context, fingerprints, proba, label):
+    # Sorted unique fingerprints, for lookups with searchsorted
+    fingerprints, first = np.unique(fingerprints, return_index=True)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, context=np.array(context), fingerprints=fingerprints, proba=proba[first], label=label[first])
+    os.replace(tmp_path, path)
+
+def score_incrementally(filepath, sheet, model_version, df, scorer):
+    # Rows whose fingerprint was scored for the previous upload of this
+    # sheet reuse that score; the rest go through scorer(df) -> (proba,
+    # label), together with the leading rows their date parsing depends on.
+    # Saved scores only apply while those leading rows are unchanged.
+    with stage("fingerprint"):
+        fingerprints = row_fingerprints(df)
+        prefix = format_prefix(df)
+        columns = [[c, str(df[c].dtype)] for c in DATE_COLUMNS if c in df.columns]
+        context = hashlib.sha256(json.dumps([model_version, columns]).encode("utf-8") + fingerprints[:prefix].tobytes()).hexdigest()
+        path = saved_scores_path(filepath, sheet, model_version)
+
+        proba = label = None
+        new_rows = np.arange(len(df))
+        saved = _load_saved(path, context)
+        if saved is not None and len(saved["fingerprints"]):
+            pos = np.minimum(np.searchsorted(saved["fingerprints"], fingerprints), len(saved["fingerprints"]) - 1)
+            known = saved["fingerprints"][pos] == fingerprints
+            proba = saved["proba"][pos]
+            label = saved["label"][pos]
+            new_rows = np.flatnonzero(~known)
+
+    with stage("predict"):
+        if proba is None:
+            proba, label = scorer(df)
+        elif len(new_rows):
+            rows = np.union1d(np.arange(prefix), new_rows)
+            new_proba, new_label = scorer(df.iloc[rows])
+            proba[rows] = new_proba
+            label[rows] = new_label
+
+    if len(new_rows):
+        _save(path, context, fingerprints, proba, label)
+    return proba, label
+
+def get_scores(filepath, sheet, model_version, scorer):
+    # scorer(df) -> (proba, label) for the given rows of the sheet
+    key = (*file_version(filepath), sheet, model_version)
+
+    def load():
+        proba, label = score_incrementally(filepath, sheet, model_version, read_sheet(filepath, sheet), scorer)
+        return {"proba": proba, "label": label}
+
+    return _scores.get_or_load(key, load)
+
+def has_scores(filepath, sheet, model_version):
+    return _scores.get((*file_version(filepath), sheet, model_version)) is not None
+
+def scored_frame(df, scores):
+    df[PROBA_COLUMN] = scores["proba"]
+    df[LABEL_COLUMN] = scores["label"]
+    return df
+
+def drop_model(model_version):
+    _scores.discard_where(lambda key: key[-1] == model_version)
+
+@register_invalidator
+def invalidate_file(path):
+    _scores.discard_where(lambda key: key[0] == path)
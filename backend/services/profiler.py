@@ -0,0 +1,201 @@
+import os
+import json
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from services.derived import derived_dir, source_version, sheet_key
+from services.lru import LRUCache
+from services.normalize import column_frequency
+from services.sheet_cache import file_version, read_sheet, sheet_names, register_invalidator
+
+# Column profiles computed once per uploaded sheet, in the background, and
+# stored as compact JSON so the dashboard endpoints don't rescan the sheet on
+# every click: per-column value counts / monthly histograms, the numeric
+# correlation matrix and per-column churn breakdowns.
+PROFILE_WORKERS = int(os.environ.get("PROFILE_WORKERS", 1))
+# Charts with more categories than this are left out of the stored profile
+# and computed on request instead
+PROFILE_MAX_CATEGORIES = int(os.environ.get("PROFILE_MAX_CATEGORIES", 5000))
+# Bumped when the stored profile layout changes, so older profiles are rebuilt
+PROFILE_FORMAT = 2
+
+CHURN_COLUMNS = ['Chrn Flag', 'Churn', 'Churn Flag']
+DATE_COLUMNS = ['active_date', 'last_boot_date', 'interval_date']
+
+def find_churn_column(columns):
+    return next((c for c in CHURN_COLUMNS if c in columns), None)
+
+def correlation_matrix(df):
+    # Returns None when the sheet has no numeric columns
+    df = df.copy()
+    for date_col in DATE_COLUMNS:
+        if date_col in df.columns:
+            df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+
+    if 'last_boot_date' in df.columns and 'active_date' in df.columns:
+        df['last boot - active'] = (df['last_boot_date'] - df['active_date']).dt.total_seconds() / (3600*24)
+    if 'last_boot_date' in df.columns and 'interval_date' in df.columns:
+        df['last boot - interval'] = (df['last_boot_date'] - df['interval_date']).dt.total_seconds() / (3600*24)
+
+    # Keep only numeric columns for correlation
+    numeric_df = df.select_dtypes(include=["number"])
+    if numeric_df.empty:
+        return None
+
+    corr_df = numeric_df.corr().round(3)
+    return {
+        "columns": corr_df.columns.tolist(),
+        "values": corr_df.astype(object).where(corr_df.notna(), None).values.tolist()
+    }
+
+def box_stats(values):
+    # The summary Plotly draws for a box trace, precomputed, with the points
+    # beyond the fences it draws as outliers
+    values = values.dropna().astype(float).to_numpy()
+    if len(values) == 0:
+        return None
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    lowerfence = values[values >= q1 - 1.5 * iqr].min()
+    upperfence = values[values <= q3 + 1.5 * iqr].max()
+    return {
+        "q1": float(q1),
+        "median": float(median),
+        "q3": float(q3),
+        "lowerfence": float(lowerfence),
+        "upperfence": float(upperfence),
+        "mean": float(values.mean()),
+        "sd": float(values.std()),
+        "outliers": values[(values < lowerfence) | (values > upperfence)].tolist()
+    }
+
+def churn_breakdown(df, column, target):
+    churn = pd.to_numeric(df[target], errors="coerce").fillna(0).astype(int)
+
+    # Numeric column -> box per churn value
+    if pd.api.types.is_numeric_dtype(df[column]):
+        groups = []
+        for val in sorted(churn.unique()):
+            stats = box_stats(df[column][churn == val])
+            if stats is not None:
+                groups.append({"churn": int(val), **stats})
+        return {"kind": "box", "groups": groups}
+
+    # Categorical column -> counts per (value, churn)
+    counts = pd.crosstab(df[column], churn)
+    return {
+        "kind": "bar",
+        "categories": counts.index.astype(str).tolist(),
+        "series": [
+            {"churn": int(churn_val), "counts": counts[churn_val].astype(int).tolist()}
+            for churn_val in counts.columns
+        ]
+    }
+
+def build_profile(df):
+    target = find_churn_column(df.columns)
+    frequency = {}
+    churn = {}
+    for column in df.columns:
+        column_counts = column_frequency(df[column])
+        if len(column_counts) <= PROFILE_MAX_CATEGORIES:
+            frequency[column] = column_counts
+
+        if target is not None:
+            breakdown = churn_breakdown(df, column, target)
+            if len(breakdown.get("categories", [])) <= PROFILE_MAX_CATEGORIES:
+                churn[column] = breakdown
+
+    return {
+        "columns": df.columns.tolist(),
+        "frequency": frequency,
+        "correlation": correlation_matrix(df),
+        "churn_target": target,
+        "churn": churn
+    }
+
+def profile_path(filepath, sheet):
+    return os.path.join(derived_dir(filepath, "profiles"), f"{sheet_key(sheet)}.json")
+
+def save_profile(filepath, sheet, profile):
+    path = profile_path(filepath, sheet)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"format": PROFILE_FORMAT, "source_version": source_version(filepath), "profile": profile}, f,
+                  separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+def _read_profile(filepath, sheet):
+    try:
+        with open(profile_path(filepath, sheet)) as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if stored.get("format") != PROFILE_FORMAT or stored.get("source_version") != source_version(filepath):
+        return {}
+    return stored["profile"]
+
+# Profiles loaded from disk or freshly built
+_profiles = LRUCache(256, lambda profile: 1)
+_executor = ThreadPoolExecutor(max_workers=PROFILE_WORKERS, thread_name_prefix="profiler")
+_pending = set()
+_failed = set()  # sheet versions whose profile could not be built
+_pending_lock = threading.Lock()
+
+def profile_sheet(filepath, sheet, key):
+    # filepath is the content path the profile was scheduled for
+    try:
+        profile = _read_profile(filepath, sheet)
+        if not profile:
+            profile = build_profile(read_sheet(filepath, sheet))
+            if not os.path.exists(filepath):
+                return  # the upload was removed meanwhile
+            save_profile(filepath, sheet, profile)
+        _profiles.put(key, profile)
+    except Exception:
+        if os.path.exists(filepath):
+            traceback.print_exc()
+            with _pending_lock:
+                _failed.add(key)
+    finally:
+        with _pending_lock:
+            _pending.discard(key)
+
+def schedule_profile(filepath, sheet):
+    # The build reads and writes the content the name stands for now, even
+    # if the name is uploaded again while it runs
+    key = (*file_version(filepath), sheet)
+    with _pending_lock:
+        if key in _pending or key in _failed:
+            return
+        _pending.add(key)
+    _executor.submit(profile_sheet, key[0], sheet, key)
+
+def schedule_workbook(filepath):
+    try:
+        for sheet in sheet_names(filepath):
+            schedule_profile(filepath, sheet)
+    except Exception:
+        traceback.print_exc()
+
+def load_profile(filepath, sheet):
+    # Returns the stored profile, or None after queueing one to be built
+    key = (*file_version(filepath), sheet)
+    profile = _profiles.get(key)
+    if not profile:
+        profile = _read_profile(key[0], sheet)
+        if profile:
+            _profiles.put(key, profile)
+    if not profile:
+        schedule_profile(key[0], sheet)
+        return None
+    return profile
+
+@register_invalidator
+def invalidate_file(path):
+    _profiles.discard_where(lambda key: key[0] == path)
+    with _pending_lock:
+        _failed.difference_update([key for key in _failed if key[0] == path])
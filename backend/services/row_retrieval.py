@@ -0,0 +1,226 @@
+import os
+import re
+import json
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from services.derived import derived_dir, source_version, sheet_key
+from services.lru import LRUCache
+from services.metrics import stage
+from services.search_index import search_rows
+from services.sheet_cache import file_version, read_rows, read_sheet, sheet_length, sheet_names, register_invalidator
+
+try:
+    import faiss
+except ImportError:  # faiss is optional, searches fall back to numpy
+    faiss = None
+
+# Per-sheet vector index over row text, so the AI chat can put the rows that
+# relate to a question into the prompt. Built in the background after upload
+# and stored next to the file as one float32 vector per row. Distinctive
+# words of the question (ids, carrier names) are also looked up exactly
+# through the sheet's search index, since hashed vectors blur rare values.
+CHAT_EMBEDDER = os.environ.get("CHAT_EMBEDDER", "hashing")
+CHAT_EMBED_DIM = int(os.environ.get("CHAT_EMBED_DIM", 256))
+CHAT_EMBED_MODEL = os.environ.get("CHAT_EMBED_MODEL", "all-MiniLM-L6-v2")
+CHAT_TOP_K = int(os.environ.get("CHAT_TOP_K", 5))
+# Long cells (JSON blobs) are cut to this many characters in row text
+CELL_CHARS = 200
+EMBED_BATCH_ROWS = 20000
+# A question word is used for exact lookup when it matches few rows: at most
+# this many, or this share of the sheet when that is more
+KEYWORD_MAX_MATCHES = 20
+KEYWORD_MAX_SHARE = 0.01
+TOKEN_PATTERN = r"(?u)[^\W_]+"
+
+class HashingEmbedder:
+    # Offline default: hashed bag of words, no model download
+    def __init__(self, dim=CHAT_EMBED_DIM):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        self.name = f"hashing-{dim}"
+        self.dim = dim
+        self._vectorizer = HashingVectorizer(n_features=dim, norm="l2", stop_words="english",
+                                             token_pattern=TOKEN_PATTERN)
+
+    def embed(self, texts):
+        return self._vectorizer.transform(texts).toarray().astype(np.float32)
+
+class SentenceTransformerEmbedder:
+    def __init__(self, model_name=CHAT_EMBED_MODEL):
+        from sentence_transformers import SentenceTransformer
+        self.name = f"st-{model_name}"
+        self._model = SentenceTransformer(model_name)
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def embed(self, texts):
+        return self._model.encode(list(texts), normalize_embeddings=True).astype(np.float32)
+
+# name -> factory; CHAT_EMBEDDER picks one
+EMBEDDERS = {
+    "hashing": HashingEmbedder,
+    "sentence-transformers": SentenceTransformerEmbedder
+}
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+def get_embedder():
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            _embedder = EMBEDDERS[CHAT_EMBEDDER]()
+        return _embedder
+
+def row_texts(df):
+    # "column: value | column: value ..." per row, skipping empty cells
+    text = None
+    for column in df.columns:
+        values = df[column]
+        cell = (f"{column}: " + values.astype(str).str.slice(0, CELL_CHARS)).where(values.notna(), "")
+        text = cell if text is None else text.str.cat(cell, sep=" | ")
+    if text is None:
+        return []
+    return text.tolist()
+
+def index_dir(filepath, sheet):
+    return os.path.join(derived_dir(filepath, "retrieval"), sheet_key(sheet))
+
+def build_index(filepath, sheet):
+    df = read_sheet(filepath, sheet)
+    embedder = get_embedder()
+    out_dir = index_dir(filepath, sheet)
+    os.makedirs(out_dir, exist_ok=True)
+
+    tmp_path = os.path.join(out_dir, "vectors.tmp.npy")
+    vectors = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(len(df), embedder.dim))
+    for start in range(0, len(df), EMBED_BATCH_ROWS):
+        batch = df.iloc[start:start + EMBED_BATCH_ROWS]
+        vectors[start:start + len(batch)] = embedder.embed(row_texts(batch))
+    vectors.flush()
+    del vectors
+    os.replace(tmp_path, os.path.join(out_dir, "vectors.npy"))
+
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump({"source_version": source_version(filepath), "embedder": embedder.name}, f)
+
+def _open_index(filepath, sheet):
+    # Returns None unless an index for this file version and embedder exists
+    out_dir = index_dir(filepath, sheet)
+    try:
+        with open(os.path.join(out_dir, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("source_version") != source_version(filepath) or meta.get("embedder") != get_embedder().name:
+        return None
+
+    vectors = np.load(os.path.join(out_dir, "vectors.npy"), mmap_mode="r")
+    if faiss is not None:
+        index = faiss.IndexFlatIP(vectors.shape[1])
+        index.add(np.ascontiguousarray(vectors))
+        return {"faiss": index, "rows": vectors.shape[0]}
+    return {"vectors": vectors, "rows": vectors.shape[0]}
+
+_indexes = LRUCache(16, lambda index: 1)
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retrieval")
+_pending = set()
+_failed = set()
+_pending_lock = threading.Lock()
+
+def _build(filepath, sheet, key):
+    # filepath is the content path the index was scheduled for
+    try:
+        if _open_index(filepath, sheet) is None:
+            build_index(filepath, sheet)
+    except Exception:
+        # Failing because the upload was removed meanwhile isn't an error
+        if os.path.exists(filepath):
+            traceback.print_exc()
+            with _pending_lock:
+                _failed.add(key)
+    finally:
+        with _pending_lock:
+            _pending.discard(key)
+
+def schedule_index(filepath, sheet):
+    key = (*file_version(filepath), sheet)
+    with _pending_lock:
+        if key in _pending or key in _failed:
+            return
+        _pending.add(key)
+    _executor.submit(_build, key[0], sheet, key)
+
+def schedule_workbook(filepath):
+    try:
+        for sheet in sheet_names(filepath):
+            schedule_index(filepath, sheet)
+    except Exception:
+        traceback.print_exc()
+
+def top_rows(filepath, sheet, question, k=CHAT_TOP_K):
+    # Positions of the k rows closest to the question; empty while the
+    # index is still being built
+    key = (*file_version(filepath), sheet)
+    index = _indexes.get(key)
+    if index is None:
+        index = _open_index(key[0], sheet)
+        if index is None:
+            schedule_index(key[0], sheet)
+            return []
+        _indexes.put(key, index)
+
+    k = min(k, index["rows"])
+    if k == 0:
+        return []
+    query = get_embedder().embed([question])
+    if not query.any():
+        return []
+
+    if "faiss" in index:
+        scores, rows = index["faiss"].search(query, k)
+        return [int(r) for r, s in zip(rows[0], scores[0]) if r >= 0 and s > 0]
+
+    scores = np.asarray(index["vectors"] @ query[0])
+    rows = np.argpartition(-scores, k - 1)[:k]
+    rows = rows[np.argsort(-scores[rows])]
+    return [int(r) for r in rows if scores[r] > 0]
+
+def keyword_rows(filepath, sheet, question, k=CHAT_TOP_K):
+    # Rows holding the question's most selective words verbatim
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    words = {w for w in re.findall(TOKEN_PATTERN, question.lower()) if len(w) >= 3 and w not in ENGLISH_STOP_WORDS}
+
+    if not words:
+        return []
+    limit = max(KEYWORD_MAX_MATCHES, int(sheet_length(filepath, sheet) * KEYWORD_MAX_SHARE))
+    matches = []
+    for word in words:
+        found = search_rows(filepath, sheet, word, lambda path: read_sheet(path, sheet))
+        if 0 < len(found) <= limit:
+            matches.append((word, found))
+
+    rows = []
+    # Longer words first (short ones also match inside other words), then
+    # the rarer ones
+    for word, found in sorted(matches, key=lambda m: (-len(m[0]), len(m[1]))):
+        rows.extend(int(r) for r in found[:k] if r not in rows)
+    return rows[:k]
+
+def related_rows(filepath, sheet, question, k=CHAT_TOP_K):
+    # The top rows as records of strings, long cells cut short
+    with stage("retrieve"):
+        rows = keyword_rows(filepath, sheet, question, k)
+        rows += [r for r in top_rows(filepath, sheet, question, k) if r not in rows]
+        rows = rows[:k]
+    if not rows:
+        return []
+    df = read_rows(filepath, sheet, rows)
+    df = df.astype(str).apply(lambda col: col.str.slice(0, CELL_CHARS)).where(df.notna(), "")
+    return df.to_dict(orient="records")
+
+@register_invalidator
+def invalidate_file(path):
+    _indexes.discard_where(lambda key: key[0] == path)
+    with _pending_lock:
+        _failed.difference_update([key for key in _failed if key[0] == path])
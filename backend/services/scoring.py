@@ -0,0 +1,213 @@
+import os
+import json
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+# Feature preparation and scoring shared by the predictions blueprint and the
+# batch scoring workers, which load the model without importing Flask
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models")
+MODEL_PATH = os.path.join(MODELS_DIR, "churn_model_xgb.joblib")
+PREPROCESSOR_PATH = os.path.join(MODELS_DIR, "preprocessor.joblib")
+METRICS_FILE = "model_metrics.json"
+# Trained versions live in versions/<name>/ and are never changed once
+# written. current.json names the live one and is replaced in one step when
+# a version is promoted (models/model.py); without it the artifacts at the
+# top of models/ are live.
+VERSIONS_DIR = os.path.join(MODELS_DIR, "versions")
+LIVE_POINTER = os.path.join(MODELS_DIR, "current.json")
+
+FEATURES = ['last boot - active', 'last boot - interval']
+# (end, start) date columns each feature is the difference of, in days
+FEATURE_DATES = [('last_boot_date', 'active_date'), ('last_boot_date', 'interval_date')]
+DATE_COLUMNS = sorted({c for pair in FEATURE_DATES for c in pair})
+# Values pd.to_datetime passes over when it guesses a column's date format
+# from its first value
+SKIPPED_DATE_VALUES = {"", "nat", "nan", "now", "today"}
+# Largest threshold grid compile_scorer turns into a lookup table
+SCORING_TABLE_MAX_CELLS = int(os.environ.get("SCORING_TABLE_MAX_CELLS", 1000000))
+
+def live_version():
+    # Name of the promoted version, or None when the top-level artifacts are live
+    try:
+        with open(LIVE_POINTER) as f:
+            return json.load(f)["version"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+def version_dir(name):
+    # Folder holding a version's artifacts; None names the top-level ones
+    return MODELS_DIR if name is None else os.path.join(VERSIONS_DIR, name)
+
+def artifact_paths(folder):
+    return os.path.join(folder, os.path.basename(MODEL_PATH)), os.path.join(folder, os.path.basename(PREPROCESSOR_PATH))
+
+def live_paths():
+    # Both artifacts of the live version, from one read of the pointer
+    return artifact_paths(version_dir(live_version()))
+
+def load_artifacts(model_path=None, preprocessor_path=None):
+    if model_path is None:
+        model_path, preprocessor_path = live_paths()
+    return joblib.load(model_path), joblib.load(preprocessor_path)
+
+target = 'Churn'
+
+def preprocess_sheet(df):
+    df = df.copy()
+
+    churn_cols = ['Chrn Flag', 'Churn', 'Churn Flag']
+    for col in churn_cols:
+        if col in df.columns:
+            df[target] = df[col]
+            break
+    for col in churn_cols:
+        if col in df.columns and col != target:
+            df.drop(columns=col, inplace=True)
+
+    for date_col in ['active_date', 'last_boot_date', 'interval_date']:
+        if date_col in df.columns:
+            df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+
+    df['last boot - active'] = ((df['last_boot_date'] - df['active_date']).dt.total_seconds() / (3600*24)
+                                if 'last_boot_date' in df.columns and 'active_date' in df.columns else 0)
+    df['last boot - interval'] = ((df['last_boot_date'] - df['interval_date']).dt.total_seconds() / (3600*24)
+                                  if 'interval_date' in df.columns and 'last_boot_date' in df.columns else 0)
+
+    df['last boot - active'] = df['last boot - active'].fillna(0)
+    df['last boot - interval'] = df['last boot - interval'].fillna(0)
+
+    # Ensure the relevant columns are in the dataframe
+    relevant_columns = ['last boot - active', 'last boot - interval']
+    missing_columns = [col for col in relevant_columns if col not in df.columns]
+    if missing_columns:
+        print(f"Warning: Missing columns: {', '.join(missing_columns)}")
+        raise KeyError(f"Required columns missing: {', '.join(missing_columns)}")
+
+    # Keep only the relevant columns (exclude 'Churn' from features for prediction)
+    df = df[relevant_columns]
+
+    if target in df.columns:
+        df[target] = df[target].fillna(0)
+
+    return df
+
+def predict(xgb_model, preprocessor, df):
+    # Transform and predict using core_features
+    X_transformed = preprocessor.transform(df)
+
+    y_proba = xgb_model.predict_proba(X_transformed)[:, 1]
+    y_label = (y_proba >= 0.5).astype(int)
+
+    return y_proba, y_label
+
+def feature_matrix(df):
+    # Same values as preprocess_sheet, as one float64 array built from only
+    # the date columns instead of a copy of the whole sheet
+    dates = {}
+    for date_col in DATE_COLUMNS:
+        if date_col in df.columns:
+            dates[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+
+    X = np.zeros((len(df), len(FEATURES)))
+    for i, (end, start) in enumerate(FEATURE_DATES):
+        if end in dates and start in dates:
+            X[:, i] = ((dates[end] - dates[start]).dt.total_seconds() / (3600*24)).to_numpy()
+    X[np.isnan(X)] = 0
+    return X
+
+def row_fingerprints(df):
+    # 64-bit hash of each row's feature inputs, the raw date values; rows
+    # with the same fingerprint get the same features
+    columns = [c for c in DATE_COLUMNS if c in df.columns]
+    if not columns:
+        return np.zeros(len(df), dtype=np.uint64)
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+def format_prefix(df):
+    # pd.to_datetime guesses a column's date format from its first value, so
+    # every row's features also depend on the rows up to there. Returns how
+    # many leading rows that is (sometimes a few more); scoring a subset of
+    # rows together with these gives the same features as the whole sheet.
+    end = 0
+    for column in [c for c in DATE_COLUMNS if c in df.columns]:
+        values = df[column].to_numpy()
+        for pos in np.flatnonzero(pd.notna(values)):
+            value = values[pos]
+            if not isinstance(value, str) or value.strip().lower() not in SKIPPED_DATE_VALUES:
+                end = max(end, pos + 1)
+                break
+    return end
+
+def split_thresholds(booster):
+    # Sorted float32 split values of every feature over all trees, or None
+    # when the trees aren't plain numeric gbtree splits
+    model = json.loads(booster.save_raw("json"))["learner"]["gradient_booster"]
+    if model.get("name") != "gbtree":
+        return None
+    values = [[] for _ in range(booster.num_features())]
+    for tree in model["model"]["trees"]:
+        if any(tree.get("split_type", [])):
+            return None
+        for left, feature, value in zip(tree["left_children"], tree["split_indices"], tree["split_conditions"]):
+            if left != -1:
+                values[feature].append(value)
+    return [np.unique(np.array(v, dtype=np.float32)) for v in values]
+
+def score_table(booster, thresholds, iteration_range):
+    # Trees send x left when x < threshold, so every point between two
+    # neighbouring thresholds of each feature lands in the same leaves.
+    # Predict one point per cell of that grid; the cell's lower threshold
+    # (or just below the lowest one) stands in for the whole cell.
+    axes = [np.concatenate([[np.nextafter(t[0], np.float32(-np.inf))], t]) if len(t) else np.zeros(1, dtype=np.float32)
+            for t in thresholds]
+    grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(axes))
+    return booster.inplace_predict(np.ascontiguousarray(grid, dtype=np.float32), iteration_range=iteration_range)
+
+def compile_scorer(xgb_model, preprocessor, max_table_cells=SCORING_TABLE_MAX_CELLS):
+    # Returns score(df) -> (proba, label), equal to
+    # predict(xgb_model, preprocessor, preprocess_sheet(df)) but with the
+    # scaler applied in place on the raw array and no DataFrame copies.
+    # When the trees split each feature at few enough values the model is
+    # compiled into a table of probabilities per threshold cell and scoring
+    # is a binary search per feature; otherwise it is one in-place
+    # prediction on the booster. Other model or preprocessor types keep
+    # the reference path.
+    booster = xgb_model.get_booster()
+    objective = json.loads(booster.save_config())["learner"]["objective"]["name"]
+    if type(preprocessor) is not StandardScaler or objective != "binary:logistic":
+        return lambda df: predict(xgb_model, preprocessor, preprocess_sheet(df))
+
+    mean = preprocessor.mean_ if preprocessor.with_mean else None
+    scale = preprocessor.scale_ if preprocessor.with_std else None
+    # The rounds predict_proba would use
+    try:
+        iteration_range = (0, xgb_model.best_iteration + 1)
+    except AttributeError:
+        iteration_range = (0, 0)
+
+    thresholds = split_thresholds(booster)
+    table = None
+    if thresholds is not None:
+        dims = [len(t) + 1 for t in thresholds]
+        if np.prod(dims) <= max_table_cells:
+            table = score_table(booster, thresholds, iteration_range)
+
+    def score(df):
+        X = feature_matrix(df)
+        if mean is not None:
+            X -= mean
+        if scale is not None:
+            X /= scale
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        # feature_matrix never returns NaN, so no row takes a missing-value branch
+        if table is not None:
+            cells = [np.searchsorted(t, X[:, i], side="right") for i, t in enumerate(thresholds)]
+            y_proba = table[np.ravel_multi_index(cells, dims)]
+        else:
+            y_proba = booster.inplace_predict(X, iteration_range=iteration_range)
+        y_label = (y_proba >= 0.5).astype(int)
+        return y_proba, y_label
+
+    return score
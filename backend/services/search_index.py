@@ -0,0 +1,108 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from services.lru import LRUCache
+from services.metrics import stage
+from services.sheet_cache import file_version, register_invalidator
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # falls back to pandas string methods
+    pa = None
+    pc = None
+
+# Per-sheet row search. Each row is rendered once into a lowercase text line
+# (cells joined by a separator that can't be typed into the search box) and
+# searched with one vectorized substring scan instead of a per-row apply.
+SEARCH_INDEX_MAX_BYTES = int(os.environ.get("SEARCH_INDEX_MAX_MB", 512)) * 1024 * 1024
+CELL_SEPARATOR = "\x1f"
+RECENT_RESULTS = 32
+
+def cell_text(df):
+    # Cells as the sheet and prediction previews show them: blank for missing
+    # values, str() of every other value. The index is built with it too, so
+    # search finds what the preview shows (astype(str) drops the time of
+    # day from date columns that are all midnight, str() doesn't).
+    df = df.fillna("")
+    return df.apply(lambda col: col.astype(str) if col.dtype.kind in "biuf" else col.map(str))
+
+class SearchIndex:
+    def __init__(self, df):
+        cells = cell_text(df)
+        if len(cells.columns) == 0:
+            text = pd.Series("", index=cells.index)
+        else:
+            first, *rest = [cells[c] for c in cells.columns]
+            text = first.str.cat(rest, sep=CELL_SEPARATOR) if rest else first
+        text = text.str.lower()
+
+        if pa is not None:
+            self.text = pa.array(text.to_numpy(dtype=object), type=pa.large_string())
+            self.nbytes = self.text.nbytes
+        else:
+            self.text = text.reset_index(drop=True)
+            self.nbytes = int(self.text.memory_usage(deep=True))
+
+        self.num_rows = len(df)
+        # Results of recent terms; typing "abc" after "ab" only rescans the
+        # rows that matched "ab"
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _scan(self, term, rows):
+        text = self.text if rows is None else self.text.take(rows)
+        if pc is not None:
+            mask = pc.match_substring(text, term).to_numpy(zero_copy_only=False)
+        else:
+            mask = text.str.contains(term, regex=False).to_numpy()
+        hits = np.flatnonzero(mask)
+        return hits if rows is None else rows[hits]
+
+    def search(self, term):
+        # Positions (not index labels) of the rows containing term, in row order
+        term = term.lower()
+        if not term:
+            return np.arange(self.num_rows)
+
+        with self._lock:
+            rows = self._recent.get(term)
+            if rows is not None:
+                self._recent.move_to_end(term)
+                return rows
+            narrowed = [r for t, r in self._recent.items() if t in term]
+
+        candidates = min(narrowed, key=len) if narrowed else None
+        rows = self._scan(term, candidates)
+
+        with self._lock:
+            self._recent[term] = rows
+            while len(self._recent) > RECENT_RESULTS:
+                self._recent.popitem(last=False)
+        return rows
+
+_indexes = LRUCache(SEARCH_INDEX_MAX_BYTES, lambda index: index.nbytes)
+
+def search_rows(filepath, sheet, term, frame_loader, variant="sheet"):
+    # frame_loader(path) loads the frame to index from the content path the
+    # key was made for; variant separates indexes built from different
+    # frames of the same sheet
+    key = (*file_version(filepath), sheet, variant)
+    with stage("search"):
+        index = _indexes.get_or_load(key, lambda: SearchIndex(frame_loader(key[0])))
+        return index.search(term)
+
+def paginate(rows, page, page_size):
+    # rows: matched row positions, or the row count when nothing is filtered.
+    # Returns the positions on the page and the total.
+    start = (page - 1) * page_size
+    end = start + page_size
+    if isinstance(rows, int):
+        return slice(start, end), rows
+    return rows[start:end], len(rows)
+
+@register_invalidator
+def invalidate_file(path):
+    _indexes.discard_where(lambda key: key[0] == path)
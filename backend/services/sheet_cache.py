@@ -0,0 +1,122 @@
+import os
+import pandas as pd
+from services import columnar
+from services.derived import content_path
+from services.lru import LRUCache
+from services.metrics import stage
+
+# Process-wide cache of parsed sheets shared by every blueprint, so a sheet
+# is parsed once per file version instead of once per request.
+SHEET_CACHE_MAX_BYTES = int(os.environ.get("SHEET_CACHE_MAX_MB", 1024)) * 1024 * 1024
+
+def frame_nbytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+_sheets = LRUCache(SHEET_CACHE_MAX_BYTES, frame_nbytes)
+_sheet_names = LRUCache(4096, len)
+_manifests = LRUCache(1024, lambda manifest: 1)
+
+# Other caches derived from uploaded files register here to be dropped
+# together with the file's sheets
+_invalidators = []
+
+def file_version(filepath):
+    # Identifies one version of an uploaded file; any rewrite changes it.
+    # Upload names stand for content, so names for the same content share
+    # entries, and loads read the key's path rather than the name.
+    path = content_path(filepath)
+    st = os.stat(path)
+    return (path, st.st_mtime_ns, st.st_size)
+
+def _manifest(filepath):
+    # An empty dict means "no usable columnar copy" and is cached as well
+    key = file_version(filepath)
+    return _manifests.get_or_load(key, lambda: columnar.load_manifest(key[0]) or {})
+
+def is_converted(filepath):
+    # True once the file's sheets are read from its Parquet copy
+    return bool(_manifest(filepath))
+
+def refresh_manifest(filepath):
+    # Missing manifests are cached too; drop that once one has been written
+    _manifests.pop(file_version(filepath))
+
+def _columnar_path(filepath, sheet):
+    manifest = _manifest(filepath)
+    if not manifest:
+        return None
+    return columnar.sheet_path(filepath, manifest, sheet)
+
+def _parse(filepath, sheet):
+    path = _columnar_path(filepath, sheet)
+    if path is not None:
+        with stage("read_parquet"):
+            return columnar.read_columns(path)
+    with stage("read_excel"):
+        return pd.read_excel(filepath, sheet_name=sheet)
+
+def _frame(filepath, sheet):
+    # The cached frame itself; never handed out without copying
+    key = (*file_version(filepath), sheet)
+    return _sheets.get_or_load(key, lambda: _parse(key[0], sheet))
+
+def read_sheet(filepath, sheet, columns=None):
+    key = (*file_version(filepath), sheet)
+
+    # Column-pruned reads go straight to the Parquet copy unless the whole
+    # sheet is already in memory
+    if columns is not None:
+        df = _sheets.get(key)
+        if df is not None:
+            return df[columns].copy()
+        path = _columnar_path(key[0], sheet)
+        if path is not None:
+            with stage("read_parquet"):
+                return columnar.read_columns(path, columns)
+
+    df = _frame(key[0], sheet)
+    # Callers are free to mutate what they get back
+    if columns is not None:
+        return df[columns].copy()
+    return df.copy()
+
+def read_rows(filepath, sheet, rows):
+    # Copy of only the given row positions (a slice or an array of positions)
+    return _frame(filepath, sheet).iloc[rows].copy()
+
+def sheet_length(filepath, sheet):
+    return len(_frame(filepath, sheet))
+
+def sheet_dtypes(filepath, sheet):
+    path = _columnar_path(filepath, sheet)
+    if path is not None:
+        return columnar.schema_dtypes(path)
+    return _frame(filepath, sheet).dtypes
+
+def sheet_columns(filepath, sheet):
+    return sheet_dtypes(filepath, sheet).index.tolist()
+
+def sheet_names(filepath):
+    manifest = _manifest(filepath)
+    if manifest:
+        return list(manifest["sheets"])
+
+    key = file_version(filepath)
+
+    def load():
+        with pd.ExcelFile(key[0]) as xl:
+            return list(xl.sheet_names)
+
+    return list(_sheet_names.get_or_load(key, load))
+
+def register_invalidator(fn):
+    _invalidators.append(fn)
+    return fn
+
+def invalidate_file(path):
+    # path is what content_path returned for the file, the first item of its keys
+    _sheets.discard_where(lambda key: key[0] == path)
+    _sheet_names.discard_where(lambda key: key[0] == path)
+    _manifests.discard_where(lambda key: key[0] == path)
+    for fn in _invalidators:
+        fn(path)
@@ -0,0 +1,166 @@
+import os
+import shutil
+import hashlib
+import tempfile
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+from services.derived import ALIAS_FOLDER, BLOB_FOLDER, DERIVED_KINDS, content_path, derived_dir, remove_derived
+from services.sheet_cache import invalidate_file
+
+# Uploaded files are stored once per content, as <upload folder>/.blobs/<sha256><ext>.
+# The name a file was uploaded under is an alias: a symlink in the upload
+# folder pointing at its blob (a hard link where symlinks aren't allowed), so
+# routes keep opening uploads/<name>, and a record in <upload folder>/.aliases
+# naming the blob. Caches and derived data are keyed by the blob the record
+# names, so uploading the same workbook again, under any name, reuses
+# everything already computed for it.
+UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads")
+UPLOAD_MAX_MB = int(os.environ.get("UPLOAD_MAX_MB", 512))
+CHUNK_BYTES = 1024 * 1024
+
+class IncomingFile:
+    # Where an uploaded file part is written as it arrives: a temporary file
+    # in the blob folder, hashed and size-checked on every write. Removed on
+    # close unless it was kept as a blob.
+    def __init__(self, folder, max_bytes=UPLOAD_MAX_MB * 1024 * 1024):
+        os.makedirs(folder, exist_ok=True)
+        fd, self.name = tempfile.mkstemp(dir=folder, prefix=".incoming-")
+        self._file = os.fdopen(fd, "w+b")
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self.max_bytes = max_bytes
+        self.kept = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise RequestEntityTooLarge(f"Files are limited to {self.max_bytes // (1024 * 1024)} MB")
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def close(self):
+        self._file.close()
+        if not self.kept and os.path.exists(self.name):
+            os.remove(self.name)
+
+    def __del__(self):
+        if "_file" in self.__dict__:
+            self.close()
+
+class UploadRequest(Request):
+    # Multipart file parts go straight to the blob folder instead of a
+    # spooled temporary file that would be copied again
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return IncomingFile(os.path.join(UPLOAD_FOLDER, BLOB_FOLDER))
+
+def blob_path(upload_folder, digest, filename):
+    return os.path.join(upload_folder, BLOB_FOLDER, digest + os.path.splitext(filename)[1].lower())
+
+def is_blob(path):
+    return os.path.basename(os.path.dirname(path)) == BLOB_FOLDER
+
+def _record(upload_folder, name, blob):
+    folder = os.path.join(upload_folder, ALIAS_FOLDER)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".")
+    with os.fdopen(fd, "w") as f:
+        f.write(os.path.basename(blob))
+    os.replace(tmp_path, os.path.join(folder, name))
+
+def _remove_record(upload_folder, name):
+    path = os.path.join(upload_folder, ALIAS_FOLDER, name)
+    if os.path.exists(path):
+        os.remove(path)
+
+def _link(alias, blob):
+    # Points the alias at the blob in one step (readers never see it missing)
+    tmp_path = os.path.join(os.path.dirname(alias), f".{os.path.basename(alias)}.link")
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.symlink(os.path.relpath(blob, os.path.dirname(alias)), tmp_path)
+    except OSError:
+        os.link(blob, tmp_path)
+    os.replace(tmp_path, alias)
+
+def aliases(upload_folder, blob):
+    names = []
+    for name in os.listdir(upload_folder):
+        path = os.path.join(upload_folder, name)
+        if not name.startswith(".") and os.path.exists(path) and content_path(path) == blob:
+            names.append(name)
+    return names
+
+def _drop_blob(upload_folder, blob):
+    # A blob no alias points at any more, with its derived data. The blob
+    # goes first; background builds check it before saving what they built.
+    if aliases(upload_folder, blob):
+        return
+    if os.path.exists(blob):
+        os.remove(blob)
+    remove_derived(blob)
+    invalidate_file(blob)
+
+def store_upload(upload_folder, filename, stream):
+    # Stores one uploaded file and points its name at it. stream is the
+    # IncomingFile werkzeug wrote the part to, or any readable file.
+    name = os.path.basename(filename or "")
+    if not name or name.startswith("."):
+        raise ValueError(f"Invalid file name '{filename}'")
+
+    incoming = stream
+    if not isinstance(stream, IncomingFile):
+        incoming = IncomingFile(os.path.join(upload_folder, BLOB_FOLDER))
+        for chunk in iter(lambda: stream.read(CHUNK_BYTES), b""):
+            incoming.write(chunk)
+    incoming.flush()
+    digest = incoming.hexdigest()
+    blob = blob_path(upload_folder, digest, name)
+    duplicate = os.path.exists(blob)
+    if not duplicate:
+        os.chmod(incoming.name, 0o644)
+        os.replace(incoming.name, blob)
+        incoming.kept = True
+    if incoming is not stream:
+        incoming.close()
+
+    alias = os.path.join(upload_folder, name)
+    previous = content_path(alias) if os.path.exists(alias) else None
+    if previous != blob:
+        # Computed before relinking, while they still resolve to the old file
+        old_dirs = {kind: derived_dir(alias, kind) for kind in DERIVED_KINDS} if previous else {}
+        _record(upload_folder, name, blob)
+        _link(alias, blob)
+        if previous:
+            # Scores saved by row fingerprint stay useful for the new content
+            # of the same name (see prediction_cache)
+            new_scores = derived_dir(blob, "predictions")
+            if os.path.isdir(old_dirs["predictions"]) and not os.path.exists(new_scores):
+                shutil.copytree(old_dirs["predictions"], new_scores)
+            if is_blob(previous):
+                _drop_blob(upload_folder, previous)
+            else:
+                # A file stored before uploads were content-addressed
+                for old_dir in old_dirs.values():
+                    shutil.rmtree(old_dir, ignore_errors=True)
+                invalidate_file(previous)
+
+    return {"name": name, "sha256": digest, "size": incoming.size, "duplicate": duplicate}
+
+def remove_upload(upload_folder, name):
+    alias = os.path.join(upload_folder, name)
+    target = content_path(alias)
+    if not is_blob(target):
+        remove_derived(alias)
+        os.remove(alias)
+        invalidate_file(target)
+        return
+    os.remove(alias)
+    _remove_record(upload_folder, name)
+    _drop_blob(upload_folder, target)
@@ -0,0 +1,95 @@
+import os
+import traceback
+from services import columnar, row_retrieval
+from services.batch_scoring import expand_jobs, run_batch
+from services.derived import content_path
+from services.jobs import JobCancelled, JobLost, job_kind, run, submit
+from services.lru import LRUCache
+from services.model_registry import get_model, version_paths
+from services.prediction_cache import get_scores, has_scores
+from services.profiler import schedule_workbook
+from services.sheet_cache import file_version, is_converted, refresh_manifest, sheet_length, sheet_names
+from services.upload_store import UPLOAD_FOLDER
+
+# The job kinds behind uploads and the heavy routes. Params name files by
+# their upload name, so queued jobs still make sense after a restart; a
+# running job resolves the name to its content once and works on that, even
+# if the name is uploaded again meanwhile.
+#   parse: Parquet copy of every sheet, then profiles, chat indexes and a
+#          score job per sheet for the live model
+#   score: scores of one sheet for one model version
+#   batch: a /batch_predict run
+
+# File versions parsed by this process, including ones that couldn't be
+# converted and were read from Excel instead
+_parsed = LRUCache(4096, lambda value: 1)
+
+def upload_path(file):
+    return os.path.join(UPLOAD_FOLDER, file)
+
+def is_parsed(params):
+    filepath = upload_path(params["file"])
+    if not os.path.exists(filepath):
+        return True  # nothing to parse; the route reports the missing file
+    if _parsed.get(file_version(filepath)) is not None:
+        return True
+    return columnar.available() and is_converted(filepath)
+
+@job_kind("parse", ready=is_parsed)
+def parse_workbook(params, progress):
+    filepath = content_path(upload_path(params["file"]))
+    progress(0, "Converting sheets")
+    try:
+        columnar.convert_workbook(filepath, lambda fraction, message: progress(0.8 * fraction, message))
+    except (JobCancelled, JobLost):
+        raise
+    except Exception:
+        traceback.print_exc()
+    refresh_manifest(filepath)
+
+    sheets = sheet_names(filepath)
+    if not is_converted(filepath):
+        # No Parquet copy: read every sheet into the sheet cache instead
+        for i, sheet in enumerate(sheets):
+            progress(0.8 + 0.1 * i / len(sheets), f"Reading {sheet}")
+            sheet_length(filepath, sheet)
+    _parsed.put(file_version(filepath), True)
+
+    # Dashboard profiles and chat row indexes are built in the background
+    progress(0.9, "Queueing profiles and scores")
+    schedule_workbook(filepath)
+    row_retrieval.schedule_workbook(filepath)
+    model_version = get_model()["version"]
+    score_jobs = [submit("score", file=params["file"], sheet=sheet, model_version=model_version) for sheet in sheets]
+    return {"sheets": sheets, "score_jobs": [job["job_id"] for job in score_jobs if job]}
+
+def is_scored(params):
+    filepath = upload_path(params["file"])
+    return not os.path.exists(filepath) or has_scores(filepath, params["sheet"], params["model_version"])
+
+# One vectorized pass over the sheet that can't stop partway
+@job_kind("score", ready=is_scored, cancellable=False)
+def score_sheet(params, progress):
+    filepath = content_path(upload_path(params["file"]))
+    model = get_model(params["model_version"])
+    progress(0, "Reading the sheet")
+    sheet_length(filepath, params["sheet"])
+    progress(0.3, "Scoring")
+    scores = get_scores(filepath, params["sheet"], model["version"], model["scorer"])
+    return {"rows": int(len(scores["label"])), "churn_count": int(scores["label"].sum())}
+
+@job_kind("batch")
+def batch_predict(params, progress):
+    files = [(upload_path(item["file"]), item.get("sheets")) for item in params["items"]]
+    return run_batch(expand_jobs(files), params["output_dir"], params.get("workers"), params["format"],
+                     *version_paths(params.get("model_version")), progress=progress)
+
+# For routes: the unfinished job to answer 202 with, or None once the work
+# is done
+def parse_pending(file):
+    # While the workbook is still being parsed
+    return run("parse", file=file)
+
+def scores_pending(file, sheet, model):
+    # Same, until the sheet has been scored by this model version too
+    return run("parse", file=file) or run("score", file=file, sheet=sheet, model_version=model["version"])
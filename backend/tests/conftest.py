@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.abspath(BACKEND_DIR))
+
+def pytest_sessionstart(session):
+    # Services keep uploads and the jobs table under the working directory
+    # they are imported from, so the tests import them from a scratch one
+    os.chdir(tempfile.mkdtemp(prefix="nuu_tests_"))
+
+@pytest.fixture(scope="session")
+def workbook_path(tmp_path_factory):
+    # Small synthetic workbook with mixed date columns, three sheets
+    from benchmarks.synthetic_workbook import write_workbook
+    path = str(tmp_path_factory.mktemp("workbooks") / "synthetic.xlsx")
+    write_workbook(path, 900, sheets=3, seed=1)
+    return path
+
+@pytest.fixture
+def upload_copy(workbook_path, tmp_path):
+    # A private copy, for tests that rewrite or delete the file
+    import shutil
+    path = str(tmp_path / "workbook.xlsx")
+    shutil.copy(workbook_path, path)
+    return path
+
+@pytest.fixture(scope="session")
+def client():
+    from app import app
+    return app.test_client()
+
+@pytest.fixture(scope="session")
+def uploaded(client, workbook_path):
+    # The synthetic workbook uploaded through the app, parsed and scored
+    from services import jobs
+    with open(workbook_path, "rb") as f:
+        response = client.post("/upload", data={"files": (f, "synthetic.xlsx")})
+    assert response.status_code == 200
+    for job in response.get_json()["jobs"]:
+        assert jobs.wait(job["job_id"], 120)["status"] == "done"
+    return "synthetic.xlsx"
+
+@pytest.fixture
+def models_dir(tmp_path, monkeypatch):
+    # A private models folder holding the shipped artifacts, for tests that
+    # train, promote or swap versions
+    import shutil
+    from services import model_registry, scoring
+    folder = tmp_path / "models"
+    folder.mkdir()
+    for path in [scoring.MODEL_PATH, scoring.PREPROCESSOR_PATH]:
+        shutil.copy(path, folder)
+    monkeypatch.setattr(scoring, "MODELS_DIR", str(folder))
+    monkeypatch.setattr(scoring, "VERSIONS_DIR", str(folder / "versions"))
+    monkeypatch.setattr(scoring, "LIVE_POINTER", str(folder / "current.json"))
+    monkeypatch.setattr(model_registry, "VERSIONS_DIR", str(folder / "versions"))
+    return folder
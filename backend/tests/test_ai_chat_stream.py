@@ -0,0 +1,68 @@
+import json
+import pytest
+from benchmarks import fake_ollama
+from services import ollama_client
+
+QUESTION = {"question": "Why would a device churn?"}
+
+@pytest.fixture
+def ollama(monkeypatch):
+    server = fake_ollama.start(first_token_delay=0.05, token_delay=0.01)
+    monkeypatch.setattr(ollama_client, "OLLAMA_URL", server.url)
+    monkeypatch.setattr(ollama_client, "OLLAMA_QUEUE_TIMEOUT", 0.5)
+    yield server
+    server.shutdown()
+    assert ollama_client._slots._value == ollama_client.OLLAMA_MAX_CONCURRENCY
+
+def events(chunks):
+    # (event, data) pairs of a server-sent event stream
+    text = "".join(chunk.decode() for chunk in chunks)
+    for block in text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        yield event[len("event: "):], json.loads(data[len("data: "):])
+
+def read_until_token(response):
+    # Reads the stream up to its first token, which holds a slot
+    chunks = iter(response.response)
+    received = []
+    for chunk in chunks:
+        received.append(chunk)
+        if chunk.startswith(b"event: token"):
+            return chunks
+    raise AssertionError("no token before the stream ended")
+
+def test_answer_streams_token_by_token(client, uploaded, ollama):
+    client.post(f"/reset_chat/{uploaded}/A25")
+    response = client.post(f"/ask_ai_about_sheet_stream/{uploaded}/A25", json=QUESTION)
+    assert response.mimetype == "text/event-stream"
+    received = list(events([response.get_data()]))
+
+    assert received[0][0] == "result"
+    tokens = [data["content"] for event, data in received if event == "token"]
+    assert len(tokens) == len(fake_ollama.ANSWER.split())
+    event, done = received[-1]
+    assert event == "done"
+    assert done["answer"] == "".join(tokens)
+    assert done["answer"].split() == fake_ollama.ANSWER.split()
+    assert done["history"][-2:] == [{"role": "user", "content": QUESTION["question"]},
+                                    {"role": "assistant", "content": done["answer"]}]
+
+def test_full_slot_pool_refuses_and_disconnects_free_slots(client, uploaded, ollama):
+    url = f"/ask_ai_about_sheet_stream/{uploaded}/B30 Pro"
+    # Every slot held by a stream the client has stopped reading
+    held = [client.post(url, json=QUESTION, buffered=False) for _ in range(ollama_client.OLLAMA_MAX_CONCURRENCY)]
+    for response in held:
+        read_until_token(response)
+    assert ollama_client._slots._value == 0
+
+    response = client.post(url, json=QUESTION)
+    received = list(events([response.get_data()]))
+    assert [event for event, _ in received] == ["result", "done"]
+    assert "busy" in received[-1][1]["answer"]
+
+    # Clients that hang up mid-answer give their slot back
+    for response in held:
+        response.close()
+    assert ollama_client._slots._value == ollama_client.OLLAMA_MAX_CONCURRENCY
+    response = client.post(url, json=QUESTION)
+    assert [event for event, _ in events([response.get_data()])].count("token") > 1
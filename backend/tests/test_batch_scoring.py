@@ -0,0 +1,43 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from services import jobs
+from services.batch_scoring import SUMMARY_NAME, expand_jobs, main, run_batch
+from services.prediction_cache import PROBA_COLUMN
+from services.scoring import compile_scorer, load_artifacts
+from services.sheet_cache import read_sheet, sheet_names
+
+def test_batch_matches_scoring_each_sheet(workbook_path, tmp_path):
+    scorer = compile_scorer(*load_artifacts())
+    batch = expand_jobs([(workbook_path, None)]) + [(workbook_path, "No such sheet")]
+    summary = run_batch(batch, str(tmp_path), workers=2)
+
+    assert [s["sheet"] for s in summary["sheets"]] == sheet_names(workbook_path) + ["No such sheet"]
+    assert "error" in summary["sheets"][-1]
+    for sheet in summary["sheets"][:-1]:
+        output = pd.read_csv(tmp_path / sheet["output"])
+        proba, label = scorer(read_sheet(workbook_path, sheet["sheet"]))
+        np.testing.assert_allclose(output[PROBA_COLUMN], proba)
+        assert sheet["rows"] == len(output)
+        assert sheet["churn_count"] == int(label.sum())
+    with open(tmp_path / SUMMARY_NAME) as f:
+        assert json.load(f)["sheets"] == summary["sheets"]
+
+def test_cli(workbook_path, tmp_path, capsys):
+    main([workbook_path, "--sheets", "A25", "--output-dir", str(tmp_path), "--workers", "1", "--format", "parquet"])
+    assert "A25" in capsys.readouterr().out
+    assert len(pd.read_parquet(tmp_path / "synthetic__A25.parquet")) == len(read_sheet(workbook_path, "A25"))
+
+def test_batch_route(client, uploaded):
+    response = client.post("/batch_predict", json={"items": [{"file": uploaded, "sheets": ["A25", "B30 Pro"]}]})
+    body = response.get_json()
+    if response.status_code == 202:
+        body = jobs.wait(body["job_id"], 120)["result"]
+    else:
+        assert response.status_code == 200
+    assert [s["sheet"] for s in body["sheets"]] == ["A25", "B30 Pro"]
+    assert all(os.path.exists(os.path.join(body["output_dir"], s["output"])) for s in body["sheets"])
+
+    response = client.post("/batch_predict", json={"items": [{"file": "missing.xlsx"}]})
+    assert response.status_code == 404
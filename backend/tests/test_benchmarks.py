@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+from flask import request, request_started
+from benchmarks import fake_ollama, routes
+from benchmarks.synthetic_workbook import CHURN_COLUMNS, MAX_SHEET_ROWS, SHEET_NAMES, generate_frame, sheet_rows, write_workbook
+from services import ollama_client
+
+# Blueprints benchmarks/routes.py times; it uploads and deletes outside route_calls
+BENCHMARKED = {"upload", "dashboard", "predictions", "chat"}
+MEASURED_APART = {"upload.upload_files", "dashboard.delete_file"}
+
+def test_synthetic_workbook_has_the_layout_it_reports(tmp_path):
+    path = str(tmp_path / "synthetic.xlsx")
+    layout = write_workbook(path, 1000, sheets=3, seed=2)
+    assert list(layout) == SHEET_NAMES[:3]
+    assert [churn for _, churn in layout.values()] == CHURN_COLUMNS
+
+    sheets = pd.read_excel(path, sheet_name=None)
+    assert list(sheets) == list(layout)
+    for name, (rows, churn) in layout.items():
+        assert len(sheets[name]) == rows
+        assert list(sheets[name].columns) == list(generate_frame(1, churn).columns)
+        assert set(sheets[name][churn].unique()) <= {0, 1}
+    assert sum(rows for rows, _ in layout.values()) == 1000
+
+def test_sheet_rows_split_evenly_within_the_xlsx_limit():
+    assert sheet_rows(10, 3) == [4, 3, 3]
+    split = sheet_rows(3 * MAX_SHEET_ROWS + 1, 3)
+    assert len(split) == 4
+    assert sum(split) == 3 * MAX_SHEET_ROWS + 1
+    assert max(split) <= MAX_SHEET_ROWS
+
+def test_route_benchmark_calls_every_route(client, uploaded, monkeypatch):
+    from app import app
+    server = fake_ollama.start(first_token_delay=0.01, token_delay=0.001)
+    monkeypatch.setattr(ollama_client, "OLLAMA_URL", server.url)
+    reached = set()
+    record = lambda sender, **extra: reached.add(request.endpoint)
+    request_started.connect(record, app)
+    try:
+        for blueprint, name, call in routes.route_calls(uploaded, "A25"):
+            response = call(client)
+            response.get_data()
+            assert response.status_code < 400, name
+    finally:
+        request_started.disconnect(record, app)
+        server.shutdown()
+
+    endpoints = {rule.endpoint for rule in app.url_map.iter_rules() if rule.endpoint.split(".")[0] in BENCHMARKED}
+    assert reached | MEASURED_APART == endpoints
@@ -0,0 +1,46 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from services import charts
+from services.profiler import box_stats, churn_breakdown
+from services.sheet_cache import read_sheet
+
+go = pytest.importorskip("plotly.graph_objects")
+
+def plotly_trace(trace):
+    # The trace as plotly builds and serializes it
+    return json.loads(go.Figure(data=[trace]).to_json())["data"][0]
+
+def test_heatmap_and_bar_match_plotly():
+    z = [[1.0, -0.25], [-0.25, 1.0]]
+    payload = charts.heatmap(z, ["a", "b"], ["a", "b"], colorscale=charts.RDBU, zmin=-1, zmax=1,
+                             colorbar=charts.titled("Correlation"))
+    expected = plotly_trace(go.Heatmap(z=z, x=["a", "b"], y=["a", "b"], colorscale="RdBu", zmin=-1, zmax=1,
+                                       colorbar=dict(title="Correlation")))
+    assert json.loads(json.dumps(payload)) == expected
+
+    payload = charts.bar(["x", "y"], [3, 4], "Churn=1")
+    assert payload == plotly_trace(go.Bar(x=["x", "y"], y=[3, 4], name="Churn=1"))
+
+def test_box_keeps_the_points_beyond_its_fences():
+    values = pd.Series([1.0, 2, 2, 3, 3, 3, 4, 4, 5, 40, -30, np.nan])
+    stats = box_stats(values)
+    assert (stats["q1"], stats["median"], stats["q3"]) == (2.0, 3.0, 4.0)
+    assert (stats["lowerfence"], stats["upperfence"]) == (1.0, 5.0)
+    assert sorted(stats["outliers"]) == [-30.0, 40.0]
+
+    payload = charts.box("count (Churn=0)", stats, boxmean="sd")
+    assert payload["y"] == [stats["outliers"]]
+    assert payload["boxpoints"] == "outliers"
+    # A valid plotly box trace
+    assert plotly_trace(go.Box(**{k: v for k, v in payload.items() if k != "type"}))["y"] == [[40.0, -30.0]]
+
+def test_distribution_route_draws_outliers(client, uploaded, workbook_path):
+    response = client.get(f"/get_distribution_vs_churn/{uploaded}/S6603L/register_email")
+    traces = response.get_json()["plotly_json"]["data"]
+    df = read_sheet(workbook_path, "S6603L")
+    breakdown = churn_breakdown(df, "register_email", "Chrn Flag")
+    assert any(group["outliers"] for group in breakdown["groups"])
+    assert [trace["y"] for trace in traces] == [[group["outliers"]] for group in breakdown["groups"]]
+    assert all(trace["boxpoints"] == "outliers" for trace in traces)
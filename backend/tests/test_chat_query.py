@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+from services.chat_query import answer_question, parse_question
+from services.normalize import row_labels
+from services.sheet_cache import sheet_columns
+
+SHEET = "B30 Pro"
+
+@pytest.fixture(scope="module")
+def sheet(workbook_path):
+    return pd.read_excel(workbook_path, sheet_name=SHEET)
+
+@pytest.mark.parametrize("question", [
+    "Which carrier has the highest churn rate?",
+    "How many devices are in the US?",
+    "What does active_date mean?",
+    "Show the sum of rows per country",
+    "How many devices churned per country?",
+    "How many devices have network type equal to wifi and churned?",
+    "How many devices don't have network type equal to wifi?",
+    "What is the average reboot count for wifi devices?",
+    "Which device has the highest reboot count?"
+])
+def test_questions_it_cant_fully_read_go_to_the_llm(workbook_path, question):
+    columns = sheet_columns(workbook_path, SHEET) + ["country"]
+    assert parse_question(question, columns) is None
+    assert answer_question(workbook_path, SHEET, question) is None
+
+@pytest.mark.parametrize("question", ["How many devices did not churn?", "How many users haven't churned?"])
+def test_negated_churn_counts_the_others(workbook_path, sheet, question):
+    result = answer_question(workbook_path, SHEET, question)
+    assert result["query"]["negated"]
+    stayed = int((sheet["Churn"] != 1).sum())
+    assert result["answer"].startswith(f"{stayed:,} of {len(sheet):,} rows are not marked as churned")
+
+def test_answers_match_pandas(workbook_path, sheet):
+    churned = int((sheet["Churn"] == 1).sum())
+    cases = {
+        "How many rows are there in the sheet?": {"rows": len(sheet)},
+        "How many devices churned?": {"churned": churned, "rows": len(sheet), "churn_rate": churned / len(sheet)},
+        "What is the average reboot count?": {"column": "reboot_count", "mean": sheet["reboot_count"].mean(),
+                                              "rows": len(sheet)},
+        "How many distinct network type values?": {"column": "network_type", "distinct": sheet["network_type"].nunique()},
+        "How many devices have network type equal to mobile?": {"column": "network_type", "value": "mobile",
+                                                                "rows": int((sheet["network_type"] == "mobile").sum())},
+    }
+    for question, data in cases.items():
+        assert answer_question(workbook_path, SHEET, question)["data"] == pytest.approx(data), question
+
+def test_group_by_reads_both_columns(workbook_path, sheet):
+    result = answer_question(workbook_path, SHEET, "Average reboot count per network type")
+    # Grouped by the same labels the charts show
+    expected = sheet["reboot_count"].groupby(row_labels(sheet["network_type"])).mean().sort_values(ascending=False)
+    assert [item["group"] for item in result["data"]["groups"]] == list(expected.index)
+    assert [item["value"] for item in result["data"]["groups"]] == pytest.approx(list(expected))
+
+    result = answer_question(workbook_path, SHEET, "How many devices per network type?")
+    assert result["query"]["agg"] == "count"
+    assert sum(item["value"] for item in result["data"]["groups"]) == len(sheet)
@@ -0,0 +1,49 @@
+import json
+import pytest
+from services import chat_store
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(chat_store, "CHAT_STORE", str(tmp_path))
+    monkeypatch.setattr(chat_store, "CHAT_MEMORY_MAX_MESSAGES", 4)
+    chat_store._recent.clear()
+    return tmp_path
+
+def test_each_message_is_one_appended_line(store):
+    for i in range(6):
+        chat_store.append_message("a.xlsx::S1", "user" if i % 2 == 0 else "assistant", f"message {i}")
+    with open(chat_store.chat_path("a.xlsx::S1")) as f:
+        lines = [json.loads(line) for line in f]
+    assert [m["content"] for m in lines] == [f"message {i}" for i in range(6)]
+
+    # Memory keeps the newest; the log keeps everything
+    assert [m["content"] for m in chat_store.recent_messages("a.xlsx::S1")] == [f"message {i}" for i in range(2, 6)]
+    assert chat_store.full_history("a.xlsx::S1") == lines
+
+    # and is read back once the conversation was evicted from memory
+    chat_store._recent.clear()
+    assert [m["content"] for m in chat_store.recent_messages("a.xlsx::S1")] == [f"message {i}" for i in range(2, 6)]
+
+def test_old_json_chats_and_cut_lines(store):
+    messages = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    with open(store / "b.xlsx__S1.json", "w") as f:
+        json.dump(messages, f)
+    assert chat_store.full_history("b.xlsx::S1") == messages
+    assert not (store / "b.xlsx__S1.json").exists()
+
+    with open(chat_store.chat_path("b.xlsx::S1"), "a") as f:
+        f.write('{"role": "user", "con')
+    assert chat_store.full_history("b.xlsx::S1") == messages
+
+    chat_store.reset_chat("b.xlsx::S1")
+    assert chat_store.full_history("b.xlsx::S1") == []
+    assert chat_store.recent_messages("b.xlsx::S1") == []
+
+def test_fit_to_budget_keeps_the_newest_messages():
+    messages = [{"role": "user", "content": "x" * 400} for _ in range(10)]
+    kept = chat_store.fit_to_budget(messages, max_tokens=350)
+    assert kept[0]["role"] == "system" and "7 earlier messages" in kept[0]["content"]
+    assert kept[1:] == messages[-3:]
+    assert chat_store.fit_to_budget(messages[:2], max_tokens=350) == messages[:2]
+    # The newest message is kept even when it alone is over the budget
+    assert chat_store.fit_to_budget(messages[:1], max_tokens=10) == messages[:1]
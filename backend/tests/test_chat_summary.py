@@ -0,0 +1,30 @@
+import os
+import time
+import pandas as pd
+from services import chat_summary
+from services.derived import content_path
+from services.sheet_cache import invalidate_file
+
+def test_summary_matches_building_it_per_question(workbook_path):
+    expected = chat_summary.build_summary(pd.read_excel(workbook_path, sheet_name="A25"))
+    summary = chat_summary.sheet_summary(workbook_path, "A25")
+    assert summary["text"] == f"{expected}"
+    assert summary["result"] == chat_summary.stringify_all(expected)
+
+def test_summary_is_built_once_per_sheet_version(upload_copy, monkeypatch):
+    reads = []
+    read_sheet = chat_summary.read_sheet
+    monkeypatch.setattr(chat_summary, "read_sheet", lambda *args: reads.append(args) or read_sheet(*args))
+
+    first = chat_summary.sheet_summary(upload_copy, "B30 Pro")
+    assert chat_summary.sheet_summary(upload_copy, "B30 Pro") is first
+    assert len(reads) == 1
+
+    # A new version of the file is summarized again
+    os.utime(upload_copy, ns=(time.time_ns(), time.time_ns() + 10**9))
+    chat_summary.sheet_summary(upload_copy, "B30 Pro")
+    assert len(reads) == 2
+
+    invalidate_file(content_path(upload_copy))
+    chat_summary.sheet_summary(upload_copy, "B30 Pro")
+    assert len(reads) == 3
@@ -0,0 +1,74 @@
+import io
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from services import export
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        "device": ["B30 Pro", "A25", None, "B30 Pro"],
+        "mixed": ["text", 3, None, "2024-08-12"],
+        "count": [1, 2, 3, 4],
+        "proba": [0.1, 0.5, np.nan, 0.9]
+    })
+
+@pytest.fixture
+def temp_paths(monkeypatch):
+    paths = []
+    temp_path = export._temp_path
+
+    def record(suffix):
+        paths.append(temp_path(suffix))
+        return paths[-1]
+
+    monkeypatch.setattr(export, "_temp_path", record)
+    monkeypatch.setattr(export, "EXPORT_CHUNK_ROWS", 3)
+    return paths
+
+def read_back(data, export_format):
+    if export_format == "csv":
+        return pd.read_csv(io.BytesIO(data))
+    if export_format == "parquet":
+        return pd.read_parquet(io.BytesIO(data))
+    return pd.read_excel(io.BytesIO(data))
+
+@pytest.mark.parametrize("export_format", list(export.EXPORT_FORMATS))
+def test_export_round_trips(frame, temp_paths, export_format):
+    if export_format == "parquet" and export.pq is None:
+        pytest.skip("pyarrow is not installed")
+    chunks = export.export_stream(frame, export_format)
+    data = b"".join(chunk.encode() if isinstance(chunk, str) else chunk for chunk in chunks)
+    df = read_back(data, export_format)
+
+    assert list(df.columns) == list(frame.columns)
+    assert df["count"].tolist() == frame["count"].tolist()
+    np.testing.assert_allclose(df["proba"], frame["proba"])
+    # Mixed object columns are exported as text
+    assert df["mixed"].astype(str).tolist()[:2] == ["text", "3"]
+    assert all(not os.path.exists(path) for path in temp_paths)
+
+def test_temp_file_is_removed_when_the_client_hangs_up(frame, temp_paths):
+    chunks = export.export_stream(frame, "xlsx")
+    next(chunks)
+    assert os.path.exists(temp_paths[0])
+    chunks.close()
+    assert not os.path.exists(temp_paths[0])
+
+def test_xlsx_row_limit(frame, temp_paths, monkeypatch):
+    monkeypatch.setattr(export, "XLSX_MAX_ROWS", 3)
+    assert "csv or parquet" in export.format_error(frame, "xlsx")
+    assert export.format_error(frame, "csv") is None
+    with pytest.raises(ValueError):
+        export.export_stream(frame, "xlsx")
+    assert temp_paths == []
+
+def test_download_refuses_xlsx_past_the_row_limit(client, uploaded, monkeypatch):
+    monkeypatch.setattr(export, "XLSX_MAX_ROWS", 10)
+    response = client.get(f"/download_predictions/{uploaded}/S6603L?format=xlsx")
+    assert response.status_code == 400
+    assert "csv or parquet" in response.get_json()["error"]
+    response = client.get(f"/download_predictions/{uploaded}/S6603L?format=csv")
+    assert response.status_code == 200
+    assert len(response.get_data(as_text=True).splitlines()) > 10
@@ -0,0 +1,132 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import pytest
+from services import jobs
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+started = threading.Event()
+release = threading.Event()
+
+@jobs.job_kind("test_echo")
+def echo(params, progress):
+    progress(0.5, "Halfway")
+    return params
+
+@jobs.job_kind("test_blocking")
+def blocking(params, progress):
+    started.set()
+    release.wait(10)
+    progress(1)
+    return params
+
+@pytest.fixture
+def gate():
+    started.clear()
+    release.clear()
+    yield
+    release.set()
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+def insert(kind, status, owner_pid, heartbeat_at, **params):
+    # A row as a process that is gone would have left it
+    job_id = uuid.uuid4().hex
+    with jobs._connect() as db:
+        db.execute("""INSERT INTO jobs (job_id, kind, params, job_key, status, progress, created_at, owner_pid, owner_id, heartbeat_at)
+                      VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?)""",
+                   [job_id, kind, json.dumps(params), jobs._job_key(kind, params), status, time.time(),
+                    owner_pid, f"{owner_pid}:gone", heartbeat_at])
+    return job_id
+
+def test_same_job_is_queued_once(gate):
+    first = jobs.submit("test_blocking", value="dedup")
+    assert started.wait(5)
+    second = jobs.submit("test_blocking", value="dedup")
+    assert second["job_id"] == first["job_id"]
+    assert second["owner_pid"] == os.getpid()
+    release.set()
+    assert jobs.wait(first["job_id"], 5)["status"] == "done"
+    # Finished jobs don't block new ones
+    assert jobs.submit("test_blocking", value="dedup")["job_id"] != first["job_id"]
+
+RACE = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+from services import jobs
+
+@jobs.job_kind("test_race")
+def race(params, progress):
+    time.sleep(1)
+    return params
+
+time.sleep(max(0, float(sys.argv[2]) - time.time()))
+print(jobs.submit("test_race", value="race")["job_id"])
+"""
+
+def test_same_job_is_queued_once_across_processes():
+    start = time.time() + 1
+    processes = [subprocess.Popen([sys.executable, "-c", RACE, BACKEND_DIR, str(start)], stdout=subprocess.PIPE, text=True)
+                 for _ in range(6)]
+    job_ids = {process.communicate(timeout=30)[0].strip() for process in processes}
+    assert len(job_ids) == 1
+    with jobs._connect() as db:
+        assert db.execute("SELECT COUNT(*) FROM jobs WHERE kind = 'test_race'").fetchone()[0] == 1
+
+@pytest.mark.parametrize("status", ["queued", "running"])
+def test_job_of_a_dead_process_is_taken_over(status):
+    job_id = insert("test_echo", status, dead_pid(), time.time(), value=status)
+    job = jobs.submit("test_echo", value=status)
+    assert job["job_id"] == job_id
+    assert job["owner_pid"] == os.getpid()
+    job = jobs.wait(job_id, 5)
+    assert job["status"] == "done"
+    assert job["result"] == {"value": status}
+
+def test_job_with_a_stale_heartbeat_is_taken_over():
+    job_id = insert("test_echo", "running", os.getppid(), time.time() - jobs.JOB_STALE_SECONDS - 1, value="stale")
+    assert jobs.run("test_echo", value="stale") is None
+    assert jobs.get_job(job_id)["status"] == "done"
+
+def test_live_owner_keeps_its_job():
+    job_id = insert("test_echo", "running", os.getppid(), time.time(), value="live")
+    assert jobs.submit("test_echo", value="live")["owner_pid"] == os.getppid()
+    assert jobs._take_over_abandoned() == 0
+    # Until its process is known to be gone
+    jobs.release(os.getppid())
+    assert jobs._take_over_abandoned() == 1
+    assert jobs.wait(job_id, 5)["status"] == "done"
+
+def test_resume_finishes_abandoned_cancels():
+    job_id = insert("test_echo", "cancelling", dead_pid(), time.time(), value="cancel")
+    jobs.resume()
+    assert jobs.get_job(job_id)["status"] == "cancelled"
+
+def test_cancel_stops_at_next_progress(gate):
+    job = jobs.submit("test_blocking", value="cancel")
+    assert started.wait(5)
+    assert jobs.cancel(job["job_id"])["status"] == "cancelling"
+    release.set()
+    assert jobs.wait(job["job_id"], 5)["status"] == "cancelled"
+
+def test_taken_over_job_is_dropped_by_its_old_owner(gate):
+    job = jobs.submit("test_blocking", value="lost")
+    assert started.wait(5)
+    # Another process takes it over meanwhile
+    with jobs._connect() as db:
+        db.execute("UPDATE jobs SET owner_id = 'other' WHERE job_id = ?", [job["job_id"]])
+    release.set()
+    time.sleep(0.5)
+    assert jobs.get_job(job["job_id"])["status"] == "running"
+
+def test_score_jobs_cant_be_cancelled():
+    import services.workbook_jobs  # registers the kinds
+    assert jobs.is_cancellable("parse")
+    assert not jobs.is_cancellable("score")
@@ -0,0 +1,18 @@
+import json
+import time
+from services import metrics
+
+def test_metrics_add_up_other_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    metrics.observe("test.route", {"total": 0.02}, 200)
+    before = metrics._collect()
+    # A snapshot as another worker writes it
+    with open(tmp_path / "1.json", "w") as f:
+        json.dump(metrics._snapshot(), f)
+
+    histograms, responses = metrics._collect()
+    assert responses[("test.route", 200)] == 2 * before[1][("test.route", 200)]
+    merged = histograms[("test.route", "total")]
+    assert merged.total.count == 2 * before[0][("test.route", "total")].total.count
+    assert merged.window(time.time()).count == merged.total.count
+    assert 'churn_responses_total{route="test.route",status="200"}' in metrics.prometheus_text()
@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+import threading
+import joblib
+import numpy as np
+import pytest
+from services import model_registry, scoring
+from services.model_registry import get_model, has_version, list_versions, version_paths
+from services.sheet_cache import read_sheet
+
+xgb = pytest.importorskip("xgboost")
+
+def promote(models_dir, name):
+    tmp_path = models_dir / "current.json.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": name}, f)
+    os.replace(tmp_path, models_dir / "current.json")
+
+@pytest.fixture
+def two_versions(models_dir):
+    # v1: the shipped artifacts; v2: another model with a shifted scaler
+    model, preprocessor = scoring.load_artifacts(scoring.MODEL_PATH, scoring.PREPROCESSOR_PATH)
+    v1 = models_dir / "versions" / "v1"
+    v2 = models_dir / "versions" / "v2"
+    os.makedirs(v1)
+    os.makedirs(v2)
+    shutil.copy(scoring.MODEL_PATH, v1)
+    shutil.copy(scoring.PREPROCESSOR_PATH, v1)
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 2))
+    other = xgb.XGBClassifier(n_estimators=10, max_depth=3).fit(X, (X[:, 0] + X[:, 1] > 0.5).astype(int))
+    preprocessor.mean_ = preprocessor.mean_ + 30
+    joblib.dump(other, v2 / os.path.basename(scoring.MODEL_PATH))
+    joblib.dump(preprocessor, v2 / os.path.basename(scoring.PREPROCESSOR_PATH))
+    promote(models_dir, "v1")
+    return v1, v2
+
+def pair_proba(folder, other_folder, df):
+    model, _ = scoring.load_artifacts(*scoring.artifact_paths(str(folder)))
+    _, preprocessor = scoring.load_artifacts(*scoring.artifact_paths(str(other_folder)))
+    return scoring.predict(model, preprocessor, scoring.preprocess_sheet(df))[0]
+
+def test_hot_swap_serves_whole_versions(models_dir, two_versions, workbook_path):
+    v1, v2 = two_versions
+    df = read_sheet(workbook_path, "A25").head(200)
+    pure = {"v1": pair_proba(v1, v1, df), "v2": pair_proba(v2, v2, df)}
+    mixed = [pair_proba(v1, v2, df), pair_proba(v2, v1, df)]
+    assert not any(np.allclose(m, p) for m in mixed for p in pure.values())
+    versions = {name: get_model(name)["version"] for name in pure}
+
+    stop = threading.Event()
+    seen = []
+    errors = []
+
+    def serve():
+        while not stop.is_set():
+            try:
+                model = get_model()
+                seen.append((model["version"], model["scorer"](df)[0]))
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=serve) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for i in range(200):
+        promote(models_dir, "v2" if i % 2 == 0 else "v1")
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert {version for version, _ in seen} == set(versions.values())
+    for version, proba in seen:
+        name = "v1" if version == versions["v1"] else "v2"
+        np.testing.assert_allclose(proba, pure[name], rtol=1e-6)
+
+def test_promote_drops_the_previous_live_version(models_dir, two_versions):
+    first = get_model()["version"]
+    promote(models_dir, "v2")
+    second = get_model()["version"]
+    assert second != first
+    assert model_registry._loaded.get(first) is None
+    assert [(v["name"], v["loaded"]) for v in list_versions()] == [("live", True), ("v1", False), ("v2", True)]
+
+def test_versions_resolve_by_name_or_hash(models_dir, two_versions):
+    v1, _ = two_versions
+    version = get_model("v1")["version"]
+    assert version_paths(version) == scoring.artifact_paths(str(v1))
+    assert has_version("v2") and not has_version("v3") and not has_version("../v1")
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+from services.normalize import MISSING_LABEL, column_frequency, extract_json, normalize_labels, row_labels
+from services.sheet_cache import read_sheet
+
+def per_row_labels(series):
+    # The normalization as get_column_frequency did it, one row at a time
+    return series.apply(extract_json).astype(str).str.strip().str.title()
+
+RAW = pd.Series([
+    '[{"slot_index":0,"carrier_name":"AT&T"}]', '[{"name":"verizon "}]', '[{"carrier_name":""}]',
+    '[{"other":1}]', "[{broken", "[]", "", " null ", "Unknown", None, np.nan, 3, 3.0, "t-mobile", "T-Mobile"
+], dtype=object)
+
+def test_row_labels_match_per_row_normalization():
+    pd.testing.assert_series_equal(row_labels(RAW), per_row_labels(RAW))
+
+def test_counts_add_up_per_label():
+    labels, counts = normalize_labels(RAW)
+    assert pd.Series(counts).groupby(labels.to_numpy()).sum().to_dict() == per_row_labels(RAW).value_counts().to_dict()
+
+@pytest.mark.parametrize("column", ["sim_info", "network_type", "promotion_email", "wallpaper_ids"])
+def test_frequency_of_sheet_columns(workbook_path, column):
+    series = read_sheet(workbook_path, "S6603L")[column]
+    pd.testing.assert_series_equal(row_labels(series), per_row_labels(series), check_names=False)
+    assert column_frequency(series) == per_row_labels(series).value_counts().to_dict()
+
+def test_dates_are_counted_per_month():
+    series = pd.Series(["2024-08-12 10:00:00", "2024-08-30", "۲۰۲۴-۰۹-۰۱", "2024/10/05 08:08", None])
+    assert column_frequency(series) == {"2024-08": 2, "2024-09": 1, "2024-10": 1}
+    assert MISSING_LABEL not in column_frequency(series)
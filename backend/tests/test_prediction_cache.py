@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+from services.prediction_cache import score_incrementally
+from services.scoring import compile_scorer, load_artifacts
+from services.sheet_cache import read_sheet
+
+@pytest.fixture(scope="module")
+def scorer():
+    return compile_scorer(*load_artifacts())
+
+class CountingScorer:
+    def __init__(self, scorer):
+        self.scorer = scorer
+        self.rows = 0
+
+    def __call__(self, df):
+        self.rows += len(df)
+        return self.scorer(df)
+
+def rescore(filepath, df, scorer):
+    counting = CountingScorer(scorer)
+    proba, label = score_incrementally(filepath, "S6603L", "test", df, counting)
+    expected_proba, expected_label = scorer(df)
+    np.testing.assert_array_equal(proba, expected_proba)
+    np.testing.assert_array_equal(label, expected_label)
+    return counting.rows
+
+def test_only_new_or_changed_rows_are_scored(upload_copy, scorer):
+    df = read_sheet(upload_copy, "S6603L")
+    assert rescore(upload_copy, df, scorer) == len(df)
+    assert rescore(upload_copy, df, scorer) == 0
+
+    changed = df.copy()
+    changed.loc[100:109, "last_boot_date"] = "2025-01-01 00:00:00"
+    changed = pd.concat([changed.drop(index=range(200, 220)), df.iloc[:5]], ignore_index=True)
+    assert 0 < rescore(upload_copy, changed, scorer) < len(changed) // 2
+
+def test_changed_leading_rows_rescore_everything(upload_copy, scorer):
+    df = read_sheet(upload_copy, "S6603L")
+    rescore(upload_copy, df, scorer)
+    # The first date decides how the whole column is parsed
+    changed = df.copy()
+    changed["active_date"] = changed["active_date"].astype(object)
+    changed.loc[0, "active_date"] = "12/08/2024"
+    assert rescore(upload_copy, changed, scorer) == len(changed)
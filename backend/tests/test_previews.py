@@ -0,0 +1,44 @@
+from services.model_registry import get_model
+from services.prediction_cache import scored_frame
+from services.sheet_cache import read_sheet
+
+# The whole frame stringified up front, as each preview used to do it
+def full_preview(df):
+    return df.fillna("").astype(object).apply(lambda col: col.map(str))
+
+def full_predictions_preview(df):
+    return df.fillna("").astype(str)
+
+def matching(text, term):
+    return text[text.apply(lambda row: row.str.lower().str.contains(term, regex=False).any(), axis=1)]
+
+def test_sheet_preview_pages(client, uploaded, workbook_path):
+    text = full_preview(read_sheet(workbook_path, "B30 Pro"))
+    body = client.get(f"/get_sheets_data/{uploaded}/B30 Pro?page=3&page_size=25").get_json()
+    assert body["columns"] == text.columns.tolist()
+    assert body["preview"] == text.iloc[50:75].to_dict(orient="records")
+    assert body["total_rows"] == len(text)
+    assert body["total_pages"] == (len(text) + 24) // 25
+
+    body = client.get(f"/get_sheets_data/{uploaded}/B30 Pro?page=2&page_size=10&search=USIM").get_json()
+    expected = matching(text, "usim")
+    assert 10 < len(expected) < len(text)
+    assert body["total_rows"] == len(expected)
+    assert body["preview"] == expected.iloc[10:20].to_dict(orient="records")
+
+def test_prediction_preview_pages(client, uploaded, workbook_path):
+    model = get_model()
+    df = read_sheet(workbook_path, "S6603L")
+    proba, label = model["scorer"](df)
+    text = full_predictions_preview(scored_frame(df, {"proba": proba, "label": label}))
+
+    body = client.get(f"/predict_churn/{uploaded}/S6603L?page=2&page_size=20").get_json()
+    assert body["model_version"] == model["version"]
+    assert body["columns"] == text.columns.tolist()
+    assert body["preview"] == text.iloc[20:40].to_dict(orient="records")
+    assert body["total_pages"] == (len(text) + 19) // 20
+
+    body = client.get(f"/predict_churn/{uploaded}/S6603L?page=1&page_size=20&search=mobile").get_json()
+    expected = matching(text, "mobile")
+    assert body["preview"] == expected.iloc[:20].to_dict(orient="records")
+    assert body["total_pages"] == (len(expected) + 19) // 20
@@ -0,0 +1,49 @@
+import os
+import time
+from services import profiler
+from services.normalize import column_frequency
+from services.sheet_cache import read_sheet
+from services.upload_store import UPLOAD_FOLDER
+
+def wait_for_profile(filepath, sheet, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        profile = profiler.load_profile(filepath, sheet)
+        if profile is not None:
+            return profile
+        time.sleep(0.1)
+    raise AssertionError("profile was not built")
+
+def test_profile_matches_on_request_results(workbook_path):
+    df = read_sheet(workbook_path, "B30 Pro")
+    profile = profiler.build_profile(df)
+    target = profiler.find_churn_column(df.columns)
+    assert target is not None
+    assert profile["churn_target"] == target
+    for column in df.columns:
+        assert profile["frequency"][column] == column_frequency(df[column])
+        assert profile["churn"][column] == profiler.churn_breakdown(df, column, target)
+    assert profile["correlation"] == profiler.correlation_matrix(df)
+
+def test_profile_is_built_in_the_background_and_stored(upload_copy):
+    assert profiler.load_profile(upload_copy, "A25") is None
+    profile = wait_for_profile(upload_copy, "A25")
+    assert os.path.exists(profiler.profile_path(upload_copy, "A25"))
+    # Read back from disk by a process that didn't build it
+    profiler._profiles.clear()
+    assert profiler.load_profile(upload_copy, "A25") == profile
+
+def test_stored_profile_is_ignored_once_the_file_changes(upload_copy):
+    profile = wait_for_profile(upload_copy, "A25")
+    profiler.save_profile(upload_copy, "A25", {**profile, "columns": ["stale"]})
+    profiler._profiles.clear()
+    assert profiler.load_profile(upload_copy, "A25")["columns"] == ["stale"]
+
+    os.utime(upload_copy, ns=(time.time_ns(), time.time_ns() + 10**9))
+    assert profiler._read_profile(upload_copy, "A25") == {}
+
+def test_frequency_route_serves_the_profile(client, uploaded):
+    filepath = os.path.join(UPLOAD_FOLDER, uploaded)
+    profile = wait_for_profile(filepath, "S6603L")
+    response = client.get(f"/get_column_frequency/{uploaded}/S6603L/network_type")
+    assert response.get_json()["frequency"] == profile["frequency"]["network_type"]
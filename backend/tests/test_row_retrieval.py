@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from services import row_retrieval
+from services.sheet_cache import read_sheet
+
+def built(filepath, sheet):
+    # Queues the sheet's index and waits for the build
+    row_retrieval.schedule_index(filepath, sheet)
+    row_retrieval._executor.submit(lambda: None).result()
+
+def row_scores(filepath, sheet, question):
+    # Similarity of every row to the question, computed directly
+    embedder = row_retrieval.get_embedder()
+    return embedder.embed(row_retrieval.row_texts(read_sheet(filepath, sheet))) @ embedder.embed([question])[0]
+
+def test_index_is_built_in_the_background(upload_copy):
+    assert row_retrieval.top_rows(upload_copy, "A25", "carrier verizon") == []
+    built(upload_copy, "A25")
+    assert row_retrieval.top_rows(upload_copy, "A25", "carrier verizon")
+
+@pytest.mark.parametrize("use_faiss", [True, False])
+def test_top_rows_are_the_nearest(upload_copy, monkeypatch, use_faiss):
+    if use_faiss and row_retrieval.faiss is None:
+        pytest.skip("faiss is not installed")
+    if not use_faiss:
+        monkeypatch.setattr(row_retrieval, "faiss", None)
+    row_retrieval._indexes.clear()
+    built(upload_copy, "S6603L")
+
+    question = "network mobile carrier T-Mobile reboot"
+    rows = row_retrieval.top_rows(upload_copy, "S6603L", question, k=5)
+    scores = row_scores(upload_copy, "S6603L", question)
+    # The five best scores, whichever of tied rows were picked
+    assert len(rows) == 5
+    np.testing.assert_allclose(scores[rows], np.sort(scores)[::-1][:5], rtol=1e-5)
+
+def test_rare_values_are_found_verbatim(upload_copy):
+    df = read_sheet(upload_copy, "B30 Pro")
+    imei = str(df["imei1"].iloc[123])
+    related = row_retrieval.related_rows(upload_copy, "B30 Pro", f"What happened to device {imei}?")
+    assert related[0]["imei1"] == imei
+    assert all(len(value) <= row_retrieval.CELL_CHARS for row in related for value in row.values())
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+from services.scoring import compile_scorer, load_artifacts, predict, preprocess_sheet
+from services.sheet_cache import read_sheet, sheet_names
+
+@pytest.fixture(scope="module")
+def artifacts():
+    return load_artifacts()
+
+@pytest.mark.parametrize("max_table_cells", [None, 0], ids=["table", "booster"])
+def test_compiled_scorer_matches_predict_proba(artifacts, workbook_path, max_table_cells):
+    xgb_model, preprocessor = artifacts
+    kwargs = {} if max_table_cells is None else {"max_table_cells": max_table_cells}
+    score = compile_scorer(xgb_model, preprocessor, **kwargs)
+    for sheet in sheet_names(workbook_path):
+        df = read_sheet(workbook_path, sheet)
+        expected_proba, expected_label = predict(xgb_model, preprocessor, preprocess_sheet(df))
+        proba, label = score(df)
+        np.testing.assert_allclose(proba, expected_proba, rtol=0, atol=1e-6)
+        np.testing.assert_array_equal(label, expected_label)
+
+def test_compiled_scorer_scores_row_subsets(artifacts, workbook_path):
+    score = compile_scorer(*artifacts)
+    df = read_sheet(workbook_path, "S6603L")
+    proba, _ = score(df)
+    sub_proba, _ = score(df.iloc[:50])
+    np.testing.assert_array_equal(sub_proba, proba[:50])
@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+import numpy as np
+import pytest
+import xgboost as xgb
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models"))
+training = pytest.importorskip("model")
+search = pytest.importorskip("search")
+
+GRID = {"max_depth": [2, 3], "learning_rate": [0.3], "n_estimators": [10], "scale_pos_weight": [1, 5],
+        "min_child_weight": [1], "subsample": [1.0]}
+SHEETS = ["B30 Pro", "S6603L"]
+FOLDS = 3
+
+def expected_auc(X, y, params, strategy):
+    # One candidate trained fold by fold, from the raw rows
+    aucs = []
+    splitter = StratifiedKFold(n_splits=FOLDS, shuffle=True, random_state=42)
+    for train_idx, test_idx in splitter.split(X, y):
+        X_train, y_train = X[train_idx], y[train_idx]
+        resampler = search.RESAMPLERS[strategy]()
+        if resampler is not None:
+            X_train, y_train = resampler.fit_resample(X_train, y_train)
+        scaler = StandardScaler().fit(X_train)
+        train_params = {k: v for k, v in params.items() if k != "n_estimators"}
+        train_params.update({"objective": "binary:logistic", "tree_method": "hist", "nthread": 1, "seed": 42})
+        dtrain = xgb.QuantileDMatrix(scaler.transform(X_train).astype(np.float32), label=y_train)
+        booster = xgb.train(train_params, dtrain, num_boost_round=params["n_estimators"])
+        proba = booster.inplace_predict(scaler.transform(X[test_idx]).astype(np.float32))
+        aucs.append(roc_auc_score(y[test_idx], proba))
+    return float(np.mean(aucs))
+
+def test_search_matches_training_each_candidate_alone(workbook_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(training, "CACHE_DIR", str(tmp_path / ".cache"))
+    monkeypatch.setattr(search, "SEARCH_DIR", str(tmp_path / "search"))
+    monkeypatch.setattr(search, "PARAM_GRID", GRID)
+    search.main(["--files", workbook_path, "--sheets", *SHEETS, "--resamplers", "none", "smote",
+                 "--samples", "0", "--folds", str(FOLDS), "--workers", "2"])
+
+    [run] = os.listdir(tmp_path / "search")
+    with open(tmp_path / "search" / run / "leaderboard.json") as f:
+        saved = json.load(f)
+    assert saved["candidates"] == 8
+    rows = saved["leaderboard"]
+    assert [r["auc_mean"] for r in rows] == sorted((r["auc_mean"] for r in rows), reverse=True)
+    assert saved["pick"] == rows[0]
+
+    X, y = training.load_dataset([workbook_path], SHEETS, training.DEFAULT_FEATURES, use_cache=False)
+    X = np.nan_to_num(X, nan=0.0)
+    for row in rows:
+        assert row["auc_mean"] == pytest.approx(expected_auc(X, y, row["params"], row["resampler"]), rel=1e-6)
+
+def test_candidates_sample_the_grid():
+    combos = search.candidates(GRID, 0)
+    assert len(combos) == 4
+    assert search.candidates(GRID, 3) == search.candidates(GRID, 3)
+    assert len(search.candidates(GRID, 3)) == 3
+    assert all(c in combos for c in search.candidates(GRID, 3))
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+from services.search_index import SearchIndex, cell_text, paginate
+from services.sheet_cache import read_sheet
+
+def preview_text(df):
+    return df.fillna("").astype(object).apply(lambda col: col.map(str))
+
+def test_cell_text_is_str_of_each_cell(workbook_path):
+    df = read_sheet(workbook_path, "S6603L")
+    pd.testing.assert_frame_equal(cell_text(df), preview_text(df))
+
+def test_search_finds_what_the_preview_shows():
+    df = pd.DataFrame({
+        "day": pd.to_datetime(["2024-08-12", "2024-08-13", None]),
+        "count": [1.5, np.nan, 3.0],
+        "name": ["USIM", None, "Verizon"]
+    })
+    pd.testing.assert_frame_equal(cell_text(df), preview_text(df))
+    assert cell_text(df)["day"].tolist()[:2] == ["2024-08-12 00:00:00", "2024-08-13 00:00:00"]
+    index = SearchIndex(df)
+    assert index.search("00:00").tolist() == [0, 1]
+    assert index.search("1.5").tolist() == [0]
+    assert index.search("usim").tolist() == [0]
+    assert index.search("verizon").tolist() == [2]
+
+def test_paginate():
+    assert paginate(25, 3, 10) == (slice(20, 30), 25)
+    rows, total = paginate(np.array([3, 5, 8, 13, 21]), 2, 2)
+    assert rows.tolist() == [8, 13]
+    assert total == 5
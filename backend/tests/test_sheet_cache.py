@@ -0,0 +1,25 @@
+import os
+import pandas as pd
+from services import sheet_cache
+
+def test_read_sheet_matches_read_excel(workbook_path):
+    for sheet in sheet_cache.sheet_names(workbook_path):
+        expected = pd.read_excel(workbook_path, sheet_name=sheet)
+        pd.testing.assert_frame_equal(sheet_cache.read_sheet(workbook_path, sheet), expected)
+        assert sheet_cache.sheet_length(workbook_path, sheet) == len(expected)
+
+def test_callers_get_copies(workbook_path):
+    df = sheet_cache.read_sheet(workbook_path, "S6603L")
+    df["imei1"] = 0
+    df.drop(columns="sim_info", inplace=True)
+    again = sheet_cache.read_sheet(workbook_path, "S6603L")
+    assert "sim_info" in again.columns
+    assert (again["imei1"] != 0).all()
+
+def test_rewritten_file_is_read_again(upload_copy):
+    before = sheet_cache.read_sheet(upload_copy, "S6603L")
+    pd.DataFrame({"a": [1, 2, 3]}).to_excel(upload_copy, sheet_name="S6603L", index=False)
+    os.utime(upload_copy, ns=(0, os.stat(upload_copy).st_mtime_ns + 10**9))
+    after = sheet_cache.read_sheet(upload_copy, "S6603L")
+    assert len(before) != len(after)
+    assert list(after.columns) == ["a"]
@@ -0,0 +1,54 @@
+import json
+import os
+import sys
+import numpy as np
+import pytest
+from services import scoring
+from services.model_registry import get_model, list_versions
+from services.prediction_cache import artifact_version
+from services.sheet_cache import read_sheet
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models"))
+training = pytest.importorskip("model")
+
+@pytest.fixture
+def train(models_dir, workbook_path, monkeypatch):
+    monkeypatch.setattr(training, "VERSIONS_DIR", str(models_dir / "versions"))
+    monkeypatch.setattr(training, "LIVE_POINTER", str(models_dir / "current.json"))
+    monkeypatch.setattr(training, "CACHE_DIR", str(models_dir / ".cache"))
+
+    def run(version, *args):
+        training.main(["--files", workbook_path, "--sheets", "B30 Pro", "S6603L", "--max-rounds", "20",
+                       "--early-stopping", "5", "--threads", "2", "--version", version, *args])
+        return models_dir / "versions" / version
+    return run
+
+def test_training_writes_a_version_and_promotes_it(train, models_dir, workbook_path, client):
+    version_dir = train("v1")
+    assert sorted(os.listdir(models_dir / "versions")) == ["v1"]
+    assert {training.MODEL_FILE, training.PREPROCESSOR_FILE, training.METRICS_FILE} <= set(os.listdir(version_dir))
+    with open(models_dir / "current.json") as f:
+        assert json.load(f) == {"version": "v1"}
+
+    # The app serves it
+    paths = scoring.live_paths()
+    assert paths == (str(version_dir / training.MODEL_FILE), str(version_dir / training.PREPROCESSOR_FILE))
+    model = get_model()
+    assert model["version"] == artifact_version(*paths)
+    df = read_sheet(workbook_path, "A25")
+    proba, _ = scoring.predict(model["model"], model["preprocessor"], scoring.preprocess_sheet(df))
+    np.testing.assert_allclose(model["scorer"](df)[0], proba, rtol=1e-6)
+    assert client.get("/model_training_metrics").get_json()["version"] == "v1"
+
+def test_versions_are_never_overwritten(train, models_dir):
+    train("v1")
+    before = os.stat(models_dir / "versions" / "v1" / training.MODEL_FILE).st_mtime_ns
+    with pytest.raises(FileExistsError):
+        train("v1")
+    assert os.stat(models_dir / "versions" / "v1" / training.MODEL_FILE).st_mtime_ns == before
+
+def test_no_promote_keeps_the_live_version(train, models_dir):
+    train("v1")
+    train("v2", "--no-promote")
+    assert scoring.live_version() == "v1"
+    assert [v["name"] for v in list_versions()] == ["live", "v1", "v2"]
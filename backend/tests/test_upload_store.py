@@ -0,0 +1,76 @@
+import io
+import os
+import pandas as pd
+import pytest
+from services import profiler, upload_store
+from services.derived import content_path, derived_dir
+from services.sheet_cache import read_sheet
+
+@pytest.fixture(params=["symlink", "hardlink"])
+def folder(request, tmp_path, monkeypatch):
+    if request.param == "hardlink":
+        def no_symlinks(*args, **kwargs):
+            raise OSError("symlinks not allowed")
+        monkeypatch.setattr(os, "symlink", no_symlinks)
+    return str(tmp_path / "uploads")
+
+@pytest.fixture
+def other_workbook():
+    buffer = io.BytesIO()
+    pd.DataFrame({"active_date": ["2024-01-01"], "last_boot_date": ["2024-02-01"]}).to_excel(buffer, sheet_name="S6603L", index=False)
+    return buffer.getvalue()
+
+def upload(folder, name, data):
+    return upload_store.store_upload(folder, name, io.BytesIO(data))
+
+def blobs(folder):
+    return sorted(os.listdir(os.path.join(folder, ".blobs")))
+
+def test_same_content_is_stored_once(folder, workbook_path):
+    data = open(workbook_path, "rb").read()
+    first = upload(folder, "a.xlsx", data)
+    second = upload(folder, "b.xlsx", data)
+    assert not first["duplicate"] and second["duplicate"]
+    assert len(blobs(folder)) == 1
+
+    a, b = os.path.join(folder, "a.xlsx"), os.path.join(folder, "b.xlsx")
+    assert content_path(a) == content_path(b) == upload_store.blob_path(folder, first["sha256"], "a.xlsx")
+    assert derived_dir(a, "profiles") == derived_dir(b, "profiles")
+    pd.testing.assert_frame_equal(read_sheet(b, "S6603L"), pd.read_excel(workbook_path, sheet_name="S6603L"))
+
+def test_blob_goes_with_its_last_name(folder, workbook_path):
+    data = open(workbook_path, "rb").read()
+    upload(folder, "a.xlsx", data)
+    upload(folder, "b.xlsx", data)
+    profiles = derived_dir(os.path.join(folder, "a.xlsx"), "profiles")
+    os.makedirs(profiles)
+
+    upload_store.remove_upload(folder, "a.xlsx")
+    assert len(blobs(folder)) == 1
+    upload_store.remove_upload(folder, "b.xlsx")
+    assert blobs(folder) == []
+    assert not os.path.exists(profiles)
+    assert [f for f in os.listdir(folder) if not f.startswith(".")] == []
+
+def test_replaced_content_drops_the_old_blob(folder, workbook_path, other_workbook):
+    upload(folder, "a.xlsx", open(workbook_path, "rb").read())
+    replaced = upload(folder, "a.xlsx", other_workbook)
+    assert blobs(folder) == [os.path.basename(upload_store.blob_path(folder, replaced["sha256"], "a.xlsx"))]
+    assert len(read_sheet(os.path.join(folder, "a.xlsx"), "S6603L")) == 1
+
+def test_build_for_replaced_content_keeps_to_that_content(folder, workbook_path, other_workbook):
+    name = os.path.join(folder, "a.xlsx")
+    upload(folder, "a.xlsx", open(workbook_path, "rb").read())
+    upload(folder, "copy.xlsx", open(workbook_path, "rb").read())
+    old = content_path(name)
+    upload(folder, "a.xlsx", other_workbook)
+
+    # A profile scheduled for the old content, running after the replacement
+    profiler.profile_sheet(old, "S6603L", (old, "S6603L"))
+    assert os.path.exists(profiler.profile_path(old, "S6603L"))
+    assert not os.path.exists(profiler.profile_path(name, "S6603L"))
+
+    # Once its content is gone altogether, nothing is written or raised
+    upload_store.remove_upload(folder, "copy.xlsx")
+    profiler.profile_sheet(old, "S6603L", (old, "S6603L"))
+    assert not os.path.exists(profiler.profile_path(old, "S6603L"))
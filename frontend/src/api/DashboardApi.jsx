@@ -1,4 +1,5 @@
 import axios from "axios";
+import { JobsApi } from "./JobsApi";
 
 const API_URL = "http://localhost:5001"; // your Flask backend
 
@@ -25,13 +26,13 @@ export const DashboardApi = {
 
     // Get sheets of a specific file
     getSheets: async (file) => {
-        const response = await axios.get(`${API_URL}/get_sheets/${file}`);
+        const response = await JobsApi.get(`${API_URL}/get_sheets/${file}`);
         return response.data.sheets || [];
     },
 
     // Get data from a specific sheet of a specific file
     getSheetData: async (file, sheet, page = 1, pageSize = 20, searchTerm = "") => {
-        const response = await axios.get(`${API_URL}/get_sheets_data/${file}/${sheet}`, {
+        const response = await JobsApi.get(`${API_URL}/get_sheets_data/${file}/${sheet}`, {
             params: { page, page_size: pageSize, search: searchTerm }
         });
         return response.data;
@@ -49,6 +50,44 @@ export const DashboardApi = {
         return response.json();
     },
 
+    // Same as askAiAboutSheet, but calls onToken(text) as the answer is generated
+    askAiAboutSheetStream: async (file, sheet, question, onToken) => {
+        const response = await fetch(
+            `${API_URL}/ask_ai_about_sheet_stream/${file}/${sheet}`,
+            {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ question })
+            }
+        );
+        if (!response.ok || !response.body) {
+            return response.json();
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        let final = {};
+        for (;;) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // Events are separated by a blank line
+            let end;
+            while ((end = buffer.indexOf("\n\n")) !== -1) {
+                const lines = buffer.slice(0, end).split("\n");
+                buffer = buffer.slice(end + 2);
+                const event = lines.find((l) => l.startsWith("event: "))?.slice(7);
+                const data = JSON.parse(lines.find((l) => l.startsWith("data: ")).slice(6));
+                if (event === "token") onToken(data.content);
+                else if (event === "result") final.result = data;
+                else if (event === "done") final = { ...final, ...data };
+            }
+        }
+        return final;
+    },
+
     loadAiChatHistory: async (file, sheet) => {
         const response = await axios.get(
         `${API_URL}/chat_history/${file}/${sheet}`
@@ -60,31 +99,33 @@ export const DashboardApi = {
     // Columns
     // ----------------------------
     getAllColumns: async (file, sheet) => {
-        const response = await axios.get(
+        const response = await JobsApi.get(
         `${API_URL}/get_all_columns/${file}/${sheet}`
         );
         return response.data.columns || [];
     },
 
     getColumnFrequency: async (file, sheet, column) => {
-        const response = await axios.get(
+        const response = await JobsApi.get(
         `${API_URL}/get_column_frequency/${file}/${sheet}/${column}`
         );
         return response.data;
     },
 
     getCorrelationHeatmap: async (file, sheet) => {
-        const response = await axios.get(
+        const response = await JobsApi.get(
         `${API_URL}/get_correlation_heatmap/${file}/${sheet}`
         );
         return response.data;
     },
 
     getDistributionVsChurn: async (file, sheet, column) => {
-        const response = await fetch(
-            `${API_URL}/get_distribution_vs_churn/${file}/${sheet}/${column}`
+        // Error bodies are returned too, as fetch() did
+        const response = await JobsApi.get(
+        `${API_URL}/get_distribution_vs_churn/${file}/${sheet}/${column}`,
+        { validateStatus: () => true }
         );
-        return response.json();
+        return response.data;
     },
 
         
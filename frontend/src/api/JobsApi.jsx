@@ -0,0 +1,43 @@
+import axios from "axios";
+
+const API_URL = "http://localhost:5001"; // your Flask backend
+const POLL_MS = 500;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+export const JobsApi = {
+    getJob: async (jobId) => {
+        const response = await axios.get(`${API_URL}/jobs/${jobId}`);
+        return response.data;
+    },
+
+    cancelJob: async (jobId) => {
+        const response = await axios.post(`${API_URL}/jobs/${jobId}/cancel`);
+        return response.data;
+    },
+
+    // Resolves with the job once it is done; throws if it failed or was cancelled
+    waitForJob: async (jobId, onProgress) => {
+        for (;;) {
+            const job = await JobsApi.getJob(jobId);
+            if (onProgress) onProgress(job);
+            if (job.status === "done") return job;
+            if (job.status === "failed" || job.status === "cancelled") {
+                throw new Error(job.error || `Job ${job.status}`);
+            }
+            await sleep(POLL_MS);
+        }
+    },
+
+    // axios.get() for routes that answer 202 with a job while a workbook is
+    // still being parsed or scored: waits for the job, then asks again
+    get: async (url, config) => {
+        for (;;) {
+            const response = await axios.get(url, config);
+            if (response.status !== 202) return response;
+            // Downloads ask for a blob; the job still comes back as JSON
+            const job = response.data instanceof Blob ? JSON.parse(await response.data.text()) : response.data;
+            await JobsApi.waitForJob(job.job_id);
+        }
+    },
+};
@@ -14,28 +14,34 @@ export default function AiChat({ selectedFile, selectedSheet }) {
   const sendMessage = async () => {
     if (!input.trim()) return;
 
-    const userMessage = { role: "user", content: input };
-    setMessages((prev) => [...prev, userMessage]);
+    const question = input;
+    const userMessage = { role: "user", content: question };
+    // The reply is filled in as its tokens arrive
+    const replyId = Date.now();
+    setMessages((prev) => [...prev, userMessage, { id: replyId, role: "assistant", content: "" }]);
     setInput("");
     setLoading(true);
 
+    const setReply = (update) =>
+      setMessages((prev) =>
+        prev.map((m) => (m.id === replyId ? { ...m, content: update(m.content) } : m))
+      );
+
     try {
-      const response = await DashboardApi.askAiAboutSheet(
+      const response = await DashboardApi.askAiAboutSheetStream(
         selectedFile,
         selectedSheet,
-        input
+        question,
+        (token) => {
+          setLoading(false);
+          setReply((content) => content + token);
+        }
       );
 
-      setMessages((prev) => [
-        ...prev,
-        { role: "assistant", content: response.answer }
-      ]);
+      setReply(() => response.answer ?? response.error ?? "");
     } catch (err) {
       console.log("Error: ", err)
-      setMessages((prev) => [
-        ...prev,
-        { role: "assistant", content: "Error talking to AI." }
-      ]);
+      setReply(() => "Error talking to AI.");
     } finally {
       setLoading(false);
     }
@@ -90,7 +96,7 @@ export default function AiChat({ selectedFile, selectedSheet }) {
           </div>
 
           <div className="ai-chat-messages" ref={messagesEndRef}>
-            {messages.map((m, i) => (
+            {messages.filter((m) => m.content).map((m, i) => (
               <div key={i} className={`msg ${m.role}`}>
                 {m.role === "assistant" ? (
                   <ReactMarkdown>{m.content}</ReactMarkdown>